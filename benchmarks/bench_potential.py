@@ -0,0 +1,161 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Benchmarks of the potential energy backends.
+
+Every backend is measured with three metrics: the wall time (``time_``),
+the peak resident memory of the process (``peakmem_``) and the maximum
+relative error against a double precision direct summation (``track_``).
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+from galaxychop.preproc import potential_energy
+
+import numpy as np
+
+from . import datasets
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+#: Number of particles of the synthetic galaxies.
+SIZES = [10**3, 10**4, 10**5, 10**6]
+
+#: Names of the benchmarked backends.
+BACKENDS = sorted(potential_energy.POTENTIAL_BACKENDS)
+
+#: Largest number of particles benchmarked with every backend. The direct
+#: summations are O(N²) and are not run on the biggest galaxies, but the
+#: numpy ones still cover the ~57000 particles of ID_394242.
+MAX_SIZE = {
+    "distributed": 10**5,
+    "fmm": 10**6,
+    "fortran": 10**5,
+    "grispy": 10**4,
+    "numba": 10**5,
+    "numpy": 6 * 10**4,
+    "parallel-numpy": 6 * 10**4,
+    "pm": 10**6,
+    "spherical": 10**6,
+    "treecode": 10**6,
+}
+
+#: Precision of the benchmarked calculations (the default of potential()).
+PRECISION = potential_energy.DEFAULT_PRECISION
+
+#: Number of particles where the error is measured.
+ERROR_TARGETS = 1000
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _check_backend(backend, size):
+    """Skip the unavailable or too slow backends (asv skips on this error)."""
+    if size > MAX_SIZE.get(backend, 0):
+        raise NotImplementedError(f"{backend!r} is too slow for N={size}")
+    if backend == "fortran" and potential_energy.potential_f is None:
+        raise NotImplementedError("the fortran extension is not compiled")
+    if backend == "numba":
+        try:
+            import numba  # noqa: F401
+        except ImportError:
+            raise NotImplementedError("numba is not installed")
+
+
+def _prepare(particles):
+    """Cast the particles as ``potential()`` does."""
+    x, y, z, m, softening = particles
+    dtype = potential_energy.PRECISIONS[PRECISION]
+    arrays = [np.ascontiguousarray(arr, dtype=dtype) for arr in (x, y, z, m)]
+    return (*arrays, np.asarray(softening, dtype=dtype))
+
+
+def _run(backend, particles):
+    backend_function = potential_energy.POTENTIAL_BACKENDS[backend]
+    pot, postproc = backend_function(*particles, precision=PRECISION)
+    return np.asarray(postproc(pot), dtype=np.float64)
+
+
+def _max_relative_error(backend, particles, reference_particles):
+    """Maximum relative error at a random subset of the particles."""
+    size = len(reference_particles[0])
+    random = np.random.default_rng(42)
+    targets = np.sort(
+        random.choice(size, min(size, ERROR_TARGETS), replace=False)
+    )
+
+    reference, _ = potential_energy.numpy_potential(
+        *reference_particles, precision="float64", targets=targets
+    )
+    pot = _run(backend, particles)[targets]
+    return float(np.max(np.abs(pot / reference - 1)))
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+
+class _PotentialBenchmark:
+    # a single evaluation can take minutes
+    number = 1
+    repeat = (1, 3, 60.0)
+    warmup_time = 0.0
+    timeout = 1800
+
+    def time_potential(self, *params):
+        _run(self.backend, self.particles)
+
+    def peakmem_potential(self, *params):
+        _run(self.backend, self.particles)
+
+    def track_max_relative_error(self, *params):
+        return _max_relative_error(
+            self.backend, self.particles, self.reference_particles
+        )
+
+    track_max_relative_error.unit = "relative error"
+
+
+class SyntheticGalaxy(_PotentialBenchmark):
+    """Plummer and Hernquist spheres with N from 10³ to 10⁶."""
+
+    params = [sorted(datasets.SYNTHETIC), SIZES, BACKENDS]
+    param_names = ["galaxy", "size", "backend"]
+
+    def setup(self, galaxy, size, backend):
+        _check_backend(backend, size)
+        self.backend = backend
+        self.reference_particles = datasets.SYNTHETIC[galaxy](size)
+        self.particles = _prepare(self.reference_particles)
+
+
+class Galaxy394242(_PotentialBenchmark):
+    """The galaxy ID_394242 bundled with the tests."""
+
+    params = [BACKENDS]
+    param_names = ["backend"]
+
+    def setup(self, backend):
+        try:
+            self.reference_particles = datasets.galaxy_394242()
+        except FileNotFoundError:
+            raise NotImplementedError("the galaxy ID_394242 is not available")
+        _check_backend(backend, len(self.reference_particles[0]))
+        self.backend = backend
+        self.particles = _prepare(self.reference_particles)
@@ -0,0 +1,140 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Particle sets used by the benchmarks."""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import functools
+import pathlib
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+PATH = pathlib.Path(__file__).parent.parent
+
+#: Directory with the data of the galaxy ID_394242.
+DATA_PATH = PATH / "tests" / "datasets"
+
+#: Total mass (in solar masses) of the synthetic galaxies.
+TOTAL_MASS = 1e10
+
+#: Scale radius (in kpc) of the synthetic galaxies.
+SCALE_RADIUS = 3.0
+
+#: Softening (in kpc) of the synthetic galaxies.
+SOFTENING = 0.1
+
+#: Largest sampled fraction of the mass, to avoid particles at infinity.
+_MAX_MASS_FRACTION = 0.999
+
+
+# =============================================================================
+# GENERATORS
+# =============================================================================
+
+
+def _isotropic(radius, random):
+    """Place particles at random directions at the given radii."""
+    cos_theta = random.uniform(-1, 1, size=len(radius))
+    sin_theta = np.sqrt(1 - cos_theta**2)
+    phi = random.uniform(0, 2 * np.pi, size=len(radius))
+    x = radius * sin_theta * np.cos(phi)
+    y = radius * sin_theta * np.sin(phi)
+    z = radius * cos_theta
+    return x, y, z
+
+
+def _particles(radius, random):
+    x, y, z = _isotropic(radius, random)
+    m = np.full(len(radius), TOTAL_MASS / len(radius))
+    return x, y, z, m, SOFTENING
+
+
+def plummer(size, seed=42):
+    """
+    Particles of a Plummer sphere.
+
+    Parameters
+    ----------
+    size : int
+        Number of particles.
+    seed : int, default=42
+        Seed of the random sample.
+
+    Returns
+    -------
+    tuple
+        ``(x, y, z, m, softening)`` in kpc and solar masses.
+
+    """
+    random = np.random.default_rng(seed)
+    fraction = random.uniform(0, _MAX_MASS_FRACTION, size=size)
+    radius = SCALE_RADIUS / np.sqrt(fraction ** (-2 / 3) - 1)
+    return _particles(radius, random)
+
+
+def hernquist(size, seed=42):
+    """
+    Particles of a Hernquist sphere.
+
+    Parameters
+    ----------
+    size : int
+        Number of particles.
+    seed : int, default=42
+        Seed of the random sample.
+
+    Returns
+    -------
+    tuple
+        ``(x, y, z, m, softening)`` in kpc and solar masses.
+
+    """
+    random = np.random.default_rng(seed)
+    fraction = random.uniform(0, _MAX_MASS_FRACTION, size=size)
+    sqrt_fraction = np.sqrt(fraction)
+    radius = SCALE_RADIUS * sqrt_fraction / (1 - sqrt_fraction)
+    return _particles(radius, random)
+
+
+@functools.lru_cache(maxsize=None)
+def galaxy_394242():
+    """
+    Particles of the galaxy ID_394242 bundled with the tests.
+
+    Returns
+    -------
+    tuple
+        ``(x, y, z, m, softening)`` in kpc and solar masses.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the files of the galaxy are not available.
+
+    """
+    parts = [
+        np.load(DATA_PATH / f"{ptype}_ID_394242.npy")
+        for ptype in ("star", "dark", "gas")
+    ]
+    # columns: m, x, y, z, vx, vy, vz, id
+    particles = np.concatenate(parts)
+    m, x, y, z = particles[:, :4].T
+    return x, y, z, m, 0.0
+
+
+#: Synthetic particle sets by name.
+SYNTHETIC = {"plummer": plummer, "hernquist": hernquist}
@@ -16,8 +16,10 @@
 
 from . import plot, sdynamics
 from .data import (
+    DERIVED_QUANTITIES,
     Galaxy,
     NoGravitationalPotentialError,
+    PARTICLE_SET_COLUMNS,
     ParticleSet,
     ParticleSetType,
     mkgalaxy,
@@ -26,8 +28,10 @@ from .methods import GchopMethodABC
 
 
 __all__ = [
+    "DERIVED_QUANTITIES",
     "Galaxy",
     "NoGravitationalPotentialError",
+    "PARTICLE_SET_COLUMNS",
     "ParticleSet",
     "ParticleSetType",
     "mkgalaxy",
@@ -15,7 +15,9 @@
 # =============================================================================
 
 import enum
+import functools
 from collections import OrderedDict, defaultdict
+from types import MappingProxyType
 
 from astropy import units as u
 
@@ -43,6 +45,120 @@ class NoGravitationalPotentialError(ValueError):
 # PARTICLE SET
 # =============================================================================
 
+#: Columns of a ``ParticleSet``, in the order of its buffer.
+PARTICLE_SET_COLUMNS = ("m", "x", "y", "z", "vx", "vy", "vz", "potential")
+
+
+def _column(unit):
+    """Build a converter of a column into a Quantity, without a copy."""
+
+    def converter(value):
+        if value is None:
+            return value
+        # like np.copy(), the units of a Quantity are not converted
+        return u.Quantity(np.asarray(value), unit, copy=False)
+
+    return converter
+
+
+def _joined(arrays):
+    """
+    Whole array of consecutive 1D views of the same buffer, or None.
+
+    If the arrays are adjacent pieces of the memory of a single contiguous
+    array, returns a view of that memory from the first to the last of them
+    (a zero copy ``np.concatenate(arrays)``).
+
+    """
+    arrays = [arr for arr in arrays if len(arr)]
+    if not arrays:
+        return None
+
+    first = arrays[0]
+    dtype, itemsize = first.dtype, first.dtype.itemsize
+    address = first.__array_interface__["data"][0]
+    for arr in arrays:
+        if (
+            arr.ndim != 1
+            or arr.dtype != dtype
+            or arr.strides != (itemsize,)
+            or arr.__array_interface__["data"][0] != address
+        ):
+            return None
+        address += len(arr) * itemsize
+
+    # the array that owns the memory of the first view
+    root = first
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if root.dtype != dtype or not root.flags.c_contiguous:
+        return None
+
+    origin = root.__array_interface__["data"][0]
+    start = (first.__array_interface__["data"][0] - origin) // itemsize
+    stop = (address - origin) // itemsize
+    if start < 0 or stop > root.size:
+        return None
+    return root.view(np.ndarray).reshape(-1)[start:stop]
+
+
+#: Quantities of a ``ParticleSet`` derived from its columns, and their units.
+DERIVED_QUANTITIES = {
+    "kinetic_energy_": (u.km / u.s) ** 2,
+    "total_energy_": (u.km / u.s) ** 2,
+    "Jx_": u.kpc * u.km / u.s,
+    "Jy_": u.kpc * u.km / u.s,
+    "Jz_": u.kpc * u.km / u.s,
+}
+
+
+def _derived(compute):
+    """
+    Lazy derived quantity of a ``ParticleSet``.
+
+    The decorated method computes the array (in the unit of
+    ``DERIVED_QUANTITIES``) the first time that the property is accessed,
+    and the result is cached in the particle set. Concurrent accesses are
+    safe without a lock: if two threads compute it at the same time, both
+    get the first cached value.
+
+    """
+    name = compute.__name__
+    unit = DERIVED_QUANTITIES[name]
+
+    @functools.wraps(compute)
+    def getter(self):
+        cache = self._derived_cache
+        try:
+            return cache[name]
+        except KeyError:
+            pass
+
+        value = compute(self)
+        if value is not None:
+            value = u.Quantity(value, unit, copy=False)
+            value.setflags(write=False)
+        return cache.setdefault(name, value)
+
+    return property(getter)
+
+
+class _ParticleSetArrayAccessor(uttr.ArrayAccessor):
+    """``ArrayAccessor`` that also converts the derived quantities."""
+
+    def __dir__(self):
+        """dir(x) <==> x.__dir__()."""
+        return super().__dir__() + list(DERIVED_QUANTITIES)
+
+    def __getattr__(self, a):
+        """getattr(x, y) <==> x.__getattr__(y) <==> getattr(x, y)."""
+        if a in DERIVED_QUANTITIES:
+            value = getattr(self._instance, a)
+            if value is None:
+                return
+            return value.to_value(DERIVED_QUANTITIES[a])
+        return super().__getattr__(a)
+
 
 class ParticleSetType(enum.IntEnum):
     """
@@ -74,7 +190,7 @@ class ParticleSetType(enum.IntEnum):
         return self.name.lower()
 
 
-@uttr.s(frozen=True, slots=True, repr=False)
+@uttr.s(frozen=True, slots=True, repr=False, aaccessor=None)
 class ParticleSet:
     """
     ParticleSet class.
@@ -106,6 +222,11 @@ class ParticleSet:
     Jx_, Jy_, Jz_ : Quantity
         Components of angular momentum of particles. Shapes: (n,1). Default
         units: kpc*km/s.
+    copy : bool, default value = True
+        If True, the columns are copied into a single contiguous read-only
+        buffer that the attributes view into. If False, the given arrays are
+        used without copying them; only for internal callers that never
+        modify them afterwards.
     has_potential_ : bool.
         Indicates if the specific potential energy is computed.
     arr_ : Instances of ``ArrayAccessor``
@@ -113,38 +234,55 @@ class ParticleSet:
         and if they are of astropy.units.Quantity type it converts them into
         numpy.ndarray.
 
+    Notes
+    -----
+    The ``DERIVED_QUANTITIES`` (energies and angular momentum) are computed
+    the first time that they are accessed and cached in the instance, so the
+    particle sets that are only rebuilt by a transformation never compute
+    them. ``materialized()`` returns the ones already computed.
+
     """
 
     ptype = uttr.ib(validator=attr.validators.instance_of(ParticleSetType))
 
-    m: np.ndarray = uttr.ib(unit=u.Msun, converter=np.copy)
-    x: np.ndarray = uttr.ib(unit=u.kpc, converter=np.copy)
-    y: np.ndarray = uttr.ib(unit=u.kpc, converter=np.copy)
-    z: np.ndarray = uttr.ib(unit=u.kpc, converter=np.copy)
-    vx: np.ndarray = uttr.ib(unit=(u.km / u.s), converter=np.copy)
-    vy: np.ndarray = uttr.ib(unit=(u.km / u.s), converter=np.copy)
-    vz: np.ndarray = uttr.ib(unit=(u.km / u.s), converter=np.copy)
+    m: np.ndarray = uttr.ib(unit=u.Msun, converter=_column(u.Msun))
+    x: np.ndarray = uttr.ib(unit=u.kpc, converter=_column(u.kpc))
+    y: np.ndarray = uttr.ib(unit=u.kpc, converter=_column(u.kpc))
+    z: np.ndarray = uttr.ib(unit=u.kpc, converter=_column(u.kpc))
+    vx: np.ndarray = uttr.ib(
+        unit=(u.km / u.s), converter=_column(u.km / u.s)
+    )
+    vy: np.ndarray = uttr.ib(
+        unit=(u.km / u.s), converter=_column(u.km / u.s)
+    )
+    vz: np.ndarray = uttr.ib(
+        unit=(u.km / u.s), converter=_column(u.km / u.s)
+    )
 
     potential: np.ndarray = uttr.ib(
         unit=(u.km / u.s) ** 2,
         validator=attr.validators.optional(
             attr.validators.instance_of(np.ndarray)
         ),
-        converter=(lambda v: np.copy(v) if v is not None else v),
+        converter=_column((u.km / u.s) ** 2),
         repr=False,
     )
 
     softening: float = uttr.ib(unit=u.kpc, converter=float, repr=False)
 
-    has_potential_: bool = uttr.ib(init=False)
+    _copy: bool = attr.ib(default=True, kw_only=True, repr=False, eq=False)
 
-    kinetic_energy_: np.ndarray = uttr.ib(unit=(u.km / u.s) ** 2, init=False)
-    total_energy_: np.ndarray = uttr.ib(unit=(u.km / u.s) ** 2, init=False)
+    # contiguous storage of the columns (None if they were not copied)
+    _buffer: np.ndarray = attr.ib(
+        init=False, default=None, repr=False, eq=False
+    )
 
-    # angular momentum
-    Jx_: np.ndarray = uttr.ib(unit=(u.kpc * u.km / u.s), init=False)
-    Jy_: np.ndarray = uttr.ib(unit=(u.kpc * u.km / u.s), init=False)
-    Jz_: np.ndarray = uttr.ib(unit=(u.kpc * u.km / u.s), init=False)
+    has_potential_: bool = uttr.ib(init=False)
+
+    # derived quantities already computed
+    _derived_cache: dict = attr.ib(
+        init=False, factory=dict, repr=False, eq=False
+    )
 
     # UTTRS Orchestration =====================================================
 
@@ -152,14 +290,23 @@ class ParticleSet:
     def _has_potential__default(self):
         return self.potential is not None
 
-    @kinetic_energy_.default
-    def _kinetic_energy__default(self):
+    @property
+    def arr_(self):
+        """Access to the attributes and derived quantities as arrays."""
+        return _ParticleSetArrayAccessor(self)
+
+    # DERIVED QUANTITIES ======================================================
+
+    @_derived
+    def kinetic_energy_(self):
+        """Specific kinetic energy of particles. Unit: (km/s)**2."""
         arr = self.arr_
         ke = 0.5 * (arr.vx**2 + arr.vy**2 + arr.vz**2)
         return ke
 
-    @total_energy_.default
-    def _total_energy__default(self):
+    @_derived
+    def total_energy_(self):
+        """Specific total energy of particles. Unit: (km/s)**2."""
         if not self.has_potential_:
             return
 
@@ -171,21 +318,38 @@ class ParticleSet:
 
     # angular momentum
 
-    @Jx_.default
-    def _Jx__default(self):
+    @_derived
+    def Jx_(self):
+        """X component of the specific angular momentum. Unit: kpc*km/s."""
         arr = self.arr_
         return arr.y * arr.vz - arr.z * arr.vy  # x
 
-    @Jy_.default
-    def _Jy__default(self):
+    @_derived
+    def Jy_(self):
+        """Y component of the specific angular momentum. Unit: kpc*km/s."""
         arr = self.arr_
         return arr.z * arr.vx - arr.x * arr.vz  # y
 
-    @Jz_.default
-    def _Jz__default(self):
+    @_derived
+    def Jz_(self):
+        """Z component of the specific angular momentum. Unit: kpc*km/s."""
         arr = self.arr_
         return arr.x * arr.vy - arr.y * arr.vx  # z
 
+    def materialized(self):
+        """
+        Return the names of the derived quantities already computed.
+
+        Returns
+        -------
+        tuple
+            Names of the ``DERIVED_QUANTITIES`` that were accessed (or used
+            by another one), in the order of ``DERIVED_QUANTITIES``.
+
+        """
+        cache = self._derived_cache
+        return tuple(name for name in DERIVED_QUANTITIES if name in cache)
+
     def __attrs_post_init__(self):
         """
         Particle sets length validator.
@@ -216,10 +380,34 @@ class ParticleSet:
                 f"Lengths: {lengths}"
             )
 
+        if self._copy:
+            self._pack_columns()
+
         for field in attr.astuple(self):
             if isinstance(field, np.ndarray):
                 field.setflags(write=False)
 
+    def _pack_columns(self):
+        """Copy the columns into one buffer and make them views of it."""
+        columns = [
+            cname
+            for cname in PARTICLE_SET_COLUMNS
+            if getattr(self, cname) is not None
+        ]
+        quantities = [getattr(self, cname) for cname in columns]
+
+        dtype = np.result_type(*quantities)
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+
+        buffer = np.empty((len(columns), len(self.m)), dtype=dtype)
+        for row, cname, quantity in zip(buffer, columns, quantities):
+            row[:] = quantity.value
+            view = u.Quantity(row, quantity.unit, copy=False)
+            object.__setattr__(self, cname, view)
+
+        object.__setattr__(self, "_buffer", buffer)
+
     # PROPERTIES ==============================================================
 
     @property
@@ -243,7 +431,7 @@ class ParticleSet:
         return len(self.m)
 
     # UTILITIES ===============================================================
-    def to_dict(self, *, attributes=None):
+    def to_dict(self, *, attributes=None, copy=True):
         """
         Convert the galaxy into a dict of array with coerced units.
 
@@ -253,6 +441,9 @@ class ParticleSet:
             Dictionary keys of ParticleSet parameters used to create the dict
             If it's None, the data frame is constructed from all the
             parameters of the ``ParticleSet class``.
+        copy: bool, default value = True
+            If True, the arrays are writable copies. Otherwise, the columns
+            of the ``ParticleSet`` are returned as read-only views.
 
         Return
         ------
@@ -292,7 +483,8 @@ class ParticleSet:
         for aname in attributes:
             mkvalue = value_makers[aname]
             avalue = mkvalue()
-            avalue.setflags(write=True)
+            if copy and not avalue.flags.writeable:
+                avalue = avalue.copy()
             the_dict[aname] = avalue
         return the_dict
 
@@ -316,22 +508,24 @@ class ParticleSet:
             Data frame of the particles with the selected parameters.
 
         """
-        the_dict = self.to_dict(attributes=attributes)
-        return pd.DataFrame(the_dict)
+        # the data frame copies the columns
+        the_dict = self.to_dict(attributes=attributes, copy=False)
+        return pd.DataFrame(the_dict, copy=True)
 
     def copy(self):
         """Make a copy of the ParticleSet."""
         cls = type(self)
+        arr = self.arr_
         new = cls(
             ptype=self.ptype,
-            m=self.m.copy(),
-            x=self.x.copy(),
-            y=self.y.copy(),
-            z=self.z.copy(),
-            vx=self.vx.copy(),
-            vy=self.vy.copy(),
-            vz=self.vz.copy(),
-            potential=self.potential.copy(),
+            m=arr.m,
+            x=arr.x,
+            y=arr.y,
+            z=arr.z,
+            vx=arr.vx,
+            vy=arr.vy,
+            vz=arr.vz,
+            potential=arr.potential,
             softening=float(self.softening.value),
         )
         return new
@@ -369,6 +563,22 @@ class Galaxy:
     is_centered_ : bool.
         Indicates if this Galaxy instance has been already centered i.e.
         the most bound particle defines the origin of the system.
+    columns_ : mapping
+        Read-only arrays of the ``PARTICLE_SET_COLUMNS`` of all the
+        particles, without units (``potential`` is None if the galaxy has no
+        potential).
+    slices_ : dict
+        Slice of every particle type in the ``columns_``.
+    dtype_ : numpy.dtype
+        Floating point type of the ``columns_``.
+
+    Notes
+    -----
+    The ``columns_`` are a struct of arrays with the stars, dark matter and
+    gas particles one after the other. When the columns of the particle sets
+    are consecutive slices of the same array, as in the galaxies built with
+    ``mkgalaxy()``, they are views of it without copying the particles;
+    otherwise they are concatenated once when the galaxy is created.
 
     """
 
@@ -376,6 +586,9 @@ class Galaxy:
     dark_matter = uttr.ib(validator=attr.validators.instance_of(ParticleSet))
     gas = uttr.ib(validator=attr.validators.instance_of(ParticleSet))
 
+    # whole-galaxy columns, the particle sets are slices of them
+    _store: dict = attr.ib(init=False, default=None, repr=False, eq=False)
+
     has_potential_ = attr.ib(init=False)
 
     @has_potential_.default
@@ -407,6 +620,24 @@ class Galaxy:
             if pset.ptype != pstype:
                 raise TypeError(f"{psname} must be of type {pstype}")
 
+        object.__setattr__(self, "_store", self._build_store())
+
+    def _build_store(self):
+        """Join the columns of the particle sets, copying only if needed."""
+        psets = [self.stars, self.dark_matter, self.gas]
+        store = {}
+        for cname in PARTICLE_SET_COLUMNS:
+            if cname == "potential" and not self.has_potential_:
+                store[cname] = None
+                continue
+            arrays = [getattr(pset.arr_, cname) for pset in psets]
+            column = _joined(arrays)
+            if column is None:
+                column = np.concatenate(arrays)
+            column.setflags(write=False)
+            store[cname] = column
+        return store
+
     def __len__(self):
         """len(x) <=> x.__len__()."""
         return len(self.stars) + len(self.dark_matter) + len(self.gas)
@@ -419,8 +650,128 @@ class Galaxy:
         has_pot = f"potential={self.has_potential_}"
         return f"<Galaxy {stars_repr}, {dm_repr}, " f"{gas_repr}, {has_pot}>"
 
+    # PROPERTIES ==============================================================
+
+    @property
+    def columns_(self):
+        """Read-only arrays of the columns of all the particles."""
+        return MappingProxyType(self._store)
+
+    @property
+    def slices_(self):
+        """Slice of every particle type in the ``columns_``."""
+        num_s, num_dm = len(self.stars), len(self.dark_matter)
+        return {
+            "stars": slice(0, num_s),
+            "dark_matter": slice(num_s, num_s + num_dm),
+            "gas": slice(num_s + num_dm, len(self)),
+        }
+
+    @property
+    def dtype_(self):
+        """Floating point type of the ``columns_``."""
+        return np.result_type(
+            *(column for column in self._store.values() if column is not None)
+        )
+
     # UTILITIES ===============================================================
 
+    def to_arrays(self, attributes=None, ptypes=None, *, out=None):
+        """
+        Convert the galaxy to numpy arrays, without building a data frame.
+
+        Parameters
+        ----------
+        attributes: tuple, default value = None
+            Dictionary keys of ParticleSet parameters to convert. If it's
+            None, all the parameters of the ``ParticleSet class`` are
+            converted.
+        ptypes: tuple, default value = None
+            Strings indicating the ParticleSetType to include. If it's None,
+            all particle types are included.
+        out: np.ndarray, default value = None
+            2D array of shape (n_particles, n_attributes) where the
+            attributes are stored, one per column (e.g. a matrix of features).
+            The copy is faster in column major (``order="F"``) arrays.
+
+        Return
+        ------
+        dict or np.ndarray :
+            Read-only 1D array of every attribute, with the stars, dark matter
+            and gas particles one after the other (as the rows of
+            ``to_dataframe()``). If ``out`` is provided, it is returned
+            instead.
+
+        Notes
+        -----
+        The attributes stored in the ``columns_`` are views of them, without
+        copying the particles, if the selected particle types are
+        consecutive.
+
+        """
+        psets = [
+            pset
+            for pset in (self.stars, self.dark_matter, self.gas)
+            if ptypes is None or pset.ptype.humanize() in ptypes
+        ]
+        if psets:
+            the_arrays = self._join_attributes(psets, attributes)
+        else:
+            # empty arrays with the type of the attributes
+            the_arrays = {
+                aname: np.broadcast_to(avalue, len(self.stars))[:0]
+                for aname, avalue in self.stars.to_dict(
+                    attributes=attributes, copy=False
+                ).items()
+            }
+
+        if out is None:
+            return the_arrays
+
+        shape = (sum(len(pset) for pset in psets), len(the_arrays))
+        if np.shape(out) != shape:
+            raise ValueError(
+                f"out must have the shape {shape}. Found: {np.shape(out)}"
+            )
+        for idx, column in enumerate(the_arrays.values()):
+            out[:, idx] = column
+        return out
+
+    def _join_attributes(self, psets, attributes):
+        """Arrays of the attributes of consecutive particle sets."""
+        # the columns_ are used if the particle types are consecutive
+        slices = self.slices_
+        start = slices[psets[0].ptype.humanize()].start
+        stop = slices[psets[-1].ptype.humanize()].stop
+        whole = stop - start == sum(len(pset) for pset in psets)
+
+        if attributes is None:
+            attributes = list(psets[0].to_dict(copy=False))
+        stored = {
+            aname: self._store[aname][start:stop]
+            for aname in attributes
+            if whole and self._store.get(aname) is not None
+        }
+
+        missing = [aname for aname in attributes if aname not in stored]
+        psets_dicts = [
+            pset.to_dict(attributes=missing, copy=False) for pset in psets
+        ]
+
+        the_arrays = {}
+        for aname in attributes:
+            column = stored.get(aname)
+            if column is None:
+                column = np.concatenate(
+                    [
+                        np.broadcast_to(pset_dict[aname], len(pset))
+                        for pset, pset_dict in zip(psets, psets_dicts)
+                    ]
+                )
+                column.setflags(write=False)
+            the_arrays[aname] = column
+        return the_arrays
+
     def to_dataframe(self, *, ptypes=None, attributes=None):
         """
         Convert the galaxy to pandas DataFrame.
@@ -443,15 +794,10 @@ class Galaxy:
             Data frame of Galaxy with selected particles and parameters.
 
         """
-        psets = [self.stars, self.dark_matter, self.gas]
-
-        parts = []
-        for pset in psets:
-            if ptypes is None or pset.ptype.humanize() in ptypes:
-                df = pset.to_dataframe(attributes=attributes)
-                parts.append(df)
+        the_arrays = self.to_arrays(attributes=attributes, ptypes=ptypes)
 
-        return pd.concat(parts, ignore_index=True)
+        # the data frame copies the columns
+        return pd.DataFrame(the_arrays, copy=True)
 
     def to_hdf5(self, path_or_stream, *, metadata=None, **kwargs):
         """
@@ -483,7 +829,7 @@ class Galaxy:
             **kwargs,
         )
 
-    def to_dict(self, *, ptypes=None, attributes=None):
+    def to_dict(self, *, ptypes=None, attributes=None, copy=True):
         """
         Convert the galaxy to dict with information as a numpy array with \
         coerced units.
@@ -497,6 +843,9 @@ class Galaxy:
             Dictionary keys of ParticleSet parameters used to create the dict.
             If it's None, the data frame is constructed from all the
             parameters of the ``ParticleSet class``.
+        copy: bool, default value = True
+            If True, the arrays are writable copies. Otherwise, the columns
+            of the particle sets are returned as read-only views.
 
         Return
         ------
@@ -511,12 +860,12 @@ class Galaxy:
         for pset in psets:
             ptype = pset.ptype.humanize()
             if ptypes is None or ptype in ptypes:
-                p_dict = pset.to_dict(attributes=attributes)
+                p_dict = pset.to_dict(attributes=attributes, copy=copy)
                 the_dict[ptype] = p_dict
 
         return the_dict
 
-    def disassemble(self):
+    def disassemble(self, *, copy=True):
         """
         Convert all the attributes of the galaxy into a play dict.
 
@@ -525,8 +874,10 @@ class Galaxy:
 
         Parameters
         ----------
-        galaxy: Galaxy
-            Instance of Galaxy.
+        copy: bool, default value = True
+            If True, the arrays are writable copies. Otherwise, they are
+            read-only views of the columns of the galaxy, that a new galaxy
+            built with ``mkgalaxy(..., copy=False)`` shares with this one.
 
         Returns
         -------
@@ -537,7 +888,7 @@ class Galaxy:
         attributes = {
             fname: fvalue
             for fname, fvalue in attr.fields_dict(ParticleSet).items()
-            if fvalue.init and fname != "ptype"
+            if fvalue.init and fname not in ("ptype", "_copy")
         }
 
         def _flat(pset_dict, suffix):
@@ -548,23 +899,22 @@ class Galaxy:
                 the_flatten_dict[flat_k] = flat_v
             return the_flatten_dict
 
-        the_dict = self.to_dict(attributes=attributes.keys())
+        the_dict = self.to_dict(attributes=attributes.keys(), copy=copy)
         stars_kws = _flat(the_dict["stars"], "s")
         dark_matter_kws = _flat(the_dict["dark_matter"], "dm")
         gas_kws = _flat(the_dict["gas"], "g")
 
         disassembled = dict(**stars_kws, **dark_matter_kws, **gas_kws)
+        if not self.has_potential_:
+            # to_dict() fills the missing potential with nan
+            for suffix in ("s", "dm", "g"):
+                disassembled[f"potential_{suffix}"] = None
         return disassembled
 
     def copy(self):
         """Make a copy of the Galaxy."""
-        cls = type(self)
-        new = cls(
-            stars=self.stars.copy(),
-            dark_matter=self.dark_matter.copy(),
-            gas=self.gas.copy(),
-        )
-        return new
+        # the three particle sets are copied into a single block
+        return mkgalaxy(**self.disassemble(copy=False))
 
     # ACCESSORS ===============================================================
 
@@ -803,6 +1153,69 @@ class Galaxy:
 # =============================================================================
 
 
+def _pack_galaxy(psets_columns, dtype=None):
+    """
+    Copy the columns of the particle sets into a single read-only block.
+
+    Parameters
+    ----------
+    psets_columns : list of dict
+        Columns of every particle set, with the ``PARTICLE_SET_COLUMNS`` as
+        keys.
+    dtype : numpy.dtype, optional
+        Type of the block. If it's None, it's the floating point type of the
+        columns (float64 for the other types).
+
+    Returns
+    -------
+    list of dict or None
+        The columns as slices of the rows of the block, or None if they
+        can't be packed (e.g. different lengths), to let the particle sets
+        report the problem.
+
+    """
+    psets_columns = [
+        {
+            cname: (None if value is None else np.asarray(value))
+            for cname, value in columns.items()
+        }
+        for columns in psets_columns
+    ]
+
+    # a column is packed only if all the particle sets have it
+    cnames = [
+        cname
+        for cname in PARTICLE_SET_COLUMNS
+        if all(columns[cname] is not None for columns in psets_columns)
+    ]
+    lengths = []
+    for columns in psets_columns:
+        plengths = {np.shape(columns[cname]) for cname in cnames}
+        if len(plengths) != 1 or len(next(iter(plengths))) != 1:
+            return None
+        lengths.append(next(iter(plengths))[0])
+
+    if dtype is None:
+        dtype = np.result_type(
+            *(columns[cname] for columns in psets_columns for cname in cnames)
+        )
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+
+    block = np.empty((len(cnames), sum(lengths)), dtype=dtype)
+    bounds = np.cumsum([0] + lengths)
+    for row, cname in zip(block, cnames):
+        for columns, start, stop in zip(psets_columns, bounds, bounds[1:]):
+            row[start:stop] = columns[cname]
+    block.setflags(write=False)
+
+    packed = []
+    for columns, start, stop in zip(psets_columns, bounds, bounds[1:]):
+        views = {cname: row[start:stop] for row, cname in zip(block, cnames)}
+        packed.append(dict(columns, **views))
+    return packed
+
+
 def mkgalaxy(
     m_s: np.ndarray,
     x_s: np.ndarray,
@@ -832,6 +1245,8 @@ def mkgalaxy(
     potential_s: np.ndarray = None,
     potential_dm: np.ndarray = None,
     potential_g: np.ndarray = None,
+    copy: bool = True,
+    dtype=None,
 ):
     """
     Galaxy builder.
@@ -874,48 +1289,66 @@ def mkgalaxy(
     softening_g : Quantity. Default value = 0
         Softening radius of gas particles. Shape: (1,).
         Default unit: kpc.
+    copy : bool, default value = True
+        If True, the arrays are copied into a single contiguous block that
+        the three ``ParticleSet`` view into. If False, the arrays are used
+        without copying them, so they must not be modified afterwards (e.g.
+        the read-only views of ``Galaxy.disassemble(copy=False)``).
+    dtype : str or numpy.dtype, default value = None
+        Floating point type of the particle data (e.g. ``"float32"`` to
+        halve the memory of the galaxy). The derived quantities are computed
+        in this type. If it's None, the type is inferred from the arrays
+        (float64 if they aren't floating point).
 
     Return
     ------
     galaxy: ``Galaxy class`` object.
 
     """
-    stars = ParticleSet(
-        ParticleSetType.STARS,
-        m=m_s,
-        x=x_s,
-        y=y_s,
-        z=z_s,
-        vx=vx_s,
-        vy=vy_s,
-        vz=vz_s,
-        softening=softening_s,
-        potential=potential_s,
-    )
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if not np.issubdtype(dtype, np.floating):
+            raise ValueError(
+                f"dtype must be a floating point type. Found: {dtype}"
+            )
 
-    dark_matter = ParticleSet(
-        ParticleSetType.DARK_MATTER,
-        m=m_dm,
-        x=x_dm,
-        y=y_dm,
-        z=z_dm,
-        vx=vx_dm,
-        vy=vy_dm,
-        vz=vz_dm,
-        softening=softening_dm,
-        potential=potential_dm,
-    )
-    gas = ParticleSet(
-        ParticleSetType.GAS,
-        m=m_g,
-        x=x_g,
-        y=y_g,
-        z=z_g,
-        vx=vx_g,
-        vy=vy_g,
-        vz=vz_g,
-        softening=softening_g,
-        potential=potential_g,
+    psets_columns = [
+        dict(m=m_s, x=x_s, y=y_s, z=z_s, vx=vx_s, vy=vy_s, vz=vz_s),
+        dict(m=m_dm, x=x_dm, y=y_dm, z=z_dm, vx=vx_dm, vy=vy_dm, vz=vz_dm),
+        dict(m=m_g, x=x_g, y=y_g, z=z_g, vx=vx_g, vy=vy_g, vz=vz_g),
+    ]
+    for columns, potential in zip(
+        psets_columns, (potential_s, potential_dm, potential_g)
+    ):
+        columns["potential"] = potential
+
+    # the particles of the three types are copied into a single block, and
+    # the particle sets (and the columns of the galaxy) are views of it
+    psets_copy = copy
+    if copy:
+        packed = _pack_galaxy(psets_columns, dtype=dtype)
+        if packed is not None:
+            psets_columns, psets_copy = packed, False
+    elif dtype is not None:
+        # only the columns of another type are copied
+        psets_columns = [
+            {
+                cname: (
+                    None if value is None else np.asarray(value, dtype=dtype)
+                )
+                for cname, value in columns.items()
+            }
+            for columns in psets_columns
+        ]
+
+    stars, dark_matter, gas = (
+        ParticleSet(ptype, softening=softening, copy=psets_copy, **columns)
+        for ptype, softening, columns in zip(
+            ParticleSetType,
+            (softening_s, softening_dm, softening_g),
+            psets_columns,
+        )
     )
+
     galaxy = Galaxy(stars=stars, dark_matter=dark_matter, gas=gas)
     return galaxy
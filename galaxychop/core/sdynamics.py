@@ -117,20 +117,25 @@ class _GalaxyStellarDynamics:
 def _stellar_dynamics(galaxy, bin0, bin1, reassign):
     # this function exists to silence the warnings in the public one
 
-    # extract only the needed columns
-    df = galaxy.to_dataframe(
-        attributes=["ptypev", "total_energy", "Jx", "Jy", "Jz"]
-    )
+    # the energy and angular momentum of all the particles, computed from
+    # the columns of the galaxy like the ones of every ParticleSet
+    columns = galaxy.columns_
+    x, y, z = columns["x"], columns["y"], columns["z"]
+    vx, vy, vz = columns["vx"], columns["vy"], columns["vz"]
+
+    Jx = y * vz - z * vy
+    Jy = z * vx - x * vz
+    Jz_part = x * vy - y * vx
+    E_tot = 0.5 * (vx**2 + vy**2 + vz**2) + columns["potential"]
 
-    Jr_part = np.sqrt(df.Jx.values**2 + df.Jy.values**2)
-    E_tot = df.total_energy.values
+    Jr_part = np.sqrt(Jx**2 + Jy**2)
 
     # Remove the particles that are not bound: E > 0 and with E = -inf.
     (bound,) = np.where((E_tot <= 0.0) & (E_tot != -np.inf))
 
     # Normalize the two variables: E between 0 and 1; Jz between -1 and 1.
     E = E_tot[bound] / np.abs(np.min(E_tot[bound]))
-    Jz = df.Jz.values[bound] / np.max(np.abs(df.Jz.values[bound]))
+    Jz = Jz_part[bound] / np.max(np.abs(Jz_part[bound]))
 
     # Build the specific energy binning and select the Jz values to
     # calculate J_circ.
@@ -187,9 +192,9 @@ def _stellar_dynamics(galaxy, bin0, bin1, reassign):
     y = y[zero]
 
     # Stars particles
-    df_star = df[df.ptypev == ParticleSetType.STARS.value]
-    Jr_star = np.sqrt(df_star.Jx.values**2 + df_star.Jy.values**2)
-    Etot_s = df_star.total_energy.values
+    stars = galaxy.slices_[ParticleSetType.STARS.humanize()]
+    Jr_star = Jr_part[stars]
+    Etot_s = E_tot[stars]
 
     # Remove the star particles that are not bound:
     # E > 0 and with E = -inf.
@@ -197,8 +202,8 @@ def _stellar_dynamics(galaxy, bin0, bin1, reassign):
 
     # Normalize E, Jz and Jr for the stars.
     E_star_norm = Etot_s[bound_star] / np.abs(np.min(E_tot[bound]))
-    Jz_star_norm = df_star.Jz.values[bound_star] / np.max(
-        np.abs(df.Jz.values[bound])
+    Jz_star_norm = Jz_part[stars][bound_star] / np.max(
+        np.abs(Jz_part[bound])
     )
     Jr_star_norm = Jr_star[bound_star] / np.max(np.abs(Jr_part[bound]))
 
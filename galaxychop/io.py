@@ -56,10 +56,14 @@ def _table_to_dict(table, key_suffix):
     return kws
 
 
-def _df_to_table(df, ptype):
-    table_df = df[df.ptype == ptype.humanize()]
-    del table_df["ptype"]
-    return Table.from_pandas(table_df)
+def _galaxy_to_table(galaxy, ptype, attributes):
+    ptype = ptype.humanize()
+    table = Table(galaxy.to_arrays(attributes, (ptype,)), copy=False)
+
+    # the id is the position of the particle in the galaxy
+    ids = np.arange(len(galaxy))[galaxy.slices_[ptype]]
+    table.add_column(ids, name="id", index=0)
+    return table
 
 
 # =============================================================================
@@ -73,6 +77,7 @@ def read_hdf5(
     softening_s: float = 0.0,
     softening_dm: float = 0.0,
     softening_g: float = 0.0,
+    dtype=None,
 ):
     """
     h5py file reader.
@@ -91,6 +96,9 @@ def read_hdf5(
         Softening radius of dark matter particles.
     softening_g : float, default value = 0
         Softening radius of gas particles.
+    dtype : str or numpy.dtype, default value = None
+        Floating point type of the particle data of the galaxy (e.g.
+        ``"float32"``). If it's None, the type of the stored data is used.
 
     Returns
     -------
@@ -117,7 +125,7 @@ def read_hdf5(
     gas_kws = _table_to_dict(gas_table, "g")
     galaxy_kws.update(gas_kws)
 
-    galaxy = data.mkgalaxy(**galaxy_kws)
+    galaxy = data.mkgalaxy(**galaxy_kws, dtype=dtype)
 
     return galaxy
 
@@ -145,18 +153,17 @@ def to_hdf5(path_or_stream, galaxy, *, metadata=None, **kwargs):
         ``astropy.io.misc.hdf5.write_table_hdf5()``
 
     """
-    attributes = ["ptype", "m", "x", "y", "z", "vx", "vy", "vz"]
+    attributes = ["m", "x", "y", "z", "vx", "vy", "vz"]
     if galaxy.has_potential_:
         attributes.append("potential")
 
-    df = galaxy.to_dataframe(attributes=attributes)
-
-    # create the id column for all the
-    df.insert(0, "id", df.index.to_numpy())
-
-    stars_table = _df_to_table(df, data.ParticleSetType.STARS)
-    dm_table = _df_to_table(df, data.ParticleSetType.DARK_MATTER)
-    gas_table = _df_to_table(df, data.ParticleSetType.GAS)
+    stars_table = _galaxy_to_table(
+        galaxy, data.ParticleSetType.STARS, attributes
+    )
+    dm_table = _galaxy_to_table(
+        galaxy, data.ParticleSetType.DARK_MATTER, attributes
+    )
+    gas_table = _galaxy_to_table(galaxy, data.ParticleSetType.GAS, attributes)
 
     # prepare metadata
     h5_metadata = _DEFAULT_METADATA.copy()
@@ -193,6 +200,7 @@ def read_npy(
     softening_s: float = 0.0,
     softening_dm: float = 0.0,
     softening_g: float = 0.0,
+    dtype=None,
 ):
     """
     Npy file reader.
@@ -226,6 +234,9 @@ def read_npy(
         Softening radius of dark matter particles.
     softening_g : float, default value = 0
         Softening radius of gas particles.
+    dtype : str or numpy.dtype, default value = None
+        Floating point type of the particle data of the galaxy (e.g.
+        ``"float32"``). If it's None, the type of the stored data is used.
 
     Returns
     -------
@@ -267,6 +278,6 @@ def read_npy(
     gas_kws = _table_to_dict(gas_table, "g")
     galaxy_kws.update(gas_kws)
 
-    galaxy = data.mkgalaxy(**galaxy_kws)
+    galaxy = data.mkgalaxy(**galaxy_kws, dtype=dtype)
 
     return galaxy
@@ -200,6 +200,9 @@ class Components:
 
         del labeled_df["ptypes"]
 
+        # the masses are summed in float64 even in float32 galaxies
+        labeled_df["m"] = labeled_df["m"].astype(np.float64)
+
         total_size, total_mass = len(labeled_df), labeled_df.m.sum()
         has_probs = self.probabilities is not None
 
@@ -443,7 +446,7 @@ class GalaxyDecomposerABC(metaclass=abc.ABCMeta):
 
     # API =====================================================================
 
-    def _get_jcirc_df(self, galaxy, attributes):
+    def _get_jcirc_arrays(self, galaxy, attributes):
         # STARS
         # turn the galaxy into jcirc dict
         # all the calculation cames together so we can't optimize here
@@ -453,30 +456,14 @@ class GalaxyDecomposerABC(metaclass=abc.ABCMeta):
             reassign=self.reassign,
         ).to_dict()
 
-        # we add the colum with the types, all the values from jcirc
-        # are stars
-        jcirc["ptypev"] = core.ParticleSetType.STARS.value
-        stars_df = pd.DataFrame({attr: jcirc[attr] for attr in attributes})
-
-        # DARK_MATTER
-        dm_rows = len(galaxy.dark_matter)
-        dm_nans = np.full(dm_rows, np.nan)
-
-        dm_columns = {attr: dm_nans for attr in attributes}
-        dm_columns["ptypev"] = core.ParticleSetType.DARK_MATTER.value
-
-        dm_df = pd.DataFrame(dm_columns)
-
-        # GAS
-        gas_rows = len(galaxy.gas)
-        gas_nans = np.full(gas_rows, np.nan)
-
-        gas_columns = {attr: gas_nans for attr in attributes}
-        gas_columns["ptypev"] = core.ParticleSetType.GAS.value
-
-        gas_df = pd.DataFrame(gas_columns)
-
-        return pd.concat([stars_df, dm_df, gas_df], ignore_index=True)
+        # DARK_MATTER and GAS have nan after the stars
+        size = len(galaxy)
+        arrays = {}
+        for attr_name in attributes:
+            column = np.full(size, np.nan)
+            column[: len(galaxy.stars)] = jcirc[attr_name]
+            arrays[attr_name] = column
+        return arrays
 
     def attributes_matrix(self, galaxy, attributes):
         """
@@ -505,50 +492,39 @@ class GalaxyDecomposerABC(metaclass=abc.ABCMeta):
 
         """
         # first we split the attributes between the ones from circularity
-        # and the ones from "galaxy.to_dataframe()"
-        circ_attrs, df_attrs = [], []
+        # and the ones from "galaxy.to_arrays()"
+        circ_attrs, arr_attrs = [], []
         for attr_name in attributes:
             container = (
                 circ_attrs
                 if attr_name in _CIRCULARITY_ATTRIBUTES
-                else df_attrs
+                else arr_attrs
             )
             container.append(attr_name)
 
-        # this crap is going to have all the dataframes that contain as a
-        # column each attribute
-        result = []
-
-        # If we have attributes of "to_dataframe" =============================
-        #     now we take out all the attributes of "to_dataframe" and save
-        #     them in a list where all the resulting dataframes will be stored
-        if df_attrs:
-            # we need this to create the array of classes
-            if "ptypev" not in df_attrs:
-                df_attrs.append("ptypev")
+        # the classes of the particles
+        y = galaxy.to_arrays(["ptypev"], _PTYPES_ORDER)["ptypev"]
 
-            dfgal = galaxy.to_dataframe(
-                ptypes=_PTYPES_ORDER, attributes=df_attrs
-            )
-            result.append(dfgal)
+        # every attribute is a column of the matrix
+        arrays = {}
+        if arr_attrs:
+            arrays.update(galaxy.to_arrays(arr_attrs, _PTYPES_ORDER))
 
         # If we have JCIRC attributes =========================================
-        #     I'm going to need a lot of NANs that represent that gas and dm
-        #     have no circularity.
+        #     the gas and dm have no circularity, so they are nan
         if circ_attrs:
-            circ_attrs.append("ptypev")
-            dfcirc = self._get_jcirc_df(galaxy, circ_attrs)
-            result.append(dfcirc)
-
-        # the attributes as dataframe
-        df = pd.concat(result, axis=1)
-
-        # remove if ptypev is duplicated
-        df = df.loc[:, ~df.columns.duplicated()]
-
-        # separate matrix and classes
-        X = df[attributes].to_numpy()
-        y = df.ptypev.to_numpy()
+            arrays.update(self._get_jcirc_arrays(galaxy, circ_attrs))
+
+        # column major, like the matrix of a data frame, so every attribute
+        # is contiguous
+        columns = [arrays[attr_name] for attr_name in attributes]
+        X = np.empty(
+            (len(y), len(columns)),
+            dtype=np.result_type(*columns),
+            order="F",
+        )
+        for idx, column in enumerate(columns):
+            X[:, idx] = column
 
         return X, y
 
@@ -701,9 +677,7 @@ class GalaxyDecomposerABC(metaclass=abc.ABCMeta):
         )
 
         # return the instance
-        mass = galaxy.to_dataframe(
-            ptypes=_PTYPES_ORDER, attributes=["m"]
-        ).m.to_numpy()
+        mass = galaxy.to_arrays(["m"], _PTYPES_ORDER)["m"]
 
         # we make the components and wrap they with the galaxy
         # in a "DecomposedGalaxy" class.
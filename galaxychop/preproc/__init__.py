@@ -19,6 +19,10 @@ from .pcenter import Centralizer, center, is_centered
 from .potential_energy import (
     Potentializer,
     potential,
+    potential_at,
+    potential_out_of_core,
+    spherical_deviation,
+    update_potential,
 )
 from .salign import Aligner, is_star_aligned, star_align
 from .smr_crop import Cutter, half_star_mass_radius_crop, is_star_cutted
@@ -29,6 +33,10 @@ __all__ = [
     "is_centered",
     "Centralizer",
     "potential",
+    "potential_at",
+    "potential_out_of_core",
+    "spherical_deviation",
+    "update_potential",
     "Potentializer",
     "star_align",
     "is_star_aligned",
@@ -46,6 +46,28 @@ class Centralizer(GalaxyTransformerABC):
         return is_centered(galaxy, **kwargs)
 
 
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _particle_slices(galaxy):
+    """Slices of the ``columns_`` with the suffixes of ``mkgalaxy()``."""
+    return tuple(zip(("s", "dm", "g"), galaxy.slices_.values()))
+
+
+def _lowest_potential_position(galaxy):
+    """Position of the particle with the lowest potential of the galaxy."""
+    columns = galaxy.columns_
+    idx = np.nanargmin(columns["potential"])
+    return columns["x"][idx], columns["y"][idx], columns["z"][idx]
+
+
+def _mass_weighted_sum(values, m):
+    """Sum of ``values * m`` accumulated in float64."""
+    return np.sum(np.multiply(values, m, dtype=np.float64))
+
+
 # =============================================================================
 # API FUNCTIONS
 # =============================================================================
@@ -84,119 +106,47 @@ def center(galaxy, with_potential=True):
             with_potential = False"
         )
 
-    if with_potential:
-        # We extract only the needed column to centrer the galaxy
-        df = galaxy.to_dataframe(
-            attributes=[
-                "ptypev",
-                "x",
-                "y",
-                "z",
-                "vx",
-                "vy",
-                "vz",
-                "potential",
-                "m",
-            ]
-        )
+    # Using only stars (account the gas and dark matter particles
+    # may not be the best option to center the galaxy)
+    stars = galaxy.stars.arr_
 
-        cond = df["ptypev"].eq(0)
+    # Total stellar mass (the sums are in float64 even in float32 galaxies)
+    m_star_tot = np.sum(stars.m, dtype=np.float64)
 
-        # Total stellar mass
-        m_star_tot = np.sum(df[cond]["m"].values)
-
-        # minimum potential index of all particles and we extract data
-        # frame row
-        minpot_idx = df.potential.argmin()
-        min_values = df.iloc[minpot_idx]
-
-        # We subtract all position columns by the position with the lowest
-        # potential value and replace this new position columns on dataframe
-        columns = ["x", "y", "z"]
-        df[columns] = df[columns] - min_values[columns]
+    if with_potential:
+        # The new origin is the position with the lowest potential value
+        x_cm, y_cm, z_cm = _lowest_potential_position(galaxy)
 
     else:
-        # We use only positions and mass
-        df = galaxy.to_dataframe(
-            attributes=["ptypev", "x", "y", "z", "vx", "vy", "vz", "m"]
-        )
-
-        # Using only stars (account the gas and dark matter particles
-        # may not be the best option to center the galaxy)
-        cond = df["ptypev"].eq(0)  # df["ptypev"].eq(0) df["ptypev"] == 0
-
-        # Total stellar mass
-        m_star_tot = np.sum(df[cond]["m"].values)
-
         # Compute the center of mass using only stars
-        x_cm = (
-            np.sum(np.multiply(df[cond]["x"].values, df[cond]["m"].values))
-            / m_star_tot
-        )
-        y_cm = (
-            np.sum(np.multiply(df[cond]["y"].values, df[cond]["m"].values))
-            / m_star_tot
-        )
-        z_cm = (
-            np.sum(np.multiply(df[cond]["z"].values, df[cond]["m"].values))
-            / m_star_tot
-        )
-
-        # We subtract all position columns by the new origin
-        # and replace on dataframe
-        df.loc[:, "x"] -= x_cm
-        df.loc[:, "y"] -= y_cm
-        df.loc[:, "z"] -= z_cm
+        x_cm = _mass_weighted_sum(stars.x, stars.m) / m_star_tot
+        y_cm = _mass_weighted_sum(stars.y, stars.m) / m_star_tot
+        z_cm = _mass_weighted_sum(stars.z, stars.m) / m_star_tot
 
     # Compute the velocity of the center of mass
     # of the galaxy within the cosmological box
-    vx_cm = (
-        np.sum(np.multiply(df[cond]["vx"].values, df[cond]["m"].values))
-        / m_star_tot
-    )
-    vy_cm = (
-        np.sum(np.multiply(df[cond]["vy"].values, df[cond]["m"].values))
-        / m_star_tot
-    )
-    vz_cm = (
-        np.sum(np.multiply(df[cond]["vz"].values, df[cond]["m"].values))
-        / m_star_tot
-    )
-    # And modify the dataframe
-    df.loc[:, "vx"] -= vx_cm
-    df.loc[:, "vy"] -= vy_cm
-    df.loc[:, "vz"] -= vz_cm
-
-    # We split the dataframe by particle type.
-    stars = df[df.ptypev == data.ParticleSetType.STARS.value]
-    dark_matter = df[df.ptypev == data.ParticleSetType.DARK_MATTER.value]
-    gas = df[df.ptypev == data.ParticleSetType.GAS.value]
-
-    # patch
-    new = galaxy.disassemble()
-
-    new.update(
-        x_s=stars.x.to_numpy(),
-        y_s=stars.y.to_numpy(),
-        z_s=stars.z.to_numpy(),
-        vx_s=stars.vx.to_numpy(),
-        vy_s=stars.vy.to_numpy(),
-        vz_s=stars.vz.to_numpy(),
-        x_dm=dark_matter.x.to_numpy(),
-        y_dm=dark_matter.y.to_numpy(),
-        z_dm=dark_matter.z.to_numpy(),
-        vx_dm=dark_matter.vx.to_numpy(),
-        vy_dm=dark_matter.vy.to_numpy(),
-        vz_dm=dark_matter.vz.to_numpy(),
-        x_g=gas.x.to_numpy(),
-        y_g=gas.y.to_numpy(),
-        z_g=gas.z.to_numpy(),
-        vx_g=gas.vx.to_numpy(),
-        vy_g=gas.vy.to_numpy(),
-        vz_g=gas.vz.to_numpy(),
+    vx_cm = _mass_weighted_sum(stars.vx, stars.m) / m_star_tot
+    vy_cm = _mass_weighted_sum(stars.vy, stars.m) / m_star_tot
+    vz_cm = _mass_weighted_sum(stars.vz, stars.m) / m_star_tot
+
+    # Only the positions and velocities are new arrays of all the particles,
+    # the new galaxy shares the other columns with the original one (and
+    # keeps its dtype)
+    columns = galaxy.columns_
+    offsets = np.array(
+        [x_cm, y_cm, z_cm, vx_cm, vy_cm, vz_cm], dtype=galaxy.dtype_
     )
+    centered = {
+        cname: columns[cname] - offset
+        for cname, offset in zip(("x", "y", "z", "vx", "vy", "vz"), offsets)
+    }
 
-    return data.mkgalaxy(**new)
+    new = galaxy.disassemble(copy=False)
+    for suffix, pslice in _particle_slices(galaxy):
+        for cname, column in centered.items():
+            new[f"{cname}_{suffix}"] = column[pslice]
+
+    return data.mkgalaxy(**new, copy=False)
 
 
 def is_centered(galaxy, *, rtol=1e-05, atol=1e-08):
@@ -221,12 +171,7 @@ def is_centered(galaxy, *, rtol=1e-05, atol=1e-08):
     if not galaxy.has_potential_:
         raise ValueError("Galaxy must have the potential energy.")
 
-    df = galaxy.to_dataframe(
-        attributes=["x", "y", "z", "vx", "vy", "vz", "potential"]
-    )
-
-    # minimum potential index of all particles and we extract data frame row
-    minpot_idx = df.potential.argmin()
-    min_values = df.iloc[minpot_idx]
+    # position of the particle with the minimum potential
+    position = _lowest_potential_position(galaxy)
 
-    return np.allclose(min_values[["x", "y", "z"]], 0, rtol=rtol, atol=atol)
+    return np.allclose(position, 0, rtol=rtol, atol=atol)
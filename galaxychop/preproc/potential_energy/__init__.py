@@ -14,16 +14,29 @@
 # IMPORTS
 # =============================================================================
 
+import logging
+import numbers
+import os
+import time
 import warnings
+from concurrent import futures
 
 import astropy.units as u
 
+import attr
+
 import numpy as np
 
+from .cache import PotentialCache, content_hash
+from .distributed_calculation import potential_distributed
+from .fmm_calculation import potential_fmm
 from .grispy_calculation import (
     make_grid,
-    potential_grispy,
+    potential_grispy_batch,
 )
+from .pm_calculation import make_mesh, potential_pm
+from .spherical_calculation import potential_spherical
+from .treecode_calculation import make_octree, potential_barnes_hut
 from .._base import GalaxyTransformerABC
 from ... import (
     constants as const,
@@ -39,13 +52,80 @@ except ImportError:
 #: The default potential backend to use.
 DEFAULT_POTENTIAL_BACKEND = "numpy" if potential_f is None else "fortran"
 
+#: Default memory budget (in bytes) of every tile of ``numpy_potential``.
+NUMPY_MAX_MEMORY = 2**28
+
+#: Dtype of the positions and masses given to the backends for every
+#: precision. ``"mixed"`` uses single precision inputs but double precision
+#: accumulators.
+PRECISIONS = {
+    "float32": np.float32,
+    "float64": np.float64,
+    "mixed": np.float32,
+}
+
+#: The default precision of the potential calculation.
+DEFAULT_PRECISION = "mixed"
+
+#: Name of the backend that selects the implementation from the number of
+#: particles and the resources of the machine (see ``select_backend()``).
+AUTO_BACKEND = "auto"
+
+#: Largest number of particles computed with the numpy backends by "auto".
+AUTO_NUMPY_MAX_SIZE = 10**4
+
+#: Largest number of particles computed with a compiled direct summation
+#: by "auto".
+AUTO_DIRECT_MAX_SIZE = 10**5
+
+#: Estimated peak memory (in bytes) of the treecode backend per particle.
+TREECODE_BYTES_PER_PARTICLE = 2048
+
+#: Default number of particles of every chunk of a chunked calculation.
+DEFAULT_CHUNK_SIZE = 2**14
+
+#: Backends that compute the potential with a direct summation, and so can
+#: add the contributions of blocks of sources.
+DIRECT_BACKENDS = ("fortran", "numba", "numpy", "parallel-numpy")
+
+#: Backends with a pool of workers, that accept the ``n_jobs`` argument.
+PARALLEL_BACKENDS = ("distributed", "numba", "parallel-numpy", "pm")
+
+# keyword arguments of the backends that change how the work is split or
+# executed, but not the potential; they are not part of the cache key
+_EXECUTION_KWS = frozenset(
+    {
+        "batch_size",
+        "block_size",
+        "cancel",
+        "executor",
+        "max_memory",
+        "n_jobs",
+        "progress",
+        "shared_memory",
+    }
+)
+
+logger = logging.getLogger(__name__)
+
 
 # =============================================================================
 # BACKENDS
 # =============================================================================
 
 
-def fortran_potential(x, y, z, m, softening):
+def fortran_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    symmetric=False,
+):
     """
     Wrap the Fortran implementation of the gravitational potential.
 
@@ -55,33 +135,136 @@ def fortran_potential(x, y, z, m, softening):
         Positions of particles. Shape: (n,1).
     m : np.ndarray
         Masses of particles. Shape: (n,1).
-    softening : float, optional
-        Softening parameter. Shape: (1,).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. ``"float32"`` accumulates in single
+        precision, ``"mixed"`` takes single precision inputs and accumulates
+        in double precision and ``"float64"`` works in double precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle. Subsets of sources or targets always
+        accumulate in double precision.
+    symmetric : bool, default=False
+        If True, use the kernel that evaluates every pair only once and
+        scatters its contribution to both particles (half of the square
+        roots), with per-thread double precision accumulators merged at the
+        end. It takes single precision inputs, so it is not available with
+        ``precision="float64"``, nor with ``sources`` or ``targets``.
 
     Returns
     -------
     np.ndarray : float
         Specific potential energy of particles.
 
+    Notes
+    -----
+    Wall time in seconds of both kernels on random particles
+    (``OMP_NUM_THREADS=1``):
+
+    =========  =========  =========
+    particles  default    symmetric
+    =========  =========  =========
+    10000      0.36       0.18
+    50000      9.91       5.23
+    100000     39.97      21.36
+    =========  =========  =========
+
     """
-    soft = np.asarray(softening)
-    epot = potential_f.fortran_potential(x, y, z, m, soft)
+    if symmetric and precision == "float64":
+        raise ValueError("The symmetric kernel does not support 'float64'")
+    if symmetric and (sources is not None or targets is not None):
+        raise ValueError(
+            "The symmetric kernel does not support 'sources' or 'targets'"
+        )
+
+    soft = np.ascontiguousarray(np.broadcast_to(softening, np.shape(m)))
+    if sources is not None or targets is not None:
+        sources = np.arange(len(m)) if sources is None else sources
+        targets = np.arange(len(m)) if targets is None else targets
+
+        # the kernel skips the target sidx(j) (1-based) of every source j
+        position = np.zeros(len(m), dtype=np.int32)
+        position[targets] = np.arange(1, len(targets) + 1)
+        kernel = (
+            potential_f.fortran_potential_sources_double
+            if precision == "float64"
+            else potential_f.fortran_potential_sources
+        )
+        epot = kernel(
+            x[targets],
+            y[targets],
+            z[targets],
+            soft[targets],
+            x[sources],
+            y[sources],
+            z[sources],
+            m[sources],
+            soft[sources],
+            position[sources],
+        )
+        return epot * const.G, np.asarray
+
+    if symmetric:
+        kernel = potential_f.fortran_potential_symmetric
+    else:
+        kernel = {
+            "float32": potential_f.fortran_potential,
+            "float64": potential_f.fortran_potential_double,
+            "mixed": potential_f.fortran_potential_mixed,
+        }[precision]
+    epot = kernel(x, y, z, m, soft)
 
     return epot * const.G, np.asarray
 
 
-def grispy_potential(x, y, z, m, softening):
+def grispy_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    batch_size=4096,
+):
     """
     Grispy implementation of the gravitational potential energy calculation.
 
+    The particles are submitted to GriSPy in batches of ``batch_size``
+    centres, with one query for the bubble and one per shell for the whole
+    batch.
+
     Parameters
     ----------
     x, y, z : np.ndarray
         Positions of particles. Shape: (n,1).
     m : np.ndarray
         Masses of particles. Shape: (n,1).
-    softening : float, optional
-        Softening parameter. Shape: (1,).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. It only sets the dtype of the inputs (done by
+        ``potential()``), this backend always accumulates in double
+        precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    batch_size : int, default=4096
+        Number of particles queried at once. Bigger batches issue fewer
+        queries but hold more neighbours in memory.
 
     Returns
     -------
@@ -89,37 +272,242 @@ def grispy_potential(x, y, z, m, softening):
         Specific potential energy of particles.
 
     """
+    if batch_size < 1:
+        raise ValueError("'batch_size' must be >= 1")
+
+    centres = np.column_stack((x, y, z))
+    softening = np.broadcast_to(softening, np.shape(m))
+    bubble_size = 5 * softening.max()
+
+    # the centres skip the sources at distance 0, i.e. themselves
+    ssoftening, sm = softening, m
+    if sources is not None:
+        x, y, z = x[sources], y[sources], z[sources]
+        ssoftening, sm = softening[sources], m[sources]
+    if targets is not None:
+        centres, softening = centres[targets], softening[targets]
+
     # Make the grid of the system
     l_box, grid = make_grid(x, y, z)
+    if sources is not None or targets is not None:
+        # the shells must reach the sources from every centre
+        everything = np.vstack((centres, np.column_stack((x, y, z))))
+        l_box = np.ptp(everything, axis=0).max()
 
-    # For each particle, compute its potential energy
-    epot = np.empty(len(m))
-    for idx, particle in enumerate(m):
-        centre = np.array([[x[idx], y[idx], z[idx]]])
-        epot[idx] = potential_grispy(
-            centre,
-            m,
-            bubble_size=5 * softening,
+    # For each batch of particles, compute their potential energy
+    epot = np.empty(len(centres))
+    for start in range(0, len(centres), batch_size):
+        batch = slice(start, start + batch_size)
+        epot[batch] = potential_grispy_batch(
+            centres[batch],
+            sm,
+            bubble_size=bubble_size,
             shell_width=0.1 * l_box,
             l_box=l_box,
             grid=grid,
+            softening=ssoftening,
+            centres_softening=softening[batch],
         )
 
-    return epot * const.G, np.asarray
+    # potential_grispy_batch returns the (negative) potential
+    return -epot * const.G, np.asarray
+
 
+def _numpy_block_size(n, itemsize, block_size, max_memory):
+    """Edge of the square tiles used by ``numpy_potential``."""
+    if block_size is not None and max_memory is not None:
+        raise ValueError("Only one of 'block_size' or 'max_memory' is allowed")
 
-def numpy_potential(x, y, z, m, softening):
+    if block_size is None:
+        max_memory = NUMPY_MAX_MEMORY if max_memory is None else max_memory
+        # the distances, a temporary and the mass over distance of a tile,
+        # plus the boolean mask of the non zero distances
+        pair_bytes = 3 * itemsize + 1
+        block_size = int(np.sqrt(max_memory / pair_bytes))
+
+    if block_size < 1:
+        raise ValueError("'block_size' and 'max_memory' must be positive")
+
+    return min(block_size, max(n, 1))
+
+
+def numpy_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    block_size=None,
+    max_memory=None,
+):
     """
     Numpy implementation for the gravitational potential energy calculation.
 
+    The particles are processed in square tiles of ``block_size`` rows and
+    columns, so the peak memory is bounded by the size of a tile instead of
+    the full N x N matrix of distances.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape:(n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. With ``"float32"`` the sums are accumulated
+        in single precision, otherwise in double precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    block_size : int, optional
+        Number of rows and columns of every tile.
+    max_memory : int, optional
+        Memory budget of a tile in bytes, used to derive ``block_size``.
+        Defaults to ``NUMPY_MAX_MEMORY``. Only one of ``block_size`` or
+        ``max_memory`` can be provided.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    """
+    soft2 = np.square(softening)
+    tgts = _numpy_particles(x, y, z, soft2, targets)
+    srcs = _numpy_particles(x, y, z, soft2, sources) + (
+        m if sources is None else m[sources],
+    )
+    size = len(tgts[0])
+    block_size = _numpy_block_size(
+        max(size, len(m)), np.asarray(x).dtype.itemsize, block_size, max_memory
+    )
+    dtype = _accumulator_dtype(precision)
+
+    epot = np.empty(size, dtype=dtype)
+    for rstart in range(0, size, block_size):
+        rows = slice(rstart, rstart + block_size)
+        epot[rows] = _numpy_rows(tgts, srcs, rows, block_size, dtype)
+
+    return epot * const.G, np.asarray
+
+
+def _accumulator_dtype(precision):
+    """Dtype of the sums of the direct summation backends."""
+    return np.float32 if precision == "float32" else np.float64
+
+
+def _numpy_particles(x, y, z, soft2, idx):
+    """Positions, squared softening and indices of a subset of particles."""
+    if idx is None:
+        return x, y, z, soft2, None
+
+    idx = np.asarray(idx)
+    soft2 = soft2[idx] if np.ndim(soft2) else soft2
+    return x[idx], y[idx], z[idx], soft2, idx
+
+
+def _numpy_rows(tgts, srcs, rows, block_size, dtype):
+    """Direct summation over the tiles of one block of rows."""
+    tx, ty, tz, soft2, tidx = tgts
+    sx, sy, sz, ssoft2, sidx, sm = srcs
+    rx, ry, rz = (tx[rows, None], ty[rows, None], tz[rows, None])
+
+    epot = np.zeros(len(rx), dtype=dtype)
+    for cstart in range(0, len(sm), block_size):
+        cols = slice(cstart, cstart + block_size)
+
+        dist = np.square(sx[cols] - rx)
+        dist += np.square(sy[cols] - ry)
+        dist += np.square(sz[cols] - rz)
+        if np.ndim(soft2):
+            # symmetric softening (soft2_i + soft2_j) / 2 of every pair
+            dist += soft2[rows, None] / 2
+            dist += ssoft2[cols] / 2
+        else:
+            dist += soft2
+        np.sqrt(dist, out=dist)
+
+        # skip the self-interaction of the particles in both blocks
+        if tidx is None and sidx is None:
+            diag = np.arange(
+                max(rows.start, cstart),
+                min(rows.start + len(rx), cstart + dist.shape[1]),
+            )
+            dist[diag - rows.start, diag - cstart] = 0.0
+        else:
+            tid = np.arange(rows.start, rows.start + len(rx))
+            tid = tid if tidx is None else tidx[tid]
+            sid = np.arange(cstart, cstart + dist.shape[1])
+            sid = sid if sidx is None else sidx[sid]
+            dist[tid[:, None] == sid] = 0.0
+
+        flt = dist != 0
+        mdist = np.divide(sm[cols], dist, out=np.zeros_like(dist), where=flt)
+
+        epot += mdist.sum(axis=1, dtype=dtype)
+
+    return epot
+
+
+def parallel_numpy_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    n_jobs=None,
+    block_size=None,
+    max_memory=None,
+):
+    """
+    Multi-threaded version of ``numpy_potential``.
+
+    The blocks of rows are evaluated concurrently on a thread pool; numpy
+    releases the GIL inside the arithmetic of every tile, so the blocks run
+    in parallel without copying the particles.
+
     Parameters
     ----------
     x, y, z : np.ndarray
         Positions of particles. Shape: (n,1).
     m : np.ndarray
         Masses of particles. Shape:(n,1).
-    softening : float, optional
-        Softening parameter. Shape: (1,).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. With ``"float32"`` the sums are accumulated
+        in single precision, otherwise in double precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    n_jobs : int, optional
+        Number of threads. ``None`` or ``-1`` use all the available CPUs.
+    block_size : int, optional
+        Number of rows and columns of every tile.
+    max_memory : int, optional
+        Memory budget in bytes shared by the tiles of all the threads.
+        Defaults to ``NUMPY_MAX_MEMORY``. Only one of ``block_size`` or
+        ``max_memory`` can be provided.
 
     Returns
     -------
@@ -127,19 +515,661 @@ def numpy_potential(x, y, z, m, softening):
         Specific potential energy of particles.
 
     """
-    dist = np.sqrt(
-        np.square(x - x.reshape(-1, 1))
-        + np.square(y - y.reshape(-1, 1))
-        + np.square(z - z.reshape(-1, 1))
-        + np.square(softening)
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError("'n_jobs' must be >= 1, -1 or None")
+
+    if block_size is None:
+        max_memory = NUMPY_MAX_MEMORY if max_memory is None else max_memory
+        max_memory = max_memory // n_jobs
+
+    soft2 = np.square(softening)
+    tgts = _numpy_particles(x, y, z, soft2, targets)
+    srcs = _numpy_particles(x, y, z, soft2, sources) + (
+        m if sources is None else m[sources],
     )
+    size = len(tgts[0])
+    block_size = _numpy_block_size(
+        max(size, len(m)), np.asarray(x).dtype.itemsize, block_size, max_memory
+    )
+    dtype = _accumulator_dtype(precision)
+
+    # the rows are split in blocks so every thread has work even when
+    # the tiles are bigger than the share of a thread
+    row_size = max(1, min(block_size, -(-size // n_jobs)))
+    blocks = [
+        slice(rstart, rstart + row_size) for rstart in range(0, size, row_size)
+    ]
+
+    epot = np.empty(size, dtype=dtype)
+    with futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = executor.map(
+            lambda rows: _numpy_rows(tgts, srcs, rows, block_size, dtype),
+            blocks,
+        )
+        for rows, block_epot in zip(blocks, results):
+            epot[rows] = block_epot
+
+    return epot * const.G, np.asarray
 
-    np.fill_diagonal(dist, 0.0)
 
-    flt = dist != 0
-    mdist = np.divide(m, dist, out=np.zeros_like(dist), where=flt)
+def _import_numba_calculation():
+    """Import the Numba kernels, only when the backend is used."""
+    try:
+        import numba  # noqa: F401
+    except ImportError as err:
+        raise ImportError(
+            "The 'numba' potential backend requires numba. "
+            "Install it with 'pip install numba'"
+        ) from err
 
-    return mdist.sum(axis=1) * const.G, np.asarray
+    from . import numba_calculation
+
+    return numba_calculation
+
+
+def numba_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    n_jobs=None,
+    block_size=None,
+):
+    """
+    Numba implementation for the gravitational potential energy calculation.
+
+    A direct summation compiled with Numba (``parallel=True`` and
+    ``fastmath=True``): the targets are split in blocks evaluated in
+    parallel, and every block sweeps the sources in tiles that stay in the
+    CPU cache. It needs numba, an optional dependency that is imported the
+    first time the backend is used, and the compiled kernel is cached on
+    disk by numba.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape:(n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. With ``"float32"`` the sums are accumulated
+        in single precision, otherwise in double precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    n_jobs : int, optional
+        Number of threads. ``None`` or ``-1`` use all the threads of numba.
+    block_size : int, optional
+        Number of targets and sources of every tile. Defaults to
+        ``numba_calculation.NUMBA_BLOCK_SIZE``.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    Raises
+    ------
+    ImportError
+        If numba is not installed.
+
+    """
+    numba_calculation = _import_numba_calculation()
+
+    x = np.asarray(x)
+    soft2 = np.broadcast_to(np.square(softening, dtype=x.dtype), len(x))
+
+    epot = numba_calculation.potential_numba(
+        x,
+        np.asarray(y),
+        np.asarray(z),
+        np.asarray(m),
+        soft2,
+        sources=sources,
+        targets=targets,
+        block_size=block_size,
+        n_jobs=None if n_jobs == -1 else n_jobs,
+        dtype=_accumulator_dtype(precision),
+    )
+
+    return epot * const.G, np.asarray
+
+
+def treecode_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    theta=0.5,
+    leaf_size=16,
+    batch_size=1024,
+):
+    """
+    Barnes-Hut treecode for the gravitational potential energy calculation.
+
+    The particles are stored in a Morton ordered octree and every node
+    whose side is smaller than ``theta`` times its distance to a particle is
+    replaced by its monopole. The cost scales as O(N log N). With one
+    softening per particle, the monopole of a node uses the mass weighted
+    mean of the squared softening of its particles.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. It only sets the dtype of the inputs (done by
+        ``potential()``), this backend always accumulates in double
+        precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. The octree
+        is built only with the sources. If None, all the particles are
+        sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    theta : float, default=0.5
+        Opening angle. Lower values are more accurate and slower;
+        ``theta=0`` is equivalent to the direct summation.
+    leaf_size : int, default=16
+        Maximum number of particles in a leaf of the octree.
+    batch_size : int, default=1024
+        Number of particles that walk the tree at the same time.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    Notes
+    -----
+    Relative error against the (float64) direct summation on the 57284
+    particles of the ``ID_394242`` galaxy of the test datasets
+    (``softening=0``). The direct summation took 69 s on the same single
+    core.
+
+    =====  ============  =========  =========  ========
+    theta  median error  99% error  max error  time (s)
+    =====  ============  =========  =========  ========
+    0.1    1.5e-06       6.6e-06    1.3e-05    143.6
+    0.2    1.0e-05       7.2e-05    1.4e-04    54.1
+    0.3    4.8e-05       2.5e-04    5.7e-04    13.8
+    0.5    2.2e-04       1.2e-03    2.4e-03    4.6
+    0.7    5.3e-04       2.9e-03    4.5e-03    1.4
+    0.9    1.4e-03       5.8e-03    8.9e-03    1.0
+    =====  ============  =========  =========  ========
+
+    """
+    if sources is None:
+        tree = make_octree(x, y, z, m, leaf_size=leaf_size)
+        self_idx = tree.inverse_order
+        ssoftening = softening
+    else:
+        sources = np.asarray(sources)
+        tree = make_octree(
+            x[sources], y[sources], z[sources], m[sources], leaf_size=leaf_size
+        )
+        # the targets that are not sources have no self interaction
+        self_idx = np.full(len(m), -1, dtype=tree.order.dtype)
+        self_idx[sources] = tree.inverse_order
+        ssoftening = softening[sources] if np.ndim(softening) else softening
+
+    tsoftening = softening
+    if targets is not None:
+        targets = np.asarray(targets)
+        x, y, z = x[targets], y[targets], z[targets]
+        self_idx = self_idx[targets]
+        if np.ndim(softening):
+            tsoftening = softening[targets]
+
+    epot = potential_barnes_hut(
+        tree,
+        x,
+        y,
+        z,
+        tsoftening,
+        theta=theta,
+        self_idx=self_idx,
+        batch_size=batch_size,
+        source_softening=ssoftening if np.ndim(softening) else None,
+    )
+
+    return epot * const.G, np.asarray
+
+
+def fmm_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    order=4,
+    theta=0.6,
+    leaf_size=16,
+):
+    """
+    Fast Multipole Method for the gravitational potential energy calculation.
+
+    Cartesian Taylor expansions of order ``order`` of the softened kernel
+    are translated along a dual traversal of an octree (P2M, M2M, M2L, L2L
+    and L2P); nearby leaves are summed directly. The cost scales as O(N).
+    With one softening per particle the far field is computed for every
+    pair of softening values (e.g. one per particle type), so its cost grows
+    with the square of the number of different values.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. It only sets the dtype of the inputs (done by
+        ``potential()``), this backend always accumulates in double
+        precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. The other
+        particles keep their place in the octree with no mass, so the cost
+        does not drop with the number of sources. If None, all the particles
+        are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. The
+        particles that are neither sources nor targets are dropped. If
+        None, it is evaluated at every particle.
+    order : int, default=4
+        Order ``p`` of the multipole and local expansions.
+    theta : float, default=0.6
+        Multipole acceptance parameter: two nodes interact through their
+        expansions if the sum of their radii is lower than ``theta`` times
+        their distance.
+    leaf_size : int, default=16
+        Maximum number of particles in a leaf of the octree.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    Notes
+    -----
+    Relative error against the (float64) direct summation on the 57284
+    particles of the ``ID_394242`` galaxy of the test datasets
+    (``softening=0``, ``theta=0.6``). The direct summation took 69 s on the
+    same single core.
+
+    =====  ============  =========  =========  ========
+    order  median error  99% error  max error  time (s)
+    =====  ============  =========  =========  ========
+    2      1.8e-04       2.0e-03    6.1e-03    2.5
+    3      2.7e-05       3.8e-04    1.6e-03    8.1
+    4      5.9e-06       8.1e-05    4.3e-04    10.9
+    5      1.7e-06       1.9e-05    1.3e-04    34.0
+    6      5.9e-07       5.6e-06    4.4e-05    38.7
+    7      2.3e-07       2.3e-06    1.5e-05    73.5
+    8      9.1e-08       1.0e-06    7.0e-06    158.1
+    =====  ============  =========  =========  ========
+
+    """
+    if sources is not None:
+        sm = np.zeros_like(m)
+        sm[sources] = m[sources]
+        m = sm
+
+    if targets is not None:
+        # only the targets and the sources enter the octree
+        keep = np.zeros(len(m), dtype=bool)
+        keep[targets] = True
+        keep[np.arange(len(m)) if sources is None else sources] = True
+        position = np.cumsum(keep) - 1
+
+        x, y, z, m = x[keep], y[keep], z[keep], m[keep]
+        if np.ndim(softening):
+            softening = softening[keep]
+
+    tree = make_octree(x, y, z, m, leaf_size=leaf_size)
+    epot = potential_fmm(tree, softening, order=order, theta=theta)
+
+    if targets is not None:
+        epot = epot[position[targets]]
+
+    return epot * const.G, np.asarray
+
+
+def pm_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    n_cells=64,
+    scheme="tsc",
+    p3m=False,
+    split=1.25,
+    cutoff=4.5,
+    n_jobs=None,
+):
+    """
+    Particle-mesh (PM/P3M) gravitational potential energy calculation.
+
+    The mass is assigned to a mesh of cubic cells (CIC or TSC) and the
+    Poisson equation of a gaussian smoothed kernel is solved with a zero
+    padded (isolated boundaries) FFT, then the potential is interpolated
+    back to the particles. With ``p3m=True`` the pairs closer than a few
+    cells are corrected by direct summation to the softened kernel. The
+    cost scales as O(N + M log M), with M the number of cells, so it suits
+    whole zoom-in volumes better than single galaxies.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Only used by the short range correction.
+        Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. With ``"float32"`` the FFT is computed in
+        single precision, otherwise in double precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. Only the
+        sources are assigned to the mesh. If None, all the particles are
+        sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    n_cells : int, default=64
+        Number of cells along the longest side of the bounding box of the
+        particles.
+    scheme : str, default="tsc"
+        Mass assignment scheme, ``"cic"`` (cloud in cell) or ``"tsc"``
+        (triangular shaped cloud).
+    p3m : bool, default=False
+        If True, add the short range direct summation correction (P3M).
+        Otherwise the particles interact as gaussian clouds of about one
+        cell instead of with their softening.
+    split : float, default=1.25
+        Scale ``rs`` of the gaussian smoothing of the mesh kernel, in cells.
+    cutoff : float, default=4.5
+        Radius of the short range correction, in units of ``rs``.
+    n_jobs : int, optional
+        Number of threads of the FFT. ``None`` uses one thread and ``-1``
+        all the available CPUs.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    Notes
+    -----
+    Every particle within ``cutoff * split`` cells of a target enters the
+    short range correction, so on meshes that do not resolve the centre of
+    a concentrated galaxy ``p3m=True`` degrades to a direct summation. The
+    softening is neglected beyond that radius, so it should be smaller than
+    a cell.
+
+    Relative error against the (float64) direct summation on 20000
+    particles of a Hernquist sphere truncated at 50 scale radii
+    (``softening=0.05`` scale radii), on a single core:
+
+    =======  ======  =====  ============  =========  ========
+    n_cells  scheme  p3m    median error  max error  time (s)
+    =======  ======  =====  ============  =========  ========
+    64       cic     False  1.0e-01       6.0e-01    0.3
+    64       cic     True   4.4e-03       4.3e-02    34.7
+    64       tsc     False  1.0e-01       6.2e-01    0.3
+    64       tsc     True   1.1e-03       6.8e-03    39.2
+    256      tsc     False  3.8e-03       2.8e-01    25.7
+    256      tsc     True   7.4e-05       3.1e-03    38.4
+    =======  ======  =====  ============  =========  ========
+
+    """
+    mesh = make_mesh(x, y, z, n_cells=n_cells)
+    epot = potential_pm(
+        mesh,
+        x,
+        y,
+        z,
+        m,
+        softening,
+        sources=sources,
+        targets=targets,
+        scheme=scheme,
+        split=split,
+        p3m=p3m,
+        cutoff=cutoff,
+        dtype=np.float32 if precision == "float32" else np.float64,
+        workers=n_jobs,
+    )
+
+    return epot * const.G, np.asarray
+
+
+def spherical_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    center=None,
+):
+    """
+    Spherical approximation of the gravitational potential energy.
+
+    The mass distribution is replaced by its spherical average around
+    ``center``: the potential at a radius ``r`` is ``G M(<r) / r`` plus the
+    contribution ``G m_j / r_j`` of every particle outside ``r``. The radii
+    are sorted once and both terms are cumulative sums, so the cost is
+    O(N log N). It is a quick-look approximation, adequate for centering or
+    selecting the bound particles of near-spherical systems; use
+    ``spherical_deviation()`` to measure its error on a galaxy.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape:(n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        The radius of every particle is softened as ``sqrt(r**2 + eps**2)``.
+        Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``. With ``"float32"`` the sums are accumulated
+        in single precision, otherwise in double precision.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    center : np.ndarray, optional
+        Center of the spherical average. Shape: (3,). If None, the origin,
+        i.e. the galaxy is assumed to be centered.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    Notes
+    -----
+    Relative error against the (float64) direct summation, and speedup
+    against ``numpy_potential`` (both in ``"mixed"`` precision), on a
+    single core:
+
+    ================  =========  ============  =========  =======
+    galaxy            particles  median error  max error  speedup
+    ================  =========  ============  =========  =======
+    Plummer sphere    10000      3.3e-03       1.9e-02    400x
+    Plummer sphere    100000     1.1e-03       7.1e-03    2800x
+    Hernquist sphere  10000      2.8e-03       2.2e-02    360x
+    Hernquist sphere  100000     9.6e-04       1.2e-02    2800x
+    ID_394242 (disc)  57284      2.8e-02       6.6e-02    1600x
+    ================  =========  ============  =========  =======
+
+    The spheres have ``softening=0.1`` kpc and a scale radius of 3 kpc. The
+    error grows with the flattening of the system, as in the disc galaxy.
+
+    """
+    epot = potential_spherical(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        center=center,
+        sources=sources,
+        targets=targets,
+        dtype=_accumulator_dtype(precision),
+    )
+
+    return epot * const.G, np.asarray
+
+
+def distributed_potential(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    precision=DEFAULT_PRECISION,
+    sources=None,
+    targets=None,
+    backend=DEFAULT_POTENTIAL_BACKEND,
+    executor=None,
+    n_jobs=None,
+    block_size=DEFAULT_CHUNK_SIZE,
+    shared_memory=True,
+    **backend_kws,
+):
+    """
+    Distributed implementation for the gravitational potential calculation.
+
+    The targets are split in blocks of ``block_size`` particles, and every
+    block is computed with another backend by a pool of workers. The
+    particles are broadcast once to the workers through a read-only shared
+    memory block, instead of being serialized with every task.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape:(n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        Shape: (1,) or (n,1).
+    precision : str, default="mixed"
+        One of ``PRECISIONS``, forwarded to the backend of the workers.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    backend : str, default="fortran" if available, else "numpy"
+        Backend of ``POTENTIAL_BACKENDS`` run by the workers.
+    executor : concurrent.futures.Executor, optional
+        Any object with a ``submit(fn, *args)`` method returning futures,
+        e.g. a ``dask.distributed.Client`` or a
+        ``mpi4py.futures.MPIPoolExecutor``. If None, a
+        ``ProcessPoolExecutor`` is created for the calculation (see
+        ``potential_distributed()``: scripts need a ``__main__`` guard).
+    n_jobs : int, optional
+        Number of processes of the default executor. If None, one per CPU.
+    block_size : int, default=2**14
+        Number of targets of every task.
+    shared_memory : bool, default=True
+        Broadcast the particles in a shared memory block. The workers must
+        run on the same node; set it to False with executors that spread
+        the workers over several nodes.
+    backend_kws :
+        Extra keyword arguments for the backend of the workers.
+
+    Returns
+    -------
+    np.ndarray : float
+        Specific potential energy of particles.
+
+    """
+    if backend in (AUTO_BACKEND, "distributed"):
+        raise ValueError(
+            f"{backend!r} can't be the backend of the distributed workers"
+        )
+    backend_function = POTENTIAL_BACKENDS[backend]
+
+    x = np.asarray(x)
+    columns = [x, np.asarray(y), np.asarray(z), np.asarray(m)]
+    softening = np.asarray(softening, dtype=x.dtype)
+    if softening.ndim:
+        # one softening per particle travels with the other columns
+        columns.append(np.broadcast_to(softening, len(x)))
+        softening = None
+
+    if sources is not None:
+        backend_kws["sources"] = sources
+
+    epot = potential_distributed(
+        columns,
+        backend_function,
+        precision=precision,
+        softening=softening,
+        targets=targets,
+        executor=executor,
+        n_jobs=None if n_jobs == -1 else n_jobs,
+        block_size=block_size,
+        shared=shared_memory,
+        backend_kws=backend_kws,
+    )
+
+    # the workers already applied G and the post process of the backend
+    return epot, np.asarray
 
 
 # =============================================================================
@@ -147,12 +1177,265 @@ def numpy_potential(x, y, z, m, softening):
 # =============================================================================
 
 POTENTIAL_BACKENDS = {
+    "distributed": distributed_potential,
+    "fmm": fmm_potential,
     "fortran": fortran_potential,
     "grispy": grispy_potential,
+    "numba": numba_potential,
     "numpy": numpy_potential,
+    "parallel-numpy": parallel_numpy_potential,
+    "pm": pm_potential,
+    "spherical": spherical_potential,
+    "treecode": treecode_potential,
 }
 
 
+# =============================================================================
+# AUTOMATIC BACKEND SELECTION
+# =============================================================================
+
+
+def available_memory():
+    """
+    Physical memory available to new processes.
+
+    Returns
+    -------
+    int or None
+        Available memory in bytes, or None if it can not be determined.
+
+    """
+    try:
+        with open("/proc/meminfo") as fp:
+            for line in fp:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def available_cpus():
+    """
+    Return the number of CPUs available to the current process.
+
+    Returns
+    -------
+    int
+
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _has_numba():
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def select_backend(size, *, memory=None, n_cpus=None):
+    """
+    Choose the potential backend for a number of particles.
+
+    The rules are, in order:
+
+    - Up to ``AUTO_NUMPY_MAX_SIZE`` particles, ``"numpy"`` (or
+      ``"parallel-numpy"`` with more than one CPU).
+    - Up to ``AUTO_DIRECT_MAX_SIZE`` particles, the compiled direct
+      summation: ``"fortran"`` if the extension is compiled, or ``"numba"``
+      if it is installed.
+    - Otherwise ``"treecode"``, if its estimated memory fits in half of the
+      available memory.
+    - Otherwise a direct summation, whose memory does not grow with the
+      number of particles.
+
+    The tiles of the numpy backends are limited to a quarter of the
+    available memory.
+
+    Parameters
+    ----------
+    size : int
+        Number of particles.
+    memory : int, optional
+        Available memory in bytes. Defaults to ``available_memory()``.
+    n_cpus : int, optional
+        Number of CPUs to use. Defaults to ``available_cpus()``.
+
+    Returns
+    -------
+    backend : str
+        Name of the backend in ``POTENTIAL_BACKENDS``.
+    backend_kws : dict
+        Keyword arguments for the backend.
+
+    """
+    memory = available_memory() if memory is None else memory
+    n_cpus = available_cpus() if n_cpus is None else n_cpus
+
+    compiled = (
+        "fortran"
+        if potential_f is not None
+        else ("numba" if _has_numba() else None)
+    )
+    tree_fits = (
+        memory is None or size * TREECODE_BYTES_PER_PARTICLE <= memory / 2
+    )
+
+    if size <= AUTO_NUMPY_MAX_SIZE or (compiled is None and not tree_fits):
+        backend = "numpy" if n_cpus == 1 else "parallel-numpy"
+    elif size <= AUTO_DIRECT_MAX_SIZE and compiled is not None:
+        backend = compiled
+    elif tree_fits:
+        backend = "treecode"
+    else:
+        backend = compiled
+
+    backend_kws = {}
+    if backend in ("parallel-numpy", "numba"):
+        backend_kws.update(n_jobs=n_cpus)
+    if backend in ("numpy", "parallel-numpy") and memory is not None:
+        backend_kws.update(max_memory=min(NUMPY_MAX_MEMORY, memory // 4))
+
+    logger.info(
+        "Selected potential backend %r with %s for %d particles "
+        "(available memory: %s bytes, cpus: %d)",
+        backend,
+        backend_kws,
+        size,
+        memory,
+        n_cpus,
+    )
+    return backend, backend_kws
+
+
+def _resolve_backend(backend, size, backend_kws):
+    """Replace the "auto" backend by the selected one."""
+    if backend != AUTO_BACKEND:
+        return backend, backend_kws
+
+    backend_kws = dict(backend_kws)
+    backend, auto_kws = select_backend(
+        size, n_cpus=backend_kws.pop("n_jobs", None)
+    )
+    # the explicit keyword arguments take precedence
+    auto_kws.update(backend_kws)
+    return backend, auto_kws
+
+
+# =============================================================================
+# CHUNKED EXECUTION
+# =============================================================================
+
+
+class PotentialCancelledError(RuntimeError):
+    """Used to inform that a potential calculation was cancelled."""
+
+
+@attr.s(frozen=True, slots=True, repr=False)
+class PotentialProgress:
+    """State of a chunked potential calculation.
+
+    Parameters
+    ----------
+    done : int
+        Number of particles with the potential computed.
+    total : int
+        Number of particles to compute.
+    elapsed : float
+        Seconds since the start of the calculation.
+
+    """
+
+    done = attr.ib()
+    total = attr.ib()
+    elapsed = attr.ib()
+
+    def __repr__(self):
+        """repr(x) <=> x.__repr__()."""
+        return (
+            f"<PotentialProgress {self.done}/{self.total}, "
+            f"elapsed={self.elapsed:.1f}s, eta={self.eta:.1f}s>"
+        )
+
+    @property
+    def fraction(self):
+        """Fraction of the particles already computed."""
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def eta(self):
+        """Estimated seconds to finish the calculation."""
+        if not self.done:
+            return float("inf")
+        return self.elapsed / self.done * (self.total - self.done)
+
+
+def _chunked_backend(
+    backend_function, chunk_size, progress, cancel, passes, split=True
+):
+    """Wrap a backend to compute the potential in chunks of targets.
+
+    Between the chunks, ``progress`` is called and ``cancel`` is checked.
+    The progress accounts for all the ``passes`` calls of the wrapper. If
+    ``split`` is False, every call is computed in a single chunk, without
+    ``targets``.
+
+    """
+    chunk_size = DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size
+    if chunk_size < 1:
+        raise ValueError("'chunk_size' must be >= 1")
+
+    state = {"done": 0, "start": None}
+
+    def run(x, y, z, m, softening, *, sources=None, **kws):
+        targets = np.arange(len(m))
+        total = len(targets) * passes
+        if state["start"] is None:
+            state["start"] = time.perf_counter()
+
+        step = chunk_size if split else max(len(targets), 1)
+
+        parts = []
+        for cstart in range(0, len(targets), step):
+            if cancel is not None and cancel.is_set():
+                raise PotentialCancelledError(
+                    f"Potential calculation cancelled after "
+                    f"{state['done']} of {total} particles"
+                )
+
+            cstop = cstart + step
+            chunk = targets[cstart:cstop]
+            pot, postproc = backend_function(
+                x,
+                y,
+                z,
+                m,
+                softening,
+                sources=sources,
+                targets=chunk if split else None,
+                **kws,
+            )
+            parts.append(np.asarray(postproc(pot)))
+
+            state["done"] += len(chunk)
+            if progress is not None:
+                elapsed = time.perf_counter() - state["start"]
+                progress(PotentialProgress(state["done"], total, elapsed))
+
+        return np.concatenate(parts), np.asarray
+
+    return run
+
+
 class Potentializer(GalaxyTransformerABC):
     """
     Potentializer class.
@@ -164,8 +1447,33 @@ class Potentializer(GalaxyTransformerABC):
     ----------
     galaxy : ``Galaxy class`` object
         The galaxy object without the potential energy of particles
-    backends : str, default="numpy"
-        Method to calculate the potential energy of each particle
+    backend : str, default="numpy"
+        Method to calculate the potential energy of each particle, or
+        ``"auto"`` to choose it with ``select_backend()``.
+    n_jobs : int, optional
+        Number of workers of the ``PARALLEL_BACKENDS`` (or of the backend
+        chosen by ``"auto"``). If ``None``, the backend default is used.
+        Other backends do not accept it.
+    precision : str, default="mixed"
+        Floating point precision of the calculation, one of ``PRECISIONS``.
+    source_fraction : float, optional
+        Fraction of the particles used as sources of the field (see
+        ``potential()``). If None, all the particles are sources.
+    seed : int or np.random.Generator, optional
+        Seed of the random subsample of sources.
+    cache : str, os.PathLike or PotentialCache, optional
+        On-disk cache of the results (see ``potential()``), to skip the
+        calculation when the same galaxy is transformed again.
+    chunk_size : int, optional
+        Number of particles of every chunk (see ``potential()``).
+    progress : callable, optional
+        Called after every chunk with a ``PotentialProgress``.
+    cancel : threading.Event, optional
+        Cancellation token checked between the chunks.
+    backend_kws :
+        Extra keyword arguments for the backend function
+        (e.g. ``block_size`` for the ``"numpy"`` backend, ``theta`` for the
+        ``"treecode"`` backend or ``order`` for the ``"fmm"`` backend).
 
     Returns
     -------
@@ -175,10 +1483,34 @@ class Potentializer(GalaxyTransformerABC):
 
     """
 
-    def __init__(self, backend=DEFAULT_POTENTIAL_BACKEND):
+    def __init__(
+        self,
+        backend=DEFAULT_POTENTIAL_BACKEND,
+        *,
+        n_jobs=None,
+        precision=DEFAULT_PRECISION,
+        source_fraction=None,
+        seed=None,
+        cache=None,
+        chunk_size=None,
+        progress=None,
+        cancel=None,
+        **backend_kws,
+    ):
         self.backend = backend
+        self.n_jobs = n_jobs
+        self.precision = precision
+        self.source_fraction = source_fraction
+        self.seed = seed
+        self.cache = _make_cache(cache)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.cancel = cancel
+        self.backend_kws = backend_kws
 
-        if self.backend not in POTENTIAL_BACKENDS:
+        if self.backend not in POTENTIAL_BACKENDS and (
+            self.backend != AUTO_BACKEND
+        ):
             raise TypeError(
                 "The backend entered is not in the possible Backends"
             )
@@ -186,9 +1518,31 @@ class Potentializer(GalaxyTransformerABC):
             print("CREATED POTENCIALIZER WITH BACKEND  " + self.backend)
             pass
 
+        if self.n_jobs is not None and self.backend not in (
+            PARALLEL_BACKENDS + (AUTO_BACKEND,)
+        ):
+            raise ValueError(
+                f"The {self.backend!r} backend does not accept 'n_jobs'. "
+                f"Available: {PARALLEL_BACKENDS + (AUTO_BACKEND,)}"
+            )
+
     @doc_inherit(GalaxyTransformerABC.transform)
     def transform(self, galaxy):
-        return potential(galaxy, backend=self.backend)
+        backend_kws = dict(self.backend_kws)
+        if self.n_jobs is not None:
+            backend_kws.update(n_jobs=self.n_jobs)
+        return potential(
+            galaxy,
+            backend=self.backend,
+            precision=self.precision,
+            source_fraction=self.source_fraction,
+            seed=self.seed,
+            cache=self.cache,
+            chunk_size=self.chunk_size,
+            progress=self.progress,
+            cancel=self.cancel,
+            **backend_kws,
+        )
 
     @doc_inherit(GalaxyTransformerABC.checker)
     def checker(self, galaxy, **kwargs):
@@ -200,22 +1554,173 @@ class Potentializer(GalaxyTransformerABC):
 # =============================================================================
 
 
-def potential(galaxy, *, backend=DEFAULT_POTENTIAL_BACKEND):
+def _shared_softening(softening):
+    """Collapse a softening shared by all the particles to a scalar."""
+    if len(softening) and np.all(softening == softening[0]):
+        # a shared softening keeps the scalar paths of the backends
+        return np.asarray(softening[0])
+    return softening
+
+
+def _split_sources(size, source_fraction, seed):
+    """Two disjoint random halves of a subsample of the particles."""
+    if not 0 < source_fraction <= 1:
+        raise ValueError("'source_fraction' must be in the interval (0, 1]")
+    if size < 2:
+        raise ValueError("'source_fraction' needs at least two particles")
+
+    n_sources = min(size, max(2, int(round(source_fraction * size))))
+
+    random = np.random.default_rng(seed)
+    subsample = random.choice(size, n_sources, replace=False)
+
+    half = n_sources // 2
+    return np.sort(subsample[:half]), np.sort(subsample[half:])
+
+
+def _make_cache(cache):
+    """Coerce the ``cache`` parameter into a PotentialCache or None."""
+    if cache is None or isinstance(cache, PotentialCache):
+        return cache
+    return PotentialCache(cache)
+
+
+def _potential_values(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    backend_function,
+    precision,
+    source_fraction,
+    seed,
+    backend_kws,
+):
+    """Potential and its error estimate of every particle."""
+    dtype = PRECISIONS[precision]
+    if source_fraction is None:
+        pot, postproc = backend_function(
+            x, y, z, m, softening, precision=precision, **backend_kws
+        )
+        pot = postproc(pot)
+        error = np.zeros(len(pot))
+    else:
+        estimates = []
+        for sources in _split_sources(len(m), source_fraction, seed):
+            # every source stands for len(m) / len(sources) particles
+            scaled_m = (m * (len(m) / len(sources))).astype(dtype)
+            spot, postproc = backend_function(
+                x,
+                y,
+                z,
+                scaled_m,
+                softening,
+                precision=precision,
+                sources=sources,
+                **backend_kws,
+            )
+            estimates.append(np.asarray(postproc(spot), dtype=np.float64))
+
+        pot = (estimates[0] + estimates[1]) / 2
+        # standard error of the mean of two independent estimates
+        error = np.abs(estimates[0] - estimates[1]) / 2
+        del estimates
+
+    return pot, error
+
+
+def potential(
+    galaxy,
+    *,
+    backend=DEFAULT_POTENTIAL_BACKEND,
+    precision=DEFAULT_PRECISION,
+    source_fraction=None,
+    seed=None,
+    return_error=False,
+    cache=None,
+    chunk_size=None,
+    progress=None,
+    cancel=None,
+    **backend_kws,
+):
     """
     Potential energy calculation.
 
     Given the positions and masses of particles, calculate
     their specific gravitational potential energy as a function.
+    Every particle keeps the softening of its type, and every pair of
+    particles is softened with ``(softening_i**2 + softening_j**2) / 2``.
 
     Parameters
     ----------
     galaxy : ``Galaxy class`` object
+    backend : str, default="fortran" if available, else "numpy"
+        Name of the implementation in ``POTENTIAL_BACKENDS`` to use, or
+        ``"auto"`` to choose it with ``select_backend()``.
+    precision : str, default="mixed"
+        Floating point precision of the calculation. ``"float32"`` works in
+        single precision, ``"float64"`` in double precision and ``"mixed"``
+        uses single precision positions and masses with double precision
+        accumulators.
+    source_fraction : float, optional
+        If given, only a random subsample with this fraction of the
+        particles is used as sources of the field, with their masses scaled
+        by ``1 / source_fraction``, and the potential is evaluated at every
+        particle. The subsample is split in two independent halves, and the
+        potential is the mean of the estimates of both halves. Must be in
+        the interval (0, 1]. If None, all the particles are sources.
+    seed : int or np.random.Generator, optional
+        Seed of the random subsample of sources.
+    return_error : bool, default=False
+        If True, also return the error estimate of the potential of every
+        particle: half the difference between the estimates of both halves
+        of the subsample of sources (zero without ``source_fraction``).
+    cache : str, os.PathLike or PotentialCache, optional
+        On-disk cache of the results. The potential of a galaxy with the
+        same positions, masses and softening, computed with the same
+        parameters, is read from the cache instead of computed again. The
+        workers, executor and tiles of the backend are not part of the key,
+        and ``"auto"`` is keyed as the backend it selects. A path is used
+        as the directory of a ``PotentialCache`` with the default size.
+        Results of a random subsample of sources are only cached with an
+        integer ``seed``. If None, nothing is cached.
+    chunk_size : int, optional
+        If given, the potential is computed in chunks of this number of
+        particles, with ``progress`` and ``cancel`` checked between the
+        chunks. Defaults to ``DEFAULT_CHUNK_SIZE`` when ``progress`` or
+        ``cancel`` are given. Only the ``DIRECT_BACKENDS`` are split in
+        chunks. The other backends build their tree, expansions or mesh
+        once, and the ``symmetric=True`` kernel of ``"fortran"`` needs all
+        the pairs at once, so they run in a single chunk: ``cancel`` is
+        checked before it and ``progress`` called after it.
+    progress : callable, optional
+        Called after every chunk with a ``PotentialProgress`` (particles
+        done, total, elapsed time and ETA), e.g. to send heartbeats. An
+        exception raised by the callback aborts the calculation.
+    cancel : threading.Event, optional
+        Cancellation token; any object with an ``is_set()`` method. When it
+        is set, a ``PotentialCancelledError`` is raised before the next
+        chunk; a running chunk is not interrupted.
+    backend_kws :
+        Extra keyword arguments for the backend function.
 
     Returns
     -------
     galaxy: new ``Galaxy class`` object
         A new galaxy object with the specific potential energy of particles
         calculated.
+    error : astropy.units.Quantity
+        Error estimate of the specific potential energy of the particles,
+        in the order of ``galaxy.to_dataframe()`` (stars, dark matter and
+        gas). Only returned if ``return_error`` is True.
+
+    Notes
+    -----
+    The cost of the direct summation backends scales with the number of
+    sources, so ``source_fraction=0.1`` is about ten times faster. The
+    error of the subsample estimate decreases as ``1 / sqrt(n_sources)``.
     """
     if galaxy.has_potential_:
         warnings.warn(
@@ -224,43 +1729,660 @@ def potential(galaxy, *, backend=DEFAULT_POTENTIAL_BACKEND):
             UserWarning,
         )
 
-    # extract the implementation
-    backend_function = POTENTIAL_BACKENDS[backend]
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r}. "
+            f"Available: {sorted(PRECISIONS)}"
+        )
+
+    # check the implementation, "auto" is resolved with the particles
+    if backend != AUTO_BACKEND:
+        POTENTIAL_BACKENDS[backend]
 
-    # convert the galaxy in multiple arrays
-    df = galaxy.to_dataframe(attributes=["x", "y", "z", "m", "softening"])
-    x = df.x.to_numpy(dtype=np.float32)
-    y = df.y.to_numpy(dtype=np.float32)
-    z = df.z.to_numpy(dtype=np.float32)
-    m = df.m.to_numpy(dtype=np.float32)
-    softening = np.asarray(df.softening.max(), dtype=np.float32)
+    # the columns of the galaxy, without copying them if they have the dtype
+    arrays = _particle_arrays(
+        galaxy, ["x", "y", "z", "m", "softening"], dtype=PRECISIONS[precision]
+    )
+    x, y, z, m = arrays["x"], arrays["y"], arrays["z"], arrays["m"]
+    softening = _shared_softening(arrays["softening"])
 
-    # cleanup df
-    del df
+    # cleanup the arrays
+    del arrays
 
-    # execute the function and return
-    pot, postproc = backend_function(x, y, z, m, softening)
+    # "auto" is resolved first, so its results share the cache entries of
+    # the selected backend
+    backend, backend_kws = _resolve_backend(backend, len(m), backend_kws)
+
+    # look for a previous result of the same calculation
+    cache = _make_cache(cache)
+    key = None
+    if cache is not None and (
+        source_fraction is None or isinstance(seed, numbers.Integral)
+    ):
+        # the workers, executors and tiles do not change the result (and
+        # the repr of an executor changes on every run)
+        key_kws = {
+            k: v for k, v in backend_kws.items() if k not in _EXECUTION_KWS
+        }
+        key = content_hash(
+            x,
+            y,
+            z,
+            m,
+            softening,
+            backend=backend,
+            precision=precision,
+            source_fraction=source_fraction,
+            seed=seed,
+            **key_kws,
+        )
+
+    cached = None if key is None else cache.get(key)
+    if cached is not None:
+        pot, error = cached
+    else:
+        backend_function = POTENTIAL_BACKENDS[backend]
+        if not (chunk_size is None and progress is None and cancel is None):
+            backend_function = _chunked_backend(
+                backend_function,
+                chunk_size,
+                progress,
+                cancel,
+                passes=1 if source_fraction is None else 2,
+                # the tree and mesh backends would be rebuilt every chunk,
+                # and the symmetric kernel does not take targets
+                split=(
+                    backend in DIRECT_BACKENDS
+                    and not backend_kws.get("symmetric", False)
+                ),
+            )
+
+        pot, error = _potential_values(
+            x,
+            y,
+            z,
+            m,
+            softening,
+            backend_function=backend_function,
+            precision=precision,
+            source_fraction=source_fraction,
+            seed=seed,
+            backend_kws=backend_kws,
+        )
+        if key is not None:
+            cache.put(key, np.stack((pot, error)))
 
     # cleanup again
     del x, y, z, m, softening
 
-    # apply the post process to the final potential
-    pot = postproc(pot)
+    # recreate a new galaxy, only the potential is new and the other columns
+    # are shared; the slices of the potential are joined again without a copy
+    potential = -pot
+    new = galaxy.disassemble(copy=False)
+    for suffix, pslice in zip(("s", "dm", "g"), galaxy.slices_.values()):
+        new[f"potential_{suffix}"] = potential[pslice]
+
+    # the potential is stored in the dtype of the galaxy
+    new = core.mkgalaxy(**new, copy=False, dtype=galaxy.dtype_)
+    if return_error:
+        return new, error * (u.km / u.s) ** 2
+    return new
+
+
+def potential_at(
+    targets_xyz,
+    sources_xyz,
+    sources_m,
+    softening,
+    *,
+    backend=DEFAULT_POTENTIAL_BACKEND,
+    precision=DEFAULT_PRECISION,
+    targets_softening=None,
+    self_idx=None,
+    **backend_kws,
+):
+    """
+    Potential energy of a set of targets due to a set of sources.
+
+    Lower level version of ``potential()`` that works with plain arrays and
+    only evaluates the potential at the targets, e.g. the stars of a galaxy
+    against all its particles, or the points of a radial grid. The cost of
+    the direct summation backends scales with the number of targets times
+    the number of sources.
+
+    Parameters
+    ----------
+    targets_xyz : np.ndarray
+        Positions (in kpc) where the potential is evaluated. Shape: (k,3).
+    sources_xyz : np.ndarray
+        Positions (in kpc) of the sources of the field. Shape: (n,3).
+    sources_m : np.ndarray
+        Masses (in solar masses) of the sources. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening (in kpc) of the sources, shared by all of them or one per
+        source. Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as
+        squared softening. Shape: (1,) or (n,1).
+    backend : str, default="fortran" if available, else "numpy"
+        Name of the implementation in ``POTENTIAL_BACKENDS`` to use, or
+        ``"auto"`` to choose it with ``select_backend()``.
+    precision : str, default="mixed"
+        Floating point precision of the calculation, one of ``PRECISIONS``.
+    targets_softening : float or np.ndarray, optional
+        Softening (in kpc) of the targets. Defaults to ``softening`` if it
+        is shared by all the sources, and it is required otherwise. The
+        targets of ``self_idx`` always take the softening of their source.
+        Shape: (1,) or (k,1).
+    self_idx : np.ndarray, optional
+        Index of the source that is the same particle as every target, or
+        ``-1`` if none. The self interaction of those targets is skipped.
+        If None, no target is a source. Shape: (k,1).
+    backend_kws :
+        Extra keyword arguments for the backend function.
+
+    Returns
+    -------
+    potential : astropy.units.Quantity
+        Specific potential energy of the targets, in (km/s)**2.
+        Shape: (k,1).
+
+    Examples
+    --------
+    The potential of the stars of a galaxy due to all its particles:
+
+    >>> arrays = galaxy.to_arrays(["x", "y", "z", "m", "softening"])
+    >>> xyz = np.column_stack((arrays["x"], arrays["y"], arrays["z"]))
+    >>> stars = np.arange(len(galaxy.stars))
+    >>> pot = potential_at(
+    ...     xyz[stars], xyz, arrays["m"], arrays["softening"],
+    ...     self_idx=stars,
+    ... )
+
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r}. "
+            f"Available: {sorted(PRECISIONS)}"
+        )
+
+    dtype = PRECISIONS[precision]
+
+    targets_xyz = np.asarray(targets_xyz, dtype=dtype).reshape(-1, 3)
+    sources_xyz = np.asarray(sources_xyz, dtype=dtype).reshape(-1, 3)
+
+    backend, backend_kws = _resolve_backend(
+        backend, max(len(targets_xyz), len(sources_xyz)), backend_kws
+    )
+    backend_function = POTENTIAL_BACKENDS[backend]
+    sources_m = np.broadcast_to(
+        np.asarray(sources_m, dtype=dtype), len(sources_xyz)
+    )
+    n_sources = len(sources_xyz)
+
+    self_idx = (
+        np.full(len(targets_xyz), -1)
+        if self_idx is None
+        else np.asarray(self_idx)
+    )
+    if self_idx.shape != (len(targets_xyz),):
+        raise ValueError("'self_idx' must have one index per target")
+
+    # the targets that are not sources become massless particles
+    extra = self_idx < 0
+    n_extra = np.count_nonzero(extra)
+
+    softening = np.broadcast_to(np.asarray(softening, dtype=dtype), n_sources)
+    if n_extra:
+        if targets_softening is None:
+            if len(np.unique(softening)) > 1:
+                raise ValueError(
+                    "'targets_softening' is required when the sources have "
+                    "different softening"
+                )
+            targets_softening = softening[0] if n_sources else 0
+        targets_softening = np.broadcast_to(
+            np.asarray(targets_softening, dtype=dtype), len(targets_xyz)
+        )[extra]
+        softening = np.concatenate((softening, targets_softening))
+
+    x, y, z = np.concatenate((sources_xyz, targets_xyz[extra])).T
+    m = np.concatenate((sources_m, np.zeros(n_extra, dtype=dtype)))
+
+    targets = self_idx.copy()
+    targets[extra] = n_sources + np.arange(n_extra)
+
+    pot, postproc = backend_function(
+        np.ascontiguousarray(x),
+        np.ascontiguousarray(y),
+        np.ascontiguousarray(z),
+        m,
+        _shared_softening(softening),
+        precision=precision,
+        sources=np.arange(n_sources) if n_extra else None,
+        targets=targets,
+        **backend_kws,
+    )
+
+    return -np.asarray(postproc(pot), dtype=np.float64) * (u.km / u.s) ** 2
+
+
+def _open_output(out, size):
+    """Coerce the ``out`` parameter into a float64 array of ``size``."""
+    if out is None:
+        return np.empty(size, dtype=np.float64)
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(
+            out, mode="w+", dtype=np.float64, shape=(size,)
+        )
+    if out.shape != (size,):
+        raise ValueError(f"'out' must have shape {(size,)}")
+    return out
+
+
+def potential_out_of_core(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    out=None,
+    backend=DEFAULT_POTENTIAL_BACKEND,
+    precision=DEFAULT_PRECISION,
+    block_size=DEFAULT_CHUNK_SIZE,
+    progress=None,
+    cancel=None,
+    **backend_kws,
+):
+    """
+    Potential energy of particles that do not fit in memory.
+
+    Version of ``potential()`` for plain arrays, typically ``np.memmap``
+    arrays backed by files, that never loads all the particles. The
+    targets and the sources are streamed in blocks of ``block_size``
+    particles: the contribution of every block of sources to a block of
+    targets is computed with a direct summation backend, and the potential
+    of every block of targets is written into ``out``. The peak memory
+    depends on ``block_size`` but not on the number of particles, and the
+    cost is O(N²).
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles (in kpc). Shape: (n,1).
+    m : np.ndarray
+        Masses of particles (in solar masses). Shape: (n,1).
+    softening : float or np.ndarray
+        Softening (in kpc), shared by all the particles or one per particle.
+        Every pair uses ``(softening_i**2 + softening_j**2) / 2`` as squared
+        softening. Shape: (1,) or (n,1).
+    out : str, os.PathLike or np.ndarray, optional
+        Where the potential is written. A path creates a ``.npy`` file
+        opened as a memory map (it can be read back with
+        ``np.load(path, mmap_mode="r")``). If None, a new in-memory array
+        is returned.
+    backend : str, default="fortran" if available, else "numpy"
+        Name of the implementation to use, one of ``DIRECT_BACKENDS``.
+    precision : str, default="mixed"
+        Floating point precision of the calculation, one of ``PRECISIONS``.
+    block_size : int, default=DEFAULT_CHUNK_SIZE
+        Number of targets and sources of every block.
+    progress : callable, optional
+        Called after every block of targets with a ``PotentialProgress``.
+    cancel : threading.Event, optional
+        Cancellation token checked before every block of sources. When it is
+        set a ``PotentialCancelledError`` is raised, and ``out`` keeps the
+        potential of the finished blocks of targets.
+    backend_kws :
+        Extra keyword arguments for the backend function.
+
+    Returns
+    -------
+    np.ndarray
+        Specific potential energy of the particles in (km/s)**2, as a
+        float64 array (the ``out`` array or memory map). Shape: (n,1).
+
+    Examples
+    --------
+    >>> x, y, z, m = (
+    ...     np.load(f"{col}.npy", mmap_mode="r") for col in "xyzm"
+    ... )
+    >>> pot = potential_out_of_core(x, y, z, m, 0.1, out="potential.npy")
+
+    """
+    if backend not in DIRECT_BACKENDS:
+        raise ValueError(
+            f"The out-of-core calculation needs a direct summation backend. "
+            f"Available: {DIRECT_BACKENDS}"
+        )
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r}. "
+            f"Available: {sorted(PRECISIONS)}"
+        )
+    if block_size < 1:
+        raise ValueError("'block_size' must be >= 1")
+
+    backend_function = POTENTIAL_BACKENDS[backend]
+    dtype = PRECISIONS[precision]
+    size = len(m)
+    shared_softening = np.ndim(softening) == 0
+    out = _open_output(out, size)
+
+    def _block(start):
+        # read a block of particles from the (possibly memory mapped) arrays
+        sl = slice(start, start + block_size)
+        arrays = [np.asarray(arr[sl], dtype=dtype) for arr in (x, y, z, m)]
+        soft = (
+            np.asarray(softening, dtype=dtype)
+            if shared_softening
+            else np.asarray(softening[sl], dtype=dtype)
+        )
+        return arrays, soft
+
+    def _join(soft_a, soft_b):
+        if shared_softening:
+            return soft_a
+        return np.concatenate((soft_a, soft_b))
+
+    start_time = time.perf_counter()
+    for tstart in range(0, size, block_size):
+        (tx, ty, tz, tm), tsoft = _block(tstart)
+        n_targets = len(tm)
+        epot = np.zeros(n_targets, dtype=np.float64)
+
+        for sstart in range(0, size, block_size):
+            if cancel is not None and cancel.is_set():
+                raise PotentialCancelledError(
+                    f"Potential calculation cancelled after {tstart} of "
+                    f"{size} particles"
+                )
+
+            if sstart == tstart:
+                # the block against itself skips the self interactions
+                pot, postproc = backend_function(
+                    tx, ty, tz, tm, tsoft, precision=precision, **backend_kws
+                )
+            else:
+                (sx, sy, sz, sm), ssoft = _block(sstart)
+                n_sources = len(sm)
+                pot, postproc = backend_function(
+                    np.concatenate((tx, sx)),
+                    np.concatenate((ty, sy)),
+                    np.concatenate((tz, sz)),
+                    np.concatenate((tm, sm)),
+                    _join(tsoft, ssoft),
+                    precision=precision,
+                    sources=n_targets + np.arange(n_sources),
+                    targets=np.arange(n_targets),
+                    **backend_kws,
+                )
+            epot += np.asarray(postproc(pot), dtype=np.float64)
+
+        tstop = tstart + n_targets
+        out[tstart:tstop] = -epot
+
+        if progress is not None:
+            elapsed = time.perf_counter() - start_time
+            progress(PotentialProgress(tstop, size, elapsed))
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def _particle_arrays(particles, attributes, dtype=np.float64):
+    """Columns of a Galaxy or a ParticleSet as a dict of arrays."""
+    if isinstance(particles, core.Galaxy):
+        psets = [particles.stars, particles.dark_matter, particles.gas]
+        columns = particles.columns_
+    else:
+        psets = [particles]
+        columns = {
+            cname: getattr(particles.arr_, cname)
+            for cname in core.PARTICLE_SET_COLUMNS
+        }
+    lengths = [len(pset) for pset in psets]
+
+    arrays = {}
+    for aname in attributes:
+        if aname == "softening":
+            softenings = [pset.arr_.softening for pset in psets]
+            arrays[aname] = np.repeat(softenings, lengths).astype(dtype)
+        else:
+            # the columns are read-only views, without copying them
+            arrays[aname] = columns[aname].astype(dtype, copy=False)
+    arrays["ptypev"] = np.repeat([pset.ptype.value for pset in psets], lengths)
+    return arrays
+
+
+def update_potential(
+    galaxy,
+    *,
+    removed=None,
+    added=None,
+    backend=DEFAULT_POTENTIAL_BACKEND,
+    precision=DEFAULT_PRECISION,
+    **backend_kws,
+):
+    """
+    Incremental update of the potential energy of a galaxy.
+
+    Corrects an already computed potential after removing or adding a few
+    particles, instead of computing it again. The contribution of the
+    ``removed`` particles is subtracted from the potential of every particle
+    of the galaxy, and the contribution of the ``added`` particles is added.
+    The cost is O(N·k) for k removed or added particles, instead of the
+    O(N²) of ``potential()``.
+
+    Parameters
+    ----------
+    galaxy : ``Galaxy class`` object
+        Galaxy with the potential energy computed. It must not contain the
+        ``removed`` particles (e.g. the output of a crop) nor the ``added``
+        ones.
+    removed : ``Galaxy class`` or ``ParticleSet class`` object, optional
+        Particles that were removed from the galaxy after its potential was
+        computed.
+    added : ``Galaxy class`` or ``ParticleSet class`` object, optional
+        Particles to add to the galaxy. They are appended to the particles
+        of their type, and must have the same softening. Their potential is
+        computed against all the particles of the new galaxy.
+    backend : str, default="fortran" if available, else "numpy"
+        Name of the implementation in ``POTENTIAL_BACKENDS`` to use, or
+        ``"auto"`` to choose it with ``select_backend()``.
+    precision : str, default="mixed"
+        Floating point precision of the calculation, one of ``PRECISIONS``.
+    backend_kws :
+        Extra keyword arguments for the backend function.
+
+    Returns
+    -------
+    galaxy: new ``Galaxy class`` object
+        A new galaxy object with the updated specific potential energy of
+        the particles, and the ``added`` particles.
+
+    Raises
+    ------
+    NoGravitationalPotentialError
+        If the galaxy does not have the potential energy computed.
+
+    """
+    if not galaxy.has_potential_:
+        raise core.NoGravitationalPotentialError(
+            "Galaxy must have the potential energy computed to be updated"
+        )
+
+    kws = dict(backend=backend, precision=precision, **backend_kws)
+
+    current = _particle_arrays(
+        galaxy, ["x", "y", "z", "m", "softening", "potential"]
+    )
+    xyz = np.column_stack((current["x"], current["y"], current["z"]))
+    pot = current["potential"]
+
+    if removed is not None and len(removed):
+        rem = _particle_arrays(removed, ["x", "y", "z", "m", "softening"])
+        rem_pot = potential_at(
+            xyz,
+            np.column_stack((rem["x"], rem["y"], rem["z"])),
+            rem["m"],
+            rem["softening"],
+            targets_softening=current["softening"],
+            **kws,
+        )
+        pot = pot - rem_pot.value
+
+    add = None
+    if added is not None and len(added):
+        add = _particle_arrays(
+            added, ["x", "y", "z", "vx", "vy", "vz", "m", "softening"]
+        )
+        add_xyz = np.column_stack((add["x"], add["y"], add["z"]))
+        add_pot = potential_at(
+            xyz,
+            add_xyz,
+            add["m"],
+            add["softening"],
+            targets_softening=current["softening"],
+            **kws,
+        )
+        pot = pot + add_pot.value
+
+        # the added particles feel all the particles of the new galaxy
+        add["potential"] = potential_at(
+            add_xyz,
+            np.concatenate((xyz, add_xyz)),
+            np.concatenate((current["m"], add["m"])),
+            np.concatenate((current["softening"], add["softening"])),
+            self_idx=len(xyz) + np.arange(len(add_xyz)),
+            **kws,
+        ).value
 
     # recreate a new galaxy
-    num_s = len(galaxy.stars)
-    num = len(galaxy.stars) + len(galaxy.dark_matter)
+    new = galaxy.disassemble(copy=False)
+    for ptype, suffix in (
+        (core.ParticleSetType.STARS, "s"),
+        (core.ParticleSetType.DARK_MATTER, "dm"),
+        (core.ParticleSetType.GAS, "g"),
+    ):
+        new[f"potential_{suffix}"] = pot[galaxy.slices_[ptype.humanize()]]
+        if add is None or not np.any(add["ptypev"] == ptype.value):
+            continue
+
+        mask = add["ptypev"] == ptype.value
+        softening = np.unique(add["softening"][mask])
+        current_softening = new[f"softening_{suffix}"]
+        if len(softening) > 1 or (
+            len(new[f"m_{suffix}"]) and softening[0] != current_softening
+        ):
+            raise ValueError(
+                f"The added {ptype.humanize()} particles must have the "
+                "softening of the galaxy"
+            )
+        new[f"softening_{suffix}"] = softening[0]
+        for aname in ("m", "x", "y", "z", "vx", "vy", "vz", "potential"):
+            key = f"{aname}_{suffix}"
+            new[key] = np.concatenate((new[key], add[aname][mask]))
+
+    return core.mkgalaxy(**new, copy=False, dtype=galaxy.dtype_)
+
+
+# =============================================================================
+# SPHERICAL APPROXIMATION DIAGNOSTIC
+# =============================================================================
 
-    pot_s = pot[:num_s]
-    pot_dm = pot[num_s:num]
-    pot_g = pot[num:]
 
-    new = galaxy.disassemble()
+@attr.s(frozen=True, slots=True, repr=False)
+class SphericalDeviation:
+    """Deviation of the spherical approximation from the direct summation.
 
-    new.update(
-        potential_s=-pot_s * (u.km / u.s) ** 2,
-        potential_dm=-pot_dm * (u.km / u.s) ** 2,
-        potential_g=-pot_g * (u.km / u.s) ** 2,
+    Parameters
+    ----------
+    targets : np.ndarray
+        Indices (in the order of ``galaxy.to_dataframe()``) of the particles
+        where the deviation was measured.
+    deviation : np.ndarray
+        Relative deviation ``|phi_spherical / phi_direct - 1|`` at every
+        target.
+
+    """
+
+    targets = attr.ib()
+    deviation = attr.ib()
+
+    def __repr__(self):
+        """repr(x) <=> x.__repr__()."""
+        return (
+            f"<SphericalDeviation targets={len(self.targets)}, "
+            f"median={self.median:.2e}, max={self.max:.2e}>"
+        )
+
+    @property
+    def median(self):
+        """Median relative deviation."""
+        return float(np.median(self.deviation))
+
+    @property
+    def max(self):
+        """Maximum relative deviation."""
+        return float(np.max(self.deviation))
+
+    @property
+    def rms(self):
+        """Root mean square of the relative deviation."""
+        return float(np.sqrt(np.mean(np.square(self.deviation))))
+
+
+def spherical_deviation(galaxy, *, n_targets=1000, seed=None, center=None):
+    """
+    Deviation of the spherical potential from the full direct summation.
+
+    The potential of a random subset of particles is computed with the
+    ``"spherical"`` backend and with ``numpy_potential`` in double
+    precision, which costs O(n_targets * N) instead of O(N²).
+
+    Parameters
+    ----------
+    galaxy : ``Galaxy class`` object
+    n_targets : int, default=1000
+        Number of particles where the deviation is measured. If the galaxy
+        has less particles, all of them are used.
+    seed : int or np.random.Generator, optional
+        Seed of the random subset of particles.
+    center : np.ndarray, optional
+        Center of the spherical average. If None, the origin.
+
+    Returns
+    -------
+    SphericalDeviation
+        Relative deviation at every target, with its median, maximum and
+        root mean square.
+
+    """
+    if n_targets < 1:
+        raise ValueError("'n_targets' must be >= 1")
+
+    arrays = _particle_arrays(galaxy, ["x", "y", "z", "m", "softening"])
+    size = len(arrays["m"])
+    random = np.random.default_rng(seed)
+    targets = np.sort(
+        random.choice(size, min(size, n_targets), replace=False)
     )
 
-    return core.mkgalaxy(**new)
+    particles = tuple(arrays[aname] for aname in ("x", "y", "z", "m"))
+    softening = _shared_softening(arrays["softening"])
+
+    spherical, _ = spherical_potential(
+        *particles,
+        softening,
+        precision="float64",
+        targets=targets,
+        center=center,
+    )
+    direct, _ = numpy_potential(
+        *particles, softening, precision="float64", targets=targets
+    )
+
+    return SphericalDeviation(
+        targets=targets, deviation=np.abs(spherical / direct - 1)
+    )
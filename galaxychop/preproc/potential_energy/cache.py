@@ -0,0 +1,213 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""On-disk cache of potential energy calculations."""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import hashlib
+import os
+import pathlib
+import tempfile
+
+import attr
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+#: Default maximum total size (in bytes) of the files of a cache.
+DEFAULT_CACHE_MAX_SIZE = 2**30
+
+#: Extension of the files of the cache.
+_CACHE_SUFFIX = ".npy"
+
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+
+def content_hash(*arrays, **params):
+    """
+    Hash of the content of a set of arrays and parameters.
+
+    Parameters
+    ----------
+    arrays : np.ndarray
+        Arrays to hash. Their dtype, shape and values are part of the hash.
+    params :
+        Parameters of the calculation. Their ``repr()`` is part of the hash.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest.
+
+    """
+    digest = hashlib.sha256()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(f"{arr.dtype.str}{arr.shape}".encode())
+        digest.update(arr.tobytes())
+    for pname in sorted(params):
+        digest.update(f"{pname}={params[pname]!r};".encode())
+    return digest.hexdigest()
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+
+@attr.s(frozen=True, slots=True, repr=False)
+class PotentialCache:
+    """Directory with the results of previous potential calculations.
+
+    Every result is stored in a ``.npy`` file named after its key. When the
+    total size of the files exceeds ``max_size``, the least recently used
+    files are removed.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Directory of the cache. It is created if it does not exist.
+    max_size : int, default=2**30
+        Maximum total size (in bytes) of the files of the cache.
+
+    """
+
+    path = attr.ib(converter=pathlib.Path)
+    max_size = attr.ib(default=DEFAULT_CACHE_MAX_SIZE)
+
+    @max_size.validator
+    def _max_size_validator(self, attribute, value):
+        if value <= 0:
+            raise ValueError("'max_size' must be > 0")
+
+    def __attrs_post_init__(self):
+        """Create the directory of the cache."""
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        """repr(x) <=> x.__repr__()."""
+        return f"<PotentialCache {str(self.path)!r}, entries={len(self)}>"
+
+    def __len__(self):
+        """len(x) <=> x.__len__()."""
+        return len(self._files())
+
+    def __contains__(self, key):
+        """Check whether ``key`` is stored in the cache."""
+        return self._file(key).exists()
+
+    def _file(self, key):
+        return self.path / f"{key}{_CACHE_SUFFIX}"
+
+    def _files(self):
+        return list(self.path.glob(f"*{_CACHE_SUFFIX}"))
+
+    def _stats(self):
+        # files removed by another process after the glob are skipped
+        for fpath in self._files():
+            try:
+                yield fpath, fpath.stat()
+            except FileNotFoundError:
+                continue
+
+    @property
+    def size(self):
+        """Total size (in bytes) of the files of the cache."""
+        return sum(stat.st_size for _, stat in self._stats())
+
+    def get(self, key):
+        """
+        Retrieve a stored result.
+
+        Parameters
+        ----------
+        key : str
+            Key of the result.
+
+        Returns
+        -------
+        np.ndarray or None
+            The stored array, or None if the key is not in the cache.
+
+        """
+        fpath = self._file(key)
+        try:
+            values = np.load(fpath, allow_pickle=False)
+
+            # mark the entry as the most recently used one
+            os.utime(fpath)
+        except (FileNotFoundError, ValueError, OSError):
+            # missing, evicted or cleared by another process, or unreadable
+            return None
+
+        return values
+
+    def put(self, key, values):
+        """
+        Store a result and evict the least recently used ones.
+
+        Parameters
+        ----------
+        key : str
+            Key of the result.
+        values : np.ndarray
+            Array to store.
+
+        """
+        # write to a temporary file first, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                np.save(fp, np.asarray(values), allow_pickle=False)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            pathlib.Path(tmp).unlink(missing_ok=True)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used files until fitting ``max_size``.
+
+        Returns
+        -------
+        int
+            Number of removed files.
+
+        """
+        entries = sorted(
+            (stat.st_mtime_ns, stat.st_size, fpath)
+            for fpath, stat in self._stats()
+        )
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, fpath in entries:
+            if total <= self.max_size:
+                break
+            fpath.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Remove all the files of the cache."""
+        for fpath in self._files():
+            fpath.unlink(missing_ok=True)
@@ -0,0 +1,240 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Utilities to run a potential calculation on a pool of worker processes.
+
+The targets are split in blocks that are submitted to an executor: any
+object with a ``submit(fn, *args)`` method that returns futures with a
+``result()`` method, like ``concurrent.futures.ProcessPoolExecutor``, a
+``dask.distributed.Client`` or a ``mpi4py.futures.MPIPoolExecutor``.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import multiprocessing as mp
+from concurrent import futures
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# =============================================================================
+# SHARED PARTICLES
+# =============================================================================
+
+
+def share_particles(columns):
+    """
+    Copy the particles into a shared memory block.
+
+    Parameters
+    ----------
+    columns : list of np.ndarray
+        Arrays of the same length and dtype (e.g. x, y, z, m, softening).
+
+    Returns
+    -------
+    shm : multiprocessing.shared_memory.SharedMemory
+        The block. The caller must ``close()`` and ``unlink()`` it.
+    spec : tuple
+        ``(name, shape, dtype)`` needed to attach the block in a worker.
+
+    """
+    shape = (len(columns), len(columns[0]))
+    dtype = np.result_type(*columns)
+    nbytes = shape[0] * shape[1] * dtype.itemsize
+
+    # every column is copied straight into its row of the block, without
+    # stacking them first in a private array
+    shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+    shared = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    for row, column in zip(shared, columns):
+        row[:] = column
+    del shared
+    return shm, (shm.name, shape, dtype.str)
+
+
+def _mp_context():
+    """Start method of the workers of the default executor."""
+    # forking a process that already runs threads (e.g. the TBB pool of
+    # numba) can deadlock, so the workers are forked from a server process,
+    # or spawned where it is not available. Only a context is returned, the
+    # global start method and forkserver preload are left untouched
+    if "forkserver" not in mp.get_all_start_methods():
+        return mp.get_context("spawn")
+    return mp.get_context("forkserver")
+
+
+def _attach(name):
+    try:
+        # python >= 3.13 does not track a block that is only attached
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _run_block(particles, softening, block, backend_function, precision, kws):
+    if softening is None:
+        x, y, z, m, softening = particles
+    else:
+        x, y, z, m = particles
+    pot, postproc = backend_function(
+        x, y, z, m, softening, precision=precision, targets=block, **kws
+    )
+    # copy the result, it must not be a view of the shared memory
+    return np.array(postproc(pot), dtype=np.float64)
+
+
+def _potential_block(
+    particles, softening, block, backend_function, precision, kws
+):
+    """Potential of a block of targets, computed in a worker."""
+    args = (softening, block, backend_function, precision, kws)
+    if not isinstance(particles, tuple):
+        return _run_block(particles, *args)
+
+    name, shape, dtype = particles
+    shm = _attach(name)
+    try:
+        shared = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        # the broadcast copy of the particles is read only
+        shared.flags.writeable = False
+        result = _run_block(shared, *args)
+        del shared
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # a view survived in a traceback, the block is released with
+            # the worker
+            pass
+    return result
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+
+def potential_distributed(
+    columns,
+    backend_function,
+    *,
+    precision,
+    softening=None,
+    targets=None,
+    executor=None,
+    n_jobs=None,
+    block_size=2**14,
+    shared=True,
+    backend_kws=None,
+):
+    """
+    Potential of the targets computed by blocks on a pool of workers.
+
+    Parameters
+    ----------
+    columns : list of np.ndarray
+        Positions and masses of all the particles, plus their softening if
+        ``softening`` is None, with the same dtype. Shape: (4, n) or (5, n).
+    backend_function : callable
+        Backend used by the workers. It must be importable by the workers,
+        e.g. a function of ``POTENTIAL_BACKENDS``.
+    precision : str
+        Floating point precision of the calculation.
+    softening : np.ndarray, optional
+        Softening shared by all the particles. If None, the softening of
+        every particle is the last of the ``columns``.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    executor : concurrent.futures.Executor, optional
+        Executor of the blocks. If None, a ``ProcessPoolExecutor`` with
+        ``n_jobs`` workers is created for this calculation.
+    n_jobs : int, optional
+        Number of workers of the default executor.
+    block_size : int, default=2**14
+        Number of targets of every task.
+    shared : bool, default=True
+        If True, the particles are broadcast to the workers in a shared
+        memory block (only available on the same node). Otherwise, they
+        are serialized with every task.
+    backend_kws : dict, optional
+        Extra keyword arguments for the backend function (e.g. ``sources``).
+
+    Returns
+    -------
+    np.ndarray
+        Result of the backend for every target, after its post process.
+
+    Notes
+    -----
+    The workers of the default executor are started with the
+    ``"forkserver"`` (or ``"spawn"``) method, so they import the main
+    module of the program again. Scripts must protect their entry point
+    with an ``if __name__ == "__main__":`` guard, or every worker would run
+    the whole script.
+
+    Examples
+    --------
+    >>> if __name__ == "__main__":
+    ...     pot = potential_distributed(
+    ...         [x, y, z, m], numpy_potential, precision="mixed",
+    ...         softening=np.asarray(0.1), n_jobs=4
+    ...     )
+
+    """
+    if block_size < 1:
+        raise ValueError("'block_size' must be >= 1")
+
+    backend_kws = {} if backend_kws is None else backend_kws
+    size = len(columns[0])
+    targets = np.arange(size) if targets is None else np.asarray(targets)
+    blocks = np.array_split(
+        targets, np.arange(block_size, len(targets), block_size)
+    )
+
+    shm, particles = (None, columns)
+    if shared:
+        shm, particles = share_particles(columns)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = futures.ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=_mp_context()
+        )
+
+    try:
+        tasks = [
+            executor.submit(
+                _potential_block,
+                particles,
+                softening,
+                block,
+                backend_function,
+                precision,
+                backend_kws,
+            )
+            for block in blocks
+        ]
+        results = [task.result() for task in tasks]
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    if not results:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(results)
@@ -0,0 +1,628 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Utilities to run a Cartesian Fast Multipole Method potential calculation.
+
+The expansions are Cartesian Taylor series of the Plummer softened kernel
+``1 / sqrt(r**2 + softening**2)``. For a multi-index ``k`` the Taylor
+coefficients ``b_k(X) = D_y^k G(X - y) / k!`` (evaluated at ``y = 0``) are
+computed with the recurrence of Duan & Krasny (2001)::
+
+    |k| R**2 b_k = (2 |k| - 1) sum_i X_i b_{k - e_i}
+                   - (|k| - 1) sum_i b_{k - 2 e_i}
+
+where ``R**2 = |X|**2 + softening**2``.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import functools
+import math
+
+import attr
+
+import numpy as np
+
+from .treecode_calculation import _ragged_arange
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+#: Maximum number of array elements created by a batch of interactions.
+_BATCH_ELEMENTS = 2**22
+
+#: Maximum number of different softening values supported by the FMM.
+MAX_SOFTENING_GROUPS = 8
+
+
+# =============================================================================
+# EXPANSION TABLES
+# =============================================================================
+
+
+def multi_indices(order):
+    """
+    All the 3D multi-indices of total degree lower or equal to ``order``.
+
+    Parameters
+    ----------
+    order : int
+        Maximum total degree.
+
+    Returns
+    -------
+    np.ndarray
+        Multi-indices sorted by total degree. Shape: ((p+1)(p+2)(p+3)/6, 3).
+
+    """
+    return np.array(
+        [
+            (a, b, n - a - b)
+            for n in range(order + 1)
+            for a in range(n, -1, -1)
+            for b in range(n - a, -1, -1)
+        ],
+        dtype=np.int64,
+    )
+
+
+def _mbinom(k, i):
+    """Multi-index binomial coefficient."""
+    return math.prod(math.comb(kd, id_) for kd, id_ in zip(k, i))
+
+
+def _terms(rows):
+    """Sort a list of (out, a, b, coef) terms by ``out`` and split them."""
+    rows.sort(key=lambda r: r[0])
+    out, a, b, coef = (np.array(col) for col in zip(*rows))
+    bounds = np.flatnonzero(np.concatenate(([True], out[1:] != out[:-1])))
+    return a, b, coef.astype(np.float64), bounds
+
+
+@attr.s(frozen=True, slots=True, repr=False)
+class ExpansionTables:
+    """
+    Precomputed indices and coefficients of a Cartesian expansion.
+
+    Every translation operator is stored as a flat list of terms
+    ``out += coef * A[a] * B[b]`` sorted by ``out``; ``bounds`` splits the
+    terms of every output coefficient.
+
+    Parameters
+    ----------
+    order : int
+        Order of the expansion.
+    idx : np.ndarray
+        Multi-indices of the expansion. Shape: (nk, 3).
+    degree : np.ndarray
+        Total degree of every multi-index. Shape: (nk,).
+    prev1, prev2 : np.ndarray
+        Index of ``k - e_i`` and ``k - 2 e_i`` for every multi-index and
+        axis (-1 if it does not exist). Shape: (nk, 3).
+    m2m, m2l, l2l : tuple
+        Terms ``(a, b, coef, bounds)`` of the multipole to multipole,
+        multipole to local and local to local translations.
+
+    """
+
+    order = attr.ib()
+    idx = attr.ib()
+    degree = attr.ib()
+    prev1 = attr.ib()
+    prev2 = attr.ib()
+    m2m = attr.ib()
+    m2l = attr.ib()
+    l2l = attr.ib()
+
+    def __repr__(self):
+        """repr(x) <=> x.__repr__()."""
+        return f"<ExpansionTables order={self.order}, size={len(self.idx)}>"
+
+    def __len__(self):
+        """len(x) <=> x.__len__()."""
+        return len(self.idx)
+
+
+@functools.lru_cache(maxsize=None)
+def expansion_tables(order):
+    """
+    Build (and cache) the ``ExpansionTables`` of a given order.
+
+    Parameters
+    ----------
+    order : int
+        Order of the expansion. Must be >= 0.
+
+    Returns
+    -------
+    ``ExpansionTables``
+
+    """
+    if order < 0:
+        raise ValueError("order must be >= 0")
+
+    idx = multi_indices(order)
+    lookup = {tuple(k): pos for pos, k in enumerate(idx)}
+    eye = np.eye(3, dtype=np.int64)
+
+    prev1 = np.full((len(idx), 3), -1)
+    prev2 = np.full((len(idx), 3), -1)
+    for pos, k in enumerate(idx):
+        for axis in range(3):
+            prev1[pos, axis] = lookup.get(tuple(k - eye[axis]), -1)
+            prev2[pos, axis] = lookup.get(tuple(k - 2 * eye[axis]), -1)
+
+    m2m, m2l, l2l = [], [], []
+    for kpos, k in enumerate(idx):
+        for ipos, i in enumerate(idx):
+            if np.all(i <= k):
+                # M'_k += C(k, i) d^(k - i) M_i
+                shift = lookup[tuple(k - i)]
+                m2m.append((kpos, shift, ipos, _mbinom(k, i)))
+                # L'_i += C(k, i) d^(k - i) L_k
+                l2l.append((ipos, shift, kpos, _mbinom(k, i)))
+            if k.sum() + i.sum() <= order:
+                # L_n += (-1)^|n| C(k + n, n) M_k b_(k + n)  (here n == i)
+                coef = (-1) ** i.sum() * _mbinom(k + i, i)
+                m2l.append((ipos, kpos, lookup[tuple(k + i)], coef))
+
+    return ExpansionTables(
+        order=order,
+        idx=idx,
+        degree=idx.sum(axis=1),
+        prev1=prev1,
+        prev2=prev2,
+        m2m=_terms(m2m),
+        m2l=_terms(m2l),
+        l2l=_terms(l2l),
+    )
+
+
+# =============================================================================
+# KERNELS
+# =============================================================================
+
+
+def monomials(dx, dy, dz, tables):
+    """
+    Evaluate ``d^k`` for every multi-index of the expansion.
+
+    Parameters
+    ----------
+    dx, dy, dz : np.ndarray
+        Components of the vectors. Shape: (n,1).
+    tables : ``ExpansionTables``
+
+    Returns
+    -------
+    np.ndarray
+        Monomials of every vector. Shape: (n, nk).
+
+    """
+    exps = np.arange(tables.order + 1)
+    px = np.asarray(dx)[:, None] ** exps
+    py = np.asarray(dy)[:, None] ** exps
+    pz = np.asarray(dz)[:, None] ** exps
+    idx = tables.idx
+    return px[:, idx[:, 0]] * py[:, idx[:, 1]] * pz[:, idx[:, 2]]
+
+
+def taylor_coefficients(dx, dy, dz, softening, tables):
+    """
+    Taylor coefficients of the softened kernel.
+
+    Parameters
+    ----------
+    dx, dy, dz : np.ndarray
+        Components of the separation vectors ``X``. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared or one per vector. Shape: (1,) or (n,1).
+    tables : ``ExpansionTables``
+
+    Returns
+    -------
+    np.ndarray
+        Coefficients ``b_k(X)`` for every vector. Shape: (n, nk).
+
+    """
+    comps = (np.asarray(dx), np.asarray(dy), np.asarray(dz))
+    r2 = comps[0] ** 2 + comps[1] ** 2 + comps[2] ** 2 + softening**2
+
+    coefs = np.empty((len(r2), len(tables)), dtype=np.float64)
+    coefs[:, 0] = 1.0 / np.sqrt(r2)
+
+    for pos in range(1, len(tables)):
+        deg = tables.degree[pos]
+        acc = np.zeros(len(r2))
+        for axis in range(3):
+            first = tables.prev1[pos, axis]
+            if first >= 0:
+                acc += (2 * deg - 1) * comps[axis] * coefs[:, first]
+            second = tables.prev2[pos, axis]
+            if second >= 0:
+                acc -= (deg - 1) * coefs[:, second]
+        coefs[:, pos] = acc / (deg * r2)
+
+    return coefs
+
+
+def _apply_terms(terms, left, right):
+    """Evaluate ``out = sum coef * left[a] * right[b]`` by rows."""
+    a, b, coef, bounds = terms
+    prod = np.take(left, a, axis=1)
+    prod *= np.take(right, b, axis=1)
+    prod *= coef
+    return np.add.reduceat(prod, bounds, axis=1)
+
+
+def _batches(total, per_item):
+    """Split ``range(total)`` in slices of a bounded number of elements."""
+    step = max(1, _BATCH_ELEMENTS // max(per_item, 1))
+    for first in range(0, total, step):
+        yield slice(first, min(first + step, total))
+
+
+# =============================================================================
+# TREE TRAVERSAL
+# =============================================================================
+
+
+def _children(tree, nodes):
+    """Children of every node and the position of their parent."""
+    nch = tree.n_children[nodes]
+    return _ragged_arange(tree.child_start[nodes], nch), np.repeat(
+        np.arange(len(nodes)), nch
+    )
+
+
+def interaction_lists(tree, theta=0.5):
+    """
+    Dual tree traversal of an octree against itself.
+
+    Two nodes are well separated if
+    ``rmax_a + rmax_b < theta * distance``; those pairs interact through
+    their expansions (M2L). Pairs of leaves that are not well separated
+    interact directly (P2P). Otherwise the biggest node is opened.
+
+    Parameters
+    ----------
+    tree : ``Octree``
+        Octree populated with the particles.
+    theta : float, default=0.5
+        Multipole acceptance parameter. Must be > 0.
+
+    Returns
+    -------
+    m2l : tuple of np.ndarray
+        ``(targets, sources)`` node pairs evaluated by expansions.
+    p2p : tuple of np.ndarray
+        ``(targets, sources)`` leaf pairs evaluated by direct summation.
+
+    """
+    if theta <= 0:
+        raise ValueError("theta must be > 0")
+
+    is_leaf = tree.is_leaf
+    targets = np.zeros(1, dtype=np.int64)
+    sources = np.zeros(1, dtype=np.int64)
+
+    m2l_t, m2l_s, p2p_t, p2p_s = [], [], [], []
+    while len(targets):
+        dist = np.sqrt(
+            (tree.cx[targets] - tree.cx[sources]) ** 2
+            + (tree.cy[targets] - tree.cy[sources]) ** 2
+            + (tree.cz[targets] - tree.cz[sources]) ** 2
+        )
+        same = targets == sources
+        radii = tree.rmax[targets] + tree.rmax[sources]
+
+        far = ~same & (radii < theta * dist)
+        m2l_t.append(targets[far])
+        m2l_s.append(sources[far])
+
+        leaf_t, leaf_s = is_leaf[targets], is_leaf[sources]
+        near = ~far & leaf_t & leaf_s
+        p2p_t.append(targets[near])
+        p2p_s.append(sources[near])
+
+        split = ~far & ~near
+
+        # a node against itself: every pair of children
+        self_nodes = targets[split & same]
+        kids, _ = _children(tree, self_nodes)
+        nch = np.repeat(
+            tree.n_children[self_nodes], tree.n_children[self_nodes]
+        )
+        self_t = np.repeat(kids, nch)
+        self_s = _ragged_arange(
+            np.repeat(
+                tree.child_start[self_nodes], tree.n_children[self_nodes]
+            ),
+            nch,
+        )
+
+        # otherwise the biggest (not leaf) node is opened
+        other = split & ~same
+        open_t = (
+            other
+            & ~leaf_t
+            & (leaf_s | (tree.rmax[targets] >= tree.rmax[sources]))
+        )
+        open_s = other & ~open_t
+
+        kids_t, parent_t = _children(tree, targets[open_t])
+        kids_s, parent_s = _children(tree, sources[open_s])
+
+        targets = np.concatenate((self_t, kids_t, targets[open_s][parent_s]))
+        sources = np.concatenate((self_s, sources[open_t][parent_t], kids_s))
+
+    m2l = np.concatenate(m2l_t), np.concatenate(m2l_s)
+    p2p = np.concatenate(p2p_t), np.concatenate(p2p_s)
+    return m2l, p2p
+
+
+# =============================================================================
+# FMM PASSES
+# =============================================================================
+
+
+def _parents(tree):
+    """Parent of every node (-1 for the root)."""
+    parent = np.full(len(tree.mass), -1, dtype=np.int64)
+    inner = np.flatnonzero(~tree.is_leaf)
+    kids, pos = _children(tree, inner)
+    parent[kids] = inner[pos]
+    return parent
+
+
+def _upward_pass(tree, parent, tables, m=None):
+    """Multipole expansions of every node (P2M at leaves and M2M)."""
+    m = tree.m if m is None else m
+    multipoles = np.zeros((len(tree.mass), len(tables)), dtype=np.float64)
+
+    # P2M: M_k = sum m (y - c)^k over the particles of every leaf
+    leaves = np.flatnonzero(tree.is_leaf)
+    for batch in _batches(len(leaves), len(tables) * 16):
+        nodes = leaves[batch]
+        parts = _ragged_arange(tree.start[nodes], tree.count[nodes])
+        owner = np.repeat(nodes, tree.count[nodes])
+        pw = monomials(
+            tree.x[parts] - tree.cx[owner],
+            tree.y[parts] - tree.cy[owner],
+            tree.z[parts] - tree.cz[owner],
+            tables,
+        )
+        bounds = np.cumsum(tree.count[nodes]) - tree.count[nodes]
+        multipoles[nodes] = np.add.reduceat(
+            m[parts][:, None] * pw, bounds, axis=0
+        )
+
+    # M2M: from the deepest level up to the root
+    n_terms = len(tables.m2m[0])
+    for level in range(tree.level.max(), 0, -1):
+        nodes = np.flatnonzero(tree.level == level)
+        for batch in _batches(len(nodes), n_terms):
+            kids = nodes[batch]
+            dads = parent[kids]
+            shift = monomials(
+                tree.cx[kids] - tree.cx[dads],
+                tree.cy[kids] - tree.cy[dads],
+                tree.cz[kids] - tree.cz[dads],
+                tables,
+            )
+            contrib = _apply_terms(tables.m2m, shift, multipoles[kids])
+            np.add.at(multipoles, dads, contrib)
+
+    return multipoles
+
+
+def _m2l_pass(tree, multipoles, m2l, soft2, tables):
+    """Local expansions of every node due to its well separated nodes."""
+    locals_ = np.zeros_like(multipoles)
+    targets, sources = m2l
+
+    n_terms = len(tables.m2l[0])
+    for batch in _batches(len(targets), n_terms):
+        tnodes, snodes = targets[batch], sources[batch]
+        coefs = taylor_coefficients(
+            tree.cx[tnodes] - tree.cx[snodes],
+            tree.cy[tnodes] - tree.cy[snodes],
+            tree.cz[tnodes] - tree.cz[snodes],
+            np.sqrt(soft2),
+            tables,
+        )
+        contrib = _apply_terms(tables.m2l, multipoles[snodes], coefs)
+        np.add.at(locals_, tnodes, contrib)
+
+    return locals_
+
+
+def _downward_pass(tree, parent, locals_, tables):
+    """Propagate the local expansions from the root to the leaves (L2L)."""
+    n_terms = len(tables.l2l[0])
+    for level in range(1, tree.level.max() + 1):
+        nodes = np.flatnonzero(tree.level == level)
+        for batch in _batches(len(nodes), n_terms):
+            kids = nodes[batch]
+            dads = parent[kids]
+            shift = monomials(
+                tree.cx[kids] - tree.cx[dads],
+                tree.cy[kids] - tree.cy[dads],
+                tree.cz[kids] - tree.cz[dads],
+                tables,
+            )
+            locals_[kids] += _apply_terms(tables.l2l, shift, locals_[dads])
+    return locals_
+
+
+def _l2p_pass(tree, locals_, tables, mask=None):
+    """Evaluate the local expansions of the leaves at their particles."""
+    pot = np.zeros(len(tree.m), dtype=np.float64)
+
+    leaves = np.flatnonzero(tree.is_leaf)
+    for batch in _batches(len(leaves), len(tables) * 16):
+        nodes = leaves[batch]
+        parts = _ragged_arange(tree.start[nodes], tree.count[nodes])
+        owner = np.repeat(nodes, tree.count[nodes])
+        if mask is not None:
+            parts, owner = parts[mask[parts]], owner[mask[parts]]
+        pw = monomials(
+            tree.x[parts] - tree.cx[owner],
+            tree.y[parts] - tree.cy[owner],
+            tree.z[parts] - tree.cz[owner],
+            tables,
+        )
+        pot[parts] += np.einsum("ij,ij->i", pw, locals_[owner])
+
+    return pot
+
+
+def _p2p_pass(tree, p2p, psoft2):
+    """Direct summation between the particles of neighbour leaves."""
+    pot = np.zeros(len(tree.m), dtype=np.float64)
+
+    targets, sources = p2p
+    pair_size = int(np.max(tree.count[tree.is_leaf])) ** 2
+    for batch in _batches(len(targets), pair_size):
+        tnodes, snodes = targets[batch], sources[batch]
+        tparts = _ragged_arange(tree.start[tnodes], tree.count[tnodes])
+        pair = np.repeat(np.arange(len(tnodes)), tree.count[tnodes])
+        scount = tree.count[snodes][pair]
+        sparts = _ragged_arange(tree.start[snodes][pair], scount)
+        tparts = np.repeat(tparts, scount)
+
+        valid = tparts != sparts
+        tparts, sparts = tparts[valid], sparts[valid]
+        r2 = (
+            (tree.x[tparts] - tree.x[sparts]) ** 2
+            + (tree.y[tparts] - tree.y[sparts]) ** 2
+            + (tree.z[tparts] - tree.z[sparts]) ** 2
+        )
+        if np.ndim(psoft2):
+            r2 += (psoft2[tparts] + psoft2[sparts]) / 2
+        else:
+            r2 += psoft2
+        pot += np.bincount(
+            tparts, weights=tree.m[sparts] / np.sqrt(r2), minlength=len(pot)
+        )
+
+    return pot
+
+
+def _grouped_far_field(tree, parent, m2l, psoft2, tables):
+    """Far field of particles with a few different softening values.
+
+    The expansions are only valid for a single softening, so the sources
+    are split in groups of equal softening (one multipole expansion per
+    group) and every group of targets gets its own local expansions, using
+    the exact softening ``(eps_a**2 + eps_b**2) / 2`` of each pair of
+    groups.
+    """
+    values, group = np.unique(psoft2, return_inverse=True)
+    if len(values) > MAX_SOFTENING_GROUPS:
+        raise ValueError(
+            f"The FMM supports up to {MAX_SOFTENING_GROUPS} different "
+            f"softening values, got {len(values)}"
+        )
+
+    # nodes that contain at least one particle of every group
+    cumsum = np.zeros((len(values), len(group) + 1))
+    np.cumsum(
+        group == np.arange(len(values))[:, None], axis=1, out=cumsum[:, 1:]
+    )
+    has_group = (
+        cumsum[:, tree.start + tree.count] - cumsum[:, tree.start]
+    ) > 0
+
+    multipoles = [
+        _upward_pass(tree, parent, tables, m=np.where(group == gb, tree.m, 0))
+        for gb in range(len(values))
+    ]
+
+    targets, sources = m2l
+    pot = np.zeros(len(tree.m), dtype=np.float64)
+    for ga, soft2_a in enumerate(values):
+        locals_ = np.zeros_like(multipoles[0])
+        for gb, soft2_b in enumerate(values):
+            keep = has_group[ga, targets] & has_group[gb, sources]
+            locals_ += _m2l_pass(
+                tree,
+                multipoles[gb],
+                (targets[keep], sources[keep]),
+                (soft2_a + soft2_b) / 2,
+                tables,
+            )
+        locals_ = _downward_pass(tree, parent, locals_, tables)
+        pot += _l2p_pass(tree, locals_, tables, mask=group == ga)
+
+    return pot
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+
+def potential_fmm(tree, softening, order=4, theta=0.5):
+    """
+    Compute the potential of every particle of the octree with the FMM.
+
+    Parameters
+    ----------
+    tree : ``Octree``
+        Octree populated with the particles.
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle
+        in their original order. Pairs use ``(eps_i**2 + eps_j**2) / 2`` as
+        squared softening. Per particle softening can take at most
+        ``MAX_SOFTENING_GROUPS`` different values, and the far field costs
+        grow with the square of that number.
+    order : int, default=4
+        Order ``p`` of the multipole and local expansions.
+    theta : float, default=0.5
+        Multipole acceptance parameter of the dual tree traversal.
+
+    Returns
+    -------
+    pot : np.ndarray
+        Sum of ``m / sqrt(d**2 + eps**2)`` over the other particles
+        (without the gravitational constant), in the original order of the
+        particles. Shape: (n,1).
+
+    """
+    tables = expansion_tables(int(order))
+
+    m2l, p2p = interaction_lists(tree, theta=theta)
+    parent = _parents(tree)
+
+    if np.ndim(softening) == 0:
+        psoft2 = float(softening) ** 2
+        multipoles = _upward_pass(tree, parent, tables)
+        locals_ = _m2l_pass(tree, multipoles, m2l, psoft2, tables)
+        locals_ = _downward_pass(tree, parent, locals_, tables)
+        sorted_pot = _l2p_pass(tree, locals_, tables)
+    else:
+        psoft2 = np.square(
+            np.broadcast_to(
+                np.asarray(softening, dtype=np.float64), tree.m.shape
+            )
+        )[tree.order]
+        sorted_pot = _grouped_far_field(tree, parent, m2l, psoft2, tables)
+
+    sorted_pot += _p2p_pass(tree, p2p, psoft2)
+
+    pot = np.empty_like(sorted_pot)
+    pot[tree.order] = sorted_pot
+    return pot
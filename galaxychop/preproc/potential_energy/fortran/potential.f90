@@ -3,6 +3,10 @@
 ! POTENTIAL ENERGY
 ! ============================================================================
 
+! The softening of every pair follows the symmetric Plummer convention
+! soft_ij ** 2 = (soft_i ** 2 + soft_j ** 2) / 2, so each kernel keeps the
+! halves of the squared softenings (hsoft2) of the particles.
+
 module potential
 
 use iso_fortran_env
@@ -10,26 +14,30 @@ use iso_fortran_env
 
 implicit none
 private
-public fortran_potential
+public fortran_potential, fortran_potential_symmetric
+public fortran_potential_mixed, fortran_potential_double
+public fortran_potential_sources, fortran_potential_sources_double
 
 contains
    subroutine fortran_potential(x, y, z, m, soft, pe, n)
         ! Compute the potential energy for each particle.
-        integer              :: n     ! Number of particles
-        real, intent(in)     :: x(n)  ! Position x of particles
-        real, intent(in)     :: y(n)  ! Position y of particles
-        real, intent(in)     :: z(n)  ! Position z of particles
-        real, intent(in)     :: m(n)  ! Masses of particles
-        real, intent(in)     :: soft  ! Softening parameter
-        real, intent(out)    :: pe(n) ! Specific potential energy of particles
-
-        real                 :: dist, soft2
+        integer              :: n        ! Number of particles
+        real, intent(in)     :: x(n)     ! Position x of particles
+        real, intent(in)     :: y(n)     ! Position y of particles
+        real, intent(in)     :: z(n)     ! Position z of particles
+        real, intent(in)     :: m(n)     ! Masses of particles
+        real, intent(in)     :: soft(n)  ! Softening of particles
+        real, intent(out)    :: pe(n)    ! Specific potential energy
+
+        real                 :: dist
+        real, allocatable    :: hsoft2(:)
         integer              :: i, j
 
-        soft2 = soft ** 2
+        allocate(hsoft2(n))
+        hsoft2 = 0.5 * soft ** 2
 
         !$OMP PARALLEL DEFAULT(NONE) &
-        !$OMP SHARED (x, y, z, m, soft2, pe, n) &
+        !$OMP SHARED (x, y, z, m, hsoft2, pe, n) &
         !$OMP PRIVATE(i, j, dist)
         !$OMP DO SCHEDULE(DYNAMIC)
         do i = 1, n
@@ -41,7 +49,7 @@ contains
                             (x(i) - x(j)) ** 2 + &
                             (y(i) - y(j)) ** 2 + &
                             (z(i) - z(j)) ** 2 + &
-                            soft2 &
+                            hsoft2(i) + hsoft2(j) &
                             )
                     pe(i) = pe(i) + m(j) / dist
 
@@ -50,6 +58,260 @@ contains
         end do
         !$OMP END DO
         !$OMP END PARALLEL
+
+        deallocate(hsoft2)
     end subroutine fortran_potential
 
+    subroutine fortran_potential_symmetric(x, y, z, m, soft, pe, n)
+        ! Compute the potential energy for each particle visiting every
+        ! pair only once. Each thread scatters the contributions of its
+        ! pairs into its own double precision accumulator, merged into pe
+        ! at the end.
+        integer              :: n        ! Number of particles
+        real, intent(in)     :: x(n)     ! Position x of particles
+        real, intent(in)     :: y(n)     ! Position y of particles
+        real, intent(in)     :: z(n)     ! Position z of particles
+        real, intent(in)     :: m(n)     ! Masses of particles
+        real, intent(in)     :: soft(n)  ! Softening of particles
+        double precision, intent(out) :: pe(n) ! Specific potential energy
+
+        double precision, allocatable :: pe_local(:)
+        real                 :: inv_dist
+        real, allocatable    :: hsoft2(:)
+        integer              :: i, j
+
+        allocate(hsoft2(n))
+        hsoft2 = 0.5 * soft ** 2
+        pe = 0.
+
+        !$OMP PARALLEL DEFAULT(NONE) &
+        !$OMP SHARED (x, y, z, m, hsoft2, pe, n) &
+        !$OMP PRIVATE(i, j, inv_dist, pe_local)
+        allocate(pe_local(n))
+        pe_local = 0.
+
+        !$OMP DO SCHEDULE(DYNAMIC)
+        do i = 1, n - 1
+            do j = i + 1, n
+
+                inv_dist = 1. / sqrt( &
+                        (x(i) - x(j)) ** 2 + &
+                        (y(i) - y(j)) ** 2 + &
+                        (z(i) - z(j)) ** 2 + &
+                        hsoft2(i) + hsoft2(j) &
+                        )
+                pe_local(i) = pe_local(i) + m(j) * inv_dist
+                pe_local(j) = pe_local(j) + m(i) * inv_dist
+
+            end do
+        end do
+        !$OMP END DO
+
+        !$OMP CRITICAL
+        pe = pe + pe_local
+        !$OMP END CRITICAL
+
+        deallocate(pe_local)
+        !$OMP END PARALLEL
+
+        deallocate(hsoft2)
+    end subroutine fortran_potential_symmetric
+
+    subroutine fortran_potential_mixed(x, y, z, m, soft, pe, n)
+        ! Compute the potential energy for each particle from single
+        ! precision inputs, accumulating in double precision.
+        integer              :: n        ! Number of particles
+        real, intent(in)     :: x(n)     ! Position x of particles
+        real, intent(in)     :: y(n)     ! Position y of particles
+        real, intent(in)     :: z(n)     ! Position z of particles
+        real, intent(in)     :: m(n)     ! Masses of particles
+        real, intent(in)     :: soft(n)  ! Softening of particles
+        double precision, intent(out) :: pe(n) ! Specific potential energy
+
+        real                 :: dist
+        real, allocatable    :: hsoft2(:)
+        integer              :: i, j
+
+        allocate(hsoft2(n))
+        hsoft2 = 0.5 * soft ** 2
+
+        !$OMP PARALLEL DEFAULT(NONE) &
+        !$OMP SHARED (x, y, z, m, hsoft2, pe, n) &
+        !$OMP PRIVATE(i, j, dist)
+        !$OMP DO SCHEDULE(DYNAMIC)
+        do i = 1, n
+            pe(i) = 0.
+            do j = 1, n
+                if (i /= j) then
+
+                    dist = sqrt( &
+                            (x(i) - x(j)) ** 2 + &
+                            (y(i) - y(j)) ** 2 + &
+                            (z(i) - z(j)) ** 2 + &
+                            hsoft2(i) + hsoft2(j) &
+                            )
+                    pe(i) = pe(i) + m(j) / dist
+
+                end if
+            end do
+        end do
+        !$OMP END DO
+        !$OMP END PARALLEL
+
+        deallocate(hsoft2)
+    end subroutine fortran_potential_mixed
+
+    subroutine fortran_potential_double(x, y, z, m, soft, pe, n)
+        ! Compute the potential energy for each particle in double
+        ! precision.
+        integer                       :: n        ! Number of particles
+        double precision, intent(in)  :: x(n)     ! Position x of particles
+        double precision, intent(in)  :: y(n)     ! Position y of particles
+        double precision, intent(in)  :: z(n)     ! Position z of particles
+        double precision, intent(in)  :: m(n)     ! Masses of particles
+        double precision, intent(in)  :: soft(n)  ! Softening of particles
+        double precision, intent(out) :: pe(n)    ! Specific potential energy
+
+        double precision              :: dist
+        double precision, allocatable :: hsoft2(:)
+        integer                       :: i, j
+
+        allocate(hsoft2(n))
+        hsoft2 = 0.5 * soft ** 2
+
+        !$OMP PARALLEL DEFAULT(NONE) &
+        !$OMP SHARED (x, y, z, m, hsoft2, pe, n) &
+        !$OMP PRIVATE(i, j, dist)
+        !$OMP DO SCHEDULE(DYNAMIC)
+        do i = 1, n
+            pe(i) = 0.
+            do j = 1, n
+                if (i /= j) then
+
+                    dist = sqrt( &
+                            (x(i) - x(j)) ** 2 + &
+                            (y(i) - y(j)) ** 2 + &
+                            (z(i) - z(j)) ** 2 + &
+                            hsoft2(i) + hsoft2(j) &
+                            )
+                    pe(i) = pe(i) + m(j) / dist
+
+                end if
+            end do
+        end do
+        !$OMP END DO
+        !$OMP END PARALLEL
+
+        deallocate(hsoft2)
+    end subroutine fortran_potential_double
+
+    subroutine fortran_potential_sources( &
+            x, y, z, soft, n, sx, sy, sz, sm, ssoft, sidx, ns, pe)
+        ! Compute the potential energy of n targets due to ns sources from
+        ! single precision inputs, accumulating in double precision.
+        ! sidx(j) is the target that is also the source j (0 if none),
+        ! skipped as a self interaction.
+        integer              :: n        ! Number of targets
+        integer              :: ns       ! Number of sources
+        real, intent(in)     :: x(n)     ! Position x of targets
+        real, intent(in)     :: y(n)     ! Position y of targets
+        real, intent(in)     :: z(n)     ! Position z of targets
+        real, intent(in)     :: soft(n)  ! Softening of targets
+        real, intent(in)     :: sx(ns)   ! Position x of sources
+        real, intent(in)     :: sy(ns)   ! Position y of sources
+        real, intent(in)     :: sz(ns)   ! Position z of sources
+        real, intent(in)     :: sm(ns)   ! Masses of sources
+        real, intent(in)     :: ssoft(ns) ! Softening of sources
+        integer, intent(in)  :: sidx(ns) ! Target of every source
+        double precision, intent(out) :: pe(n) ! Specific potential energy
+
+        real                 :: dist
+        real, allocatable    :: hsoft2(:), hssoft2(:)
+        integer              :: i, j
+
+        allocate(hsoft2(n), hssoft2(ns))
+        hsoft2 = 0.5 * soft ** 2
+        hssoft2 = 0.5 * ssoft ** 2
+
+        !$OMP PARALLEL DEFAULT(NONE) &
+        !$OMP SHARED (x, y, z, hsoft2, sx, sy, sz, sm, hssoft2, sidx) &
+        !$OMP SHARED (pe, n, ns) &
+        !$OMP PRIVATE(i, j, dist)
+        !$OMP DO SCHEDULE(DYNAMIC)
+        do i = 1, n
+            pe(i) = 0.
+            do j = 1, ns
+                if (sidx(j) /= i) then
+
+                    dist = sqrt( &
+                            (x(i) - sx(j)) ** 2 + &
+                            (y(i) - sy(j)) ** 2 + &
+                            (z(i) - sz(j)) ** 2 + &
+                            hsoft2(i) + hssoft2(j) &
+                            )
+                    pe(i) = pe(i) + sm(j) / dist
+
+                end if
+            end do
+        end do
+        !$OMP END DO
+        !$OMP END PARALLEL
+
+        deallocate(hsoft2, hssoft2)
+    end subroutine fortran_potential_sources
+
+    subroutine fortran_potential_sources_double( &
+            x, y, z, soft, n, sx, sy, sz, sm, ssoft, sidx, ns, pe)
+        ! Compute the potential energy of n targets due to ns sources in
+        ! double precision. sidx(j) is the target that is also the source
+        ! j (0 if none), skipped as a self interaction.
+        integer                       :: n         ! Number of targets
+        integer                       :: ns        ! Number of sources
+        double precision, intent(in)  :: x(n)      ! Position x of targets
+        double precision, intent(in)  :: y(n)      ! Position y of targets
+        double precision, intent(in)  :: z(n)      ! Position z of targets
+        double precision, intent(in)  :: soft(n)   ! Softening of targets
+        double precision, intent(in)  :: sx(ns)    ! Position x of sources
+        double precision, intent(in)  :: sy(ns)    ! Position y of sources
+        double precision, intent(in)  :: sz(ns)    ! Position z of sources
+        double precision, intent(in)  :: sm(ns)    ! Masses of sources
+        double precision, intent(in)  :: ssoft(ns) ! Softening of sources
+        integer, intent(in)           :: sidx(ns)  ! Target of every source
+        double precision, intent(out) :: pe(n)     ! Specific potential energy
+
+        double precision              :: dist
+        double precision, allocatable :: hsoft2(:), hssoft2(:)
+        integer                       :: i, j
+
+        allocate(hsoft2(n), hssoft2(ns))
+        hsoft2 = 0.5 * soft ** 2
+        hssoft2 = 0.5 * ssoft ** 2
+
+        !$OMP PARALLEL DEFAULT(NONE) &
+        !$OMP SHARED (x, y, z, hsoft2, sx, sy, sz, sm, hssoft2, sidx) &
+        !$OMP SHARED (pe, n, ns) &
+        !$OMP PRIVATE(i, j, dist)
+        !$OMP DO SCHEDULE(DYNAMIC)
+        do i = 1, n
+            pe(i) = 0.
+            do j = 1, ns
+                if (sidx(j) /= i) then
+
+                    dist = sqrt( &
+                            (x(i) - sx(j)) ** 2 + &
+                            (y(i) - sy(j)) ** 2 + &
+                            (z(i) - sz(j)) ** 2 + &
+                            hsoft2(i) + hssoft2(j) &
+                            )
+                    pe(i) = pe(i) + sm(j) / dist
+
+                end if
+            end do
+        end do
+        !$OMP END DO
+        !$OMP END PARALLEL
+
+        deallocate(hsoft2, hssoft2)
+    end subroutine fortran_potential_sources_double
+
 end module potential
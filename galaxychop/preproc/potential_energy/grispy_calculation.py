@@ -131,3 +131,117 @@ def potential_grispy(centre, m, bubble_size, shell_width, l_box, grid):
         d_min_shell += shell_width  # Repeat for next shell (further away)
 
     return pot_shells
+
+
+def _add_neighbors(pot, dist, ind, m, soft2=None, csoft2=None):
+    """Subtract the ``m / d`` contribution of the neighbours of each centre."""
+    counts = np.fromiter(map(len, dist), dtype=np.intp, count=len(dist))
+    if not counts.any():
+        return
+
+    distance = np.concatenate(dist)
+    ind = np.concatenate(ind)
+    owner = np.repeat(np.arange(len(dist)), counts)
+
+    # the centre itself (distance 0) is skipped before the softening
+    flt = distance > 0.0
+    if soft2 is not None:
+        distance = np.sqrt(distance**2 + (csoft2[owner] + soft2[ind]) / 2)
+
+    contrib = np.divide(
+        m[ind], distance, out=np.zeros_like(distance), where=flt
+    )
+
+    pot -= np.bincount(owner, weights=contrib, minlength=len(pot))
+
+
+def potential_grispy_batch(
+    centres,
+    m,
+    bubble_size,
+    shell_width,
+    l_box,
+    grid,
+    softening=None,
+    centres_softening=None,
+):
+    """Compute the potential of many particles at once.
+
+    Batched version of ``potential_grispy``: every centre is submitted to the
+    same GriSPy query (one for the bubble and one per shell) and the
+    contributions of the neighbours are reduced per centre with
+    ``np.bincount``.
+
+    Parameters
+    ----------
+    centres : np.array
+        3D spatial positions of the particles to compute their potential.
+        Shape: (k,3).
+    m : np.array
+        Individual masses of all the galaxy particles. Shape: (n,1).
+    bubble_size : float
+        Radii of the sphere that will contain the closest particles,
+        which potential contribution will be calculated via direct-
+        sumation. Shape: (1,).
+    shell_width : float
+        Width of the consecutive shells that will contain further particles.
+        Shape: (1,).
+    l_box : float
+        Size of the box that contains all particles. This defines the upper
+        limit value of the shells to implement the GriSPy's NNS. Shape: (1,).
+    grid : ``GriSPy class`` object
+        Spatial grid populated by the galaxy particles, to perform the NNS.
+    softening : float, np.ndarray or None, default=None
+        Softening of all the galaxy particles. If given, every distance is
+        softened with ``(centres_softening**2 + softening**2) / 2``. If
+        None, the distances are not softened, as in ``potential_grispy``.
+        Shape: (1,) or (n,1).
+    centres_softening : float, np.ndarray or None, default=None
+        Softening of the centres. Defaults to ``softening``.
+        Shape: (1,) or (k,1).
+
+    Returns
+    -------
+    pot_shells : np.ndarray
+        Potential of the given particles, with the same sign convention of
+        ``potential_grispy``. Shape: (k,).
+
+    """
+    # Bubble_size is related to the softening, and it must be > 0!
+    if bubble_size < 0:
+        raise ValueError("This method only works for a softening value > 0.")
+    elif bubble_size == 0:
+        bubble_size = 0.5
+
+    m = np.asarray(m)
+    pot_shells = np.zeros(len(centres), dtype=np.float64)
+
+    soft2 = csoft2 = None
+    if softening is not None:
+        if centres_softening is None:
+            centres_softening = softening
+        soft2 = np.broadcast_to(np.square(softening, dtype=float), m.shape)
+        csoft2 = np.broadcast_to(
+            np.square(centres_softening, dtype=float), len(centres)
+        )
+
+    # direct-sumation of the particles in the bubble, the centre itself
+    # (distance 0) is skipped
+    bubble_dist, bubble_ind = grid.bubble_neighbors(
+        centres, distance_upper_bound=bubble_size
+    )
+    _add_neighbors(pot_shells, bubble_dist, bubble_ind, m, soft2, csoft2)
+    del bubble_dist, bubble_ind
+
+    d_min_shell = bubble_size  # Shell's lower limit to initialize the loop
+    while d_min_shell < l_box:
+        shell_dist, shell_ind = grid.shell_neighbors(
+            centres,
+            distance_lower_bound=d_min_shell,
+            distance_upper_bound=d_min_shell + shell_width,
+        )
+        _add_neighbors(pot_shells, shell_dist, shell_ind, m, soft2, csoft2)
+
+        d_min_shell += shell_width  # Repeat for next shell (further away)
+
+    return pot_shells
@@ -0,0 +1,164 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Utilities to run a Numba compiled direct summation potential calculation.
+
+This module requires `numba <https://numba.pydata.org/>`_, an optional
+dependency of GalaxyChop, and it is only imported by the ``"numba"``
+potential backend.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numba
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+#: Default number of targets and sources of every tile of the direct sum.
+NUMBA_BLOCK_SIZE = 1024
+
+
+# =============================================================================
+# KERNELS
+# =============================================================================
+
+
+@numba.njit(parallel=True, fastmath=True, cache=True)
+def _direct_sum(tx, ty, tz, tsoft2, tid, sx, sy, sz, ssoft2, sm, sid, bs, out):
+    n_targets, n_sources = len(tx), len(sx)
+    n_blocks = (n_targets + bs - 1) // bs
+
+    # every thread owns a block of targets, and sweeps the sources in
+    # blocks so they stay in cache while they are reused
+    for block in numba.prange(n_blocks):
+        tstart = block * bs
+        tstop = min(tstart + bs, n_targets)
+        for sstart in range(0, n_sources, bs):
+            sstop = min(sstart + bs, n_sources)
+            for i in range(tstart, tstop):
+                xi, yi, zi = tx[i], ty[i], tz[i]
+                soft2i, idi = tsoft2[i], tid[i]
+                acc = out[i]
+                for j in range(sstart, sstop):
+                    dx = xi - sx[j]
+                    dy = yi - sy[j]
+                    dz = zi - sz[j]
+                    dist2 = dx * dx + dy * dy + dz * dz
+                    dist2 += (soft2i + ssoft2[j]) * 0.5
+                    # the self interaction is masked out without a branch,
+                    # with a non zero distance to avoid 0 / 0 without
+                    # softening
+                    is_self = idi == sid[j]
+                    mass = 0.0 if is_self else sm[j]
+                    dist2 += 1.0 if is_self else 0.0
+                    acc += mass / np.sqrt(dist2)
+                out[i] = acc
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+
+def potential_numba(
+    x,
+    y,
+    z,
+    m,
+    soft2,
+    *,
+    sources=None,
+    targets=None,
+    block_size=None,
+    n_jobs=None,
+    dtype=np.float64,
+):
+    """
+    Direct summation potential compiled with Numba.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    soft2 : np.ndarray
+        Squared softening of every particle. Every pair uses the mean of the
+        squared softening of both particles. Shape: (n,1).
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    block_size : int, optional
+        Number of targets and sources of every tile. Defaults to
+        ``NUMBA_BLOCK_SIZE``.
+    n_jobs : int, optional
+        Number of threads. If None, the Numba default is used.
+    dtype : np.dtype, default=np.float64
+        Dtype of the accumulators and of the result.
+
+    Returns
+    -------
+    np.ndarray
+        Sum of ``m_j / r_ij`` over the sources of every target (without the
+        gravitational constant). Shape: (k,1).
+
+    """
+    block_size = NUMBA_BLOCK_SIZE if block_size is None else int(block_size)
+    if block_size < 1:
+        raise ValueError("'block_size' must be >= 1")
+    max_threads = numba.config.NUMBA_NUM_THREADS
+    if n_jobs is not None and not 1 <= n_jobs <= max_threads:
+        raise ValueError(f"'n_jobs' must be in [1, {max_threads}]")
+
+    ids = np.arange(len(x))
+    tgts, srcs = (ids, ids) if targets is None else (targets, ids)
+    if sources is not None:
+        srcs = np.asarray(sources)
+    tgts = np.asarray(tgts)
+
+    def _take(arr, idx):
+        return np.ascontiguousarray(arr[idx])
+
+    out = np.zeros(len(tgts), dtype=dtype)
+
+    previous = numba.get_num_threads()
+    if n_jobs is not None:
+        numba.set_num_threads(n_jobs)
+    try:
+        _direct_sum(
+            _take(x, tgts),
+            _take(y, tgts),
+            _take(z, tgts),
+            _take(soft2, tgts),
+            tgts,
+            _take(x, srcs),
+            _take(y, srcs),
+            _take(z, srcs),
+            _take(soft2, srcs),
+            _take(m, srcs),
+            srcs,
+            block_size,
+            out,
+        )
+    finally:
+        numba.set_num_threads(previous)
+
+    return out
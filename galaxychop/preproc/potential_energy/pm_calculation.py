@@ -0,0 +1,627 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Utilities to run a particle-mesh (PM/P3M) potential calculation."""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import attr
+
+import numpy as np
+
+from scipy import fft, special
+from scipy.spatial import cKDTree
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+#: Mass assignment schemes and the number of cells per axis of their stencil.
+ASSIGNMENT_SCHEMES = {"cic": 2, "tsc": 3}
+
+#: Number of particles assigned to the mesh at the same time.
+_BATCH_PARTICLES = 2**16
+
+#: Maximum number of pairs of a batch of the short range correction.
+_BATCH_PAIRS = 2**22
+
+
+# =============================================================================
+# MESH
+# =============================================================================
+
+
+@attr.s(frozen=True, slots=True, repr=False)
+class Mesh:
+    """Cubic cells covering a set of particles.
+
+    Parameters
+    ----------
+    origin : np.ndarray
+        Position of the centre of the first cell. Shape: (3,).
+    cell : float
+        Side of the cells.
+    shape : tuple of int
+        Number of cells along every axis.
+
+    """
+
+    origin = attr.ib()
+    cell = attr.ib()
+    shape = attr.ib()
+
+    def __repr__(self):
+        """repr(x) <=> x.__repr__()."""
+        return f"<Mesh shape={self.shape}, cell={self.cell:.4g}>"
+
+    @property
+    def size(self):
+        """Total number of cells."""
+        return int(np.prod(self.shape))
+
+
+def make_mesh(x, y, z, n_cells=64):
+    """
+    Mesh maker.
+
+    Build cubic cells with ``n_cells`` cells along the longest side of the
+    bounding box of the particles, plus a margin of cells for the stencils
+    of the particles placed on the boundaries.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    n_cells : int, default=64
+        Number of cells along the longest side of the bounding box.
+
+    Returns
+    -------
+    mesh : ``Mesh``
+        The mesh that covers all the particles.
+
+    """
+    if n_cells < 1:
+        raise ValueError("n_cells must be >= 1")
+
+    pos = np.column_stack((x, y, z)).astype(np.float64, copy=False)
+    lower, upper = pos.min(axis=0), pos.max(axis=0)
+    extent = upper - lower
+
+    cell = extent.max() / n_cells if extent.max() > 0 else 1.0
+
+    # one cell of margin below and two above for the widest stencil
+    shape = tuple(int(n) + 3 for n in np.ceil(extent / cell))
+
+    return Mesh(origin=lower - cell, cell=float(cell), shape=shape)
+
+
+def _axis_stencil(u, scheme):
+    """Cells and weights of the stencil of every particle along one axis."""
+    if scheme == "cic":
+        first = np.floor(u)
+        d = u - first
+        weights = np.stack((1 - d, d), axis=-1)
+    else:
+        first = np.rint(u)
+        d = u - first
+        weights = np.stack(
+            (0.5 * (0.5 - d) ** 2, 0.75 - d**2, 0.5 * (0.5 + d) ** 2),
+            axis=-1,
+        )
+        first -= 1
+
+    cells = first.astype(np.intp)[:, None] + np.arange(weights.shape[1])
+    return cells, weights
+
+
+def _stencils(mesh, x, y, z, scheme):
+    """Stencils of every axis of a batch of particles."""
+    if scheme not in ASSIGNMENT_SCHEMES:
+        raise ValueError(
+            f"Unknown scheme {scheme!r}. "
+            f"Available: {sorted(ASSIGNMENT_SCHEMES)}"
+        )
+    return [
+        _axis_stencil(
+            (np.asarray(coord, dtype=np.float64) - origin) / mesh.cell, scheme
+        )
+        for coord, origin in zip((x, y, z), mesh.origin)
+    ]
+
+
+def _flat_stencils(mesh, x, y, z, scheme):
+    """Flat indices and weights of the 3D stencils of a batch of particles."""
+    (ix, wx), (iy, wy), (iz, wz) = _stencils(mesh, x, y, z, scheme)
+    _, ny, nz = mesh.shape
+
+    cells = ix[:, :, None, None] * ny + iy[:, None, :, None]
+    cells = cells * nz + iz[:, None, None, :]
+    weights = (
+        wx[:, :, None, None] * wy[:, None, :, None] * wz[:, None, None, :]
+    )
+
+    return cells.reshape(len(cells), -1), weights.reshape(len(weights), -1)
+
+
+def deposit(mesh, x, y, z, m, scheme="tsc"):
+    """
+    Assign the mass of the particles to the cells of the mesh.
+
+    Parameters
+    ----------
+    mesh : ``Mesh``
+        Mesh that covers the particles.
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    scheme : str, default="tsc"
+        Mass assignment scheme: ``"cic"`` (cloud in cell) or ``"tsc"``
+        (triangular shaped cloud).
+
+    Returns
+    -------
+    mass : np.ndarray
+        Mass of every cell. Shape: ``mesh.shape``.
+
+    """
+    mass = np.zeros(mesh.size, dtype=np.float64)
+    for first in range(0, len(m), _BATCH_PARTICLES):
+        batch = slice(first, first + _BATCH_PARTICLES)
+        cells, weights = _flat_stencils(
+            mesh, x[batch], y[batch], z[batch], scheme
+        )
+        weights *= np.asarray(m[batch], dtype=np.float64)[:, None]
+        mass += np.bincount(
+            cells.ravel(), weights=weights.ravel(), minlength=mesh.size
+        )
+
+    return mass.reshape(mesh.shape)
+
+
+def interpolate(mesh, values, x, y, z, scheme="tsc"):
+    """
+    Interpolate a field defined on the cells of the mesh to the particles.
+
+    Parameters
+    ----------
+    mesh : ``Mesh``
+        Mesh that covers the particles.
+    values : np.ndarray
+        Value of the field in every cell. Shape: ``mesh.shape``.
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    scheme : str, default="tsc"
+        Interpolation scheme, it must be the one used to deposit the mass.
+
+    Returns
+    -------
+    field : np.ndarray
+        Value of the field at every particle. Shape: (n,1).
+
+    """
+    values = np.ravel(values)
+    field = np.empty(len(x), dtype=np.float64)
+    for first in range(0, len(x), _BATCH_PARTICLES):
+        batch = slice(first, first + _BATCH_PARTICLES)
+        cells, weights = _flat_stencils(
+            mesh, x[batch], y[batch], z[batch], scheme
+        )
+        field[batch] = np.sum(values[cells] * weights, axis=1)
+
+    return field
+
+
+# =============================================================================
+# KERNELS
+# =============================================================================
+
+
+def long_range_kernel(r, split):
+    """
+    Long range part ``erf(r / split) / r`` of the ``1 / r`` kernel.
+
+    It is the potential of a unit mass smoothed by a gaussian of width
+    ``split / sqrt(2)``, so it is finite at ``r=0`` and smooth enough to be
+    sampled by the mesh.
+
+    Parameters
+    ----------
+    r : np.ndarray
+        Distances.
+    split : float
+        Splitting scale between the long and the short range kernels.
+
+    Returns
+    -------
+    kernel : np.ndarray
+        The long range kernel at every distance.
+
+    """
+    r = np.asarray(r, dtype=np.float64)
+    kernel = np.full(r.shape, 2 / (np.sqrt(np.pi) * split))
+    nonzero = r > 0
+    kernel[nonzero] = special.erf(r[nonzero] / split) / r[nonzero]
+    return kernel
+
+
+def green_function(mesh, split, scheme="tsc", dtype=np.float64, workers=None):
+    """
+    Fourier transform of the long range kernel over the padded mesh.
+
+    The mesh is zero padded to (at least) twice its size along every axis,
+    so the cyclic convolution of the FFT is the isolated (non periodic) one.
+    The transform is divided by the square of the window of the assignment
+    scheme, which is applied once to deposit the mass and once to
+    interpolate the potential.
+
+    Parameters
+    ----------
+    mesh : ``Mesh``
+        The mesh of the particles.
+    split : float
+        Splitting scale of the long range kernel.
+    scheme : str, default="tsc"
+        The mass assignment scheme.
+    dtype : np.dtype, default=np.float64
+        Floating point type of the transform.
+    workers : int, optional
+        Number of threads of the FFT.
+
+    Returns
+    -------
+    green : np.ndarray
+        Real FFT of the kernel sampled at the distances between cells.
+    padded : tuple of int
+        Shape of the padded mesh.
+
+    """
+    width = ASSIGNMENT_SCHEMES[scheme]
+    padded = tuple(fft.next_fast_len(2 * n, real=True) for n in mesh.shape)
+
+    # distances between cells, wrapped for the cyclic convolution
+    axes = [
+        np.minimum(np.arange(p), p - np.arange(p)) * mesh.cell for p in padded
+    ]
+    r = np.sqrt(
+        axes[0][:, None, None] ** 2
+        + axes[1][None, :, None] ** 2
+        + axes[2][None, None, :] ** 2
+    )
+    kernel = long_range_kernel(r, split).astype(dtype, copy=False)
+    del r
+
+    green = fft.rfftn(kernel, workers=workers)
+    del kernel
+
+    # deconvolution of the assignment and the interpolation windows
+    wx, wy = (np.sinc(fft.fftfreq(p)) ** (2 * width) for p in padded[:2])
+    wz = np.sinc(fft.rfftfreq(padded[2])) ** (2 * width)
+    green /= wx[:, None, None] * wy[None, :, None] * wz[None, None, :]
+
+    return green, padded
+
+
+def mesh_potential(mesh, mass, green, padded, workers=None):
+    """
+    Solve the potential of the mass of the cells with the FFT.
+
+    Parameters
+    ----------
+    mesh : ``Mesh``
+        The mesh of the particles.
+    mass : np.ndarray
+        Mass of every cell. Shape: ``mesh.shape``.
+    green, padded :
+        The Green function and the padded shape from ``green_function()``.
+    workers : int, optional
+        Number of threads of the FFT.
+
+    Returns
+    -------
+    pot : np.ndarray
+        Sum of ``m * erf(d / split) / d`` over the cells, for every cell
+        (without the gravitational constant). Shape: ``mesh.shape``.
+
+    """
+    rho = fft.rfftn(
+        mass.astype(green.real.dtype, copy=False), s=padded, workers=workers
+    )
+    rho *= green
+
+    pot = fft.irfftn(rho, s=padded, workers=workers)
+    nx, ny, nz = mesh.shape
+    return pot[:nx, :ny, :nz]
+
+
+def self_potential(mesh, x, y, z, m, green, padded, scheme="tsc"):
+    """
+    Potential of every particle due to its own mass assigned to the mesh.
+
+    Parameters
+    ----------
+    mesh : ``Mesh``
+        The mesh of the particles.
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    green, padded :
+        The Green function and the padded shape from ``green_function()``.
+    scheme : str, default="tsc"
+        The mass assignment scheme.
+
+    Returns
+    -------
+    pot : np.ndarray
+        The self interaction through the mesh, ``m_i`` times the sum of
+        ``w_a * w_b * kernel(c_a - c_b)`` over every pair of cells of the
+        stencil of the particle, with the kernel of the mesh.
+        Shape: (n,1).
+
+    """
+    width = ASSIGNMENT_SCHEMES[scheme]
+
+    # the kernel between the cells of a stencil
+    offsets = np.arange(1 - width, width)
+    kernel = fft.irfftn(green, s=padded)
+    table = kernel[np.ix_(*(offsets % p for p in padded))]
+    del kernel
+
+    pot = np.empty(len(m), dtype=np.float64)
+    for first in range(0, len(m), _BATCH_PARTICLES):
+        batch = slice(first, first + _BATCH_PARTICLES)
+
+        # autocorrelation of the weights of every axis
+        corr = []
+        for _, weights in _stencils(
+            mesh, x[batch], y[batch], z[batch], scheme
+        ):
+            auto = np.zeros((len(weights), 2 * width - 1))
+            for a in range(width):
+                for b in range(width):
+                    auto[:, a - b + width - 1] += weights[:, a] * weights[:, b]
+            corr.append(auto)
+
+        pot[batch] = np.einsum("nd,ne,nf,def->n", *corr, table) * m[batch]
+
+    return pot
+
+
+def short_range_potential(
+    x,
+    y,
+    z,
+    softening,
+    sx,
+    sy,
+    sz,
+    sm,
+    ssoftening,
+    split,
+    cutoff,
+    self_idx=None,
+):
+    """
+    Short range correction of the particle-mesh potential (P3M).
+
+    For every pair of target and source closer than ``cutoff``, replace the
+    long range kernel by the softened Newtonian one. The targets are
+    processed in batches with a bounded number of pairs.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of the targets. Shape: (k,1).
+    softening : float or np.ndarray
+        Softening of the targets. Shape: (1,) or (k,1).
+    sx, sy, sz : np.ndarray
+        Positions of the sources. Shape: (n,1).
+    sm : np.ndarray
+        Masses of the sources. Shape: (n,1).
+    ssoftening : float or np.ndarray
+        Softening of the sources. Shape: (1,) or (n,1).
+    split : float
+        Splitting scale of the long range kernel.
+    cutoff : float
+        Maximum distance of the corrected pairs.
+    self_idx : np.ndarray or None, default=None
+        Target of every source (``-1`` if none), used to skip the self
+        interaction. If None, only the pairs with null softened distance
+        are skipped.
+
+    Returns
+    -------
+    pot : np.ndarray
+        Sum of ``m / sqrt(d**2 + eps**2) - m * erf(d / split) / d`` over the
+        close sources of every target (without the gravitational constant).
+        Shape: (k,1).
+
+    """
+    targets = np.column_stack((x, y, z)).astype(np.float64, copy=False)
+    stree = cKDTree(np.column_stack((sx, sy, sz)))
+    sm = np.asarray(sm, dtype=np.float64)
+
+    tsoft2 = np.square(np.asarray(softening, dtype=np.float64))
+    ssoft2 = np.square(np.asarray(ssoftening, dtype=np.float64))
+    per_particle = np.ndim(tsoft2) or np.ndim(ssoft2)
+    if per_particle:
+        tsoft2 = np.broadcast_to(tsoft2, len(targets))
+        ssoft2 = np.broadcast_to(ssoft2, len(sm))
+
+    # split the targets in batches of about _BATCH_PAIRS pairs
+    counts = stree.query_ball_point(targets, cutoff, return_length=True)
+    cumsum = np.concatenate(([0], np.cumsum(counts)))
+    bounds = [0]
+    while bounds[-1] < len(targets):
+        first = bounds[-1]
+        last = np.searchsorted(cumsum, cumsum[first] + _BATCH_PAIRS, "right")
+        bounds.append(min(len(targets), max(last - 1, first + 1)))
+
+    pot = np.zeros(len(targets), dtype=np.float64)
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        ttree = cKDTree(targets[first:last])
+        pairs = ttree.sparse_distance_matrix(
+            stree, cutoff, output_type="ndarray"
+        )
+        tidx, sidx, r = pairs["i"], pairs["j"], pairs["v"]
+
+        if per_particle:
+            soft2 = (tsoft2[tidx + first] + ssoft2[sidx]) / 2
+        else:
+            soft2 = (tsoft2 + ssoft2) / 2
+        dist = np.sqrt(r**2 + soft2)
+
+        valid = dist > 0
+        if self_idx is not None:
+            valid &= self_idx[sidx] != tidx + first
+
+        tidx, sidx, r, dist = tidx[valid], sidx[valid], r[valid], dist[valid]
+        contrib = sm[sidx] * (1 / dist - long_range_kernel(r, split))
+        pot[first:last] += np.bincount(
+            tidx, weights=contrib, minlength=len(ttree.data)
+        )
+
+    return pot
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+
+def potential_pm(
+    mesh,
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    sources=None,
+    targets=None,
+    scheme="tsc",
+    split=1.25,
+    p3m=False,
+    cutoff=4.5,
+    dtype=np.float64,
+    workers=None,
+):
+    """
+    Compute the potential of every particle with a particle-mesh method.
+
+    The mass of the sources is assigned to the mesh, the potential of the
+    long range kernel ``erf(d / rs) / d`` (with ``rs = split * cell``) is
+    solved with a zero padded FFT and interpolated back to the particles,
+    and the self interaction of every source through the mesh is removed.
+    With ``p3m=True`` the pairs closer than ``cutoff * rs`` are corrected
+    to the softened Newtonian kernel by direct summation.
+
+    Parameters
+    ----------
+    mesh : ``Mesh``
+        Mesh that covers all the particles.
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening of the particles, only used by the short range correction.
+        Pairs use ``(eps_i**2 + eps_j**2) / 2`` as squared softening.
+        Shape: (1,) or (n,1).
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    scheme : str, default="tsc"
+        Mass assignment and interpolation scheme, ``"cic"`` or ``"tsc"``.
+    split : float, default=1.25
+        Splitting scale ``rs`` of the kernels, in cells.
+    p3m : bool, default=False
+        If True, add the short range correction (P3M). Otherwise the
+        particles interact as gaussian clouds of width ``rs / sqrt(2)``.
+    cutoff : float, default=4.5
+        Radius of the short range correction, in units of ``rs``.
+    dtype : np.dtype, default=np.float64
+        Floating point type of the FFT.
+    workers : int, optional
+        Number of threads of the FFT.
+
+    Returns
+    -------
+    pot : np.ndarray
+        Sum of ``m / sqrt(d**2 + eps**2)`` over the sources (without the
+        gravitational constant) for every target. Shape: (k,1).
+
+    """
+    if split <= 0 or cutoff <= 0:
+        raise ValueError("split and cutoff must be > 0")
+
+    rs = split * mesh.cell
+    sources = np.arange(len(m)) if sources is None else np.asarray(sources)
+    targets = np.arange(len(m)) if targets is None else np.asarray(targets)
+
+    # the target of every source, -1 if none
+    position = np.full(len(m), -1)
+    position[targets] = np.arange(len(targets))
+    self_idx = position[sources]
+
+    sx, sy, sz, sm = x[sources], y[sources], z[sources], m[sources]
+    ssoftening = softening[sources] if np.ndim(softening) else softening
+    x, y, z = x[targets], y[targets], z[targets]
+    if np.ndim(softening):
+        softening = softening[targets]
+
+    if scheme not in ASSIGNMENT_SCHEMES:
+        raise ValueError(
+            f"Unknown scheme {scheme!r}. "
+            f"Available: {sorted(ASSIGNMENT_SCHEMES)}"
+        )
+
+    green, padded = green_function(
+        mesh, rs, scheme=scheme, dtype=dtype, workers=workers
+    )
+
+    mass = deposit(mesh, sx, sy, sz, sm, scheme=scheme)
+    values = mesh_potential(mesh, mass, green, padded, workers=workers)
+    del mass
+
+    pot = interpolate(mesh, values, x, y, z, scheme=scheme)
+    del values
+
+    own = self_idx >= 0
+    pot[self_idx[own]] -= self_potential(
+        mesh, sx[own], sy[own], sz[own], sm[own], green, padded, scheme=scheme
+    )
+    del green
+
+    if p3m:
+        pot += short_range_potential(
+            x,
+            y,
+            z,
+            softening,
+            sx,
+            sy,
+            sz,
+            sm,
+            ssoftening,
+            rs,
+            cutoff * rs,
+            self_idx=self_idx,
+        )
+
+    return pot
@@ -0,0 +1,113 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Utilities to run a spherically symmetric potential calculation."""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+# =============================================================================
+# SPHERICAL SHELLS
+# =============================================================================
+
+
+def _inverse(values):
+    """1 / values, with 0 where values is 0."""
+    return np.divide(1, values, out=np.zeros_like(values), where=values > 0)
+
+
+def potential_spherical(
+    x,
+    y,
+    z,
+    m,
+    softening,
+    *,
+    center=None,
+    sources=None,
+    targets=None,
+    dtype=np.float64,
+):
+    """
+    Potential of the spherical average of the mass distribution.
+
+    Every source is replaced by a thin shell of the same mass, so the
+    potential at a radius ``r`` is ``M(<r) / r`` plus the sum of ``m_j / r_j``
+    over the sources outside ``r``. The radii are sorted once, and both terms
+    are cumulative sums evaluated with a binary search: O(N log N).
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    softening : float or np.ndarray
+        Softening parameter, shared by all the particles or one per particle.
+        The radius of every particle is softened as ``sqrt(r**2 + eps**2)``.
+        Shape: (1,) or (n,1).
+    center : np.ndarray, optional
+        Center of the shells. Shape: (3,). If None, the origin.
+    sources : np.ndarray, optional
+        Indices of the particles that are sources of the field. If None,
+        all the particles are sources.
+    targets : np.ndarray, optional
+        Indices of the particles where the potential is evaluated. If None,
+        it is evaluated at every particle.
+    dtype : np.dtype, default=np.float64
+        Dtype of the sums and of the result.
+
+    Returns
+    -------
+    np.ndarray
+        Potential of every target (positive, without the gravitational
+        constant). Shape: (k,1).
+
+    Notes
+    -----
+    The unsoftened particles at the center do not contribute to the
+    potential of each other, instead of producing an infinite potential.
+
+    """
+    center = np.zeros(3) if center is None else np.asarray(center)
+    positions = np.stack((x, y, z), axis=-1).astype(dtype, copy=False)
+    radius2 = np.sum(np.square(positions - center.astype(dtype)), axis=-1)
+    soft2 = np.square(np.asarray(softening, dtype=dtype))
+    inv_radius = _inverse(np.sqrt(radius2 + soft2))
+    radius = np.sqrt(radius2)
+    m = np.asarray(m, dtype=dtype)
+
+    ids = np.arange(len(m))
+    srcs = ids if sources is None else np.asarray(sources)
+    tgts = ids if targets is None else np.asarray(targets)
+
+    # sort the sources by radius once
+    order = srcs[np.argsort(radius[srcs], kind="stable")]
+    sradius = radius[order]
+
+    # mass inside the first i shells, and m / r of the shells from the i-th
+    inner = np.concatenate(([0], np.cumsum(m[order], dtype=dtype)))
+    outer = np.cumsum((m * inv_radius)[order][::-1], dtype=dtype)[::-1]
+    outer = np.concatenate((outer, [0]))
+
+    # the shells at the radius of a target are outside of it, with the same
+    # potential; the target itself is one of them if it is a source
+    pos = np.searchsorted(sradius, radius[tgts], side="left")
+    epot = inner[pos] * inv_radius[tgts] + outer[pos]
+
+    is_source = np.zeros(len(m), dtype=bool)
+    is_source[srcs] = True
+    epot -= np.where(is_source[tgts], m[tgts] * inv_radius[tgts], 0)
+
+    return epot.astype(dtype, copy=False)
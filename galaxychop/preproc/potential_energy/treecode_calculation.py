@@ -0,0 +1,538 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Utilities to build an octree and run a Barnes-Hut potential calculation."""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import attr
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+#: Number of bits per axis used in the Morton keys (3 * 21 = 63 bits).
+MORTON_BITS = 21
+
+_MORTON_MASKS = (
+    (32, np.uint64(0x1F00000000FFFF)),
+    (16, np.uint64(0x1F0000FF0000FF)),
+    (8, np.uint64(0x100F00F00F00F00F)),
+    (4, np.uint64(0x10C30C30C30C30C3)),
+    (2, np.uint64(0x1249249249249249)),
+)
+
+
+# =============================================================================
+# INTERNALS
+# =============================================================================
+
+
+def _ragged_arange(starts, counts):
+    """Concatenate ``arange(s, s + c)`` for every pair of starts and counts."""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    shift = np.repeat(np.asarray(starts, dtype=np.int64) - offsets, counts)
+    return shift + np.arange(total, dtype=np.int64)
+
+
+def _spread_bits(v):
+    """Insert two zeros between every bit of the 21 lowest bits of v."""
+    v = v.astype(np.uint64) & np.uint64(0x1FFFFF)
+    for shift, mask in _MORTON_MASKS:
+        v = (v | (v << np.uint64(shift))) & mask
+    return v
+
+
+def _compact_bits(v):
+    """Keep every third bit of v (the inverse of ``_spread_bits``)."""
+    shifts, masks = zip(*reversed(_MORTON_MASKS))
+    masks = masks[1:] + (np.uint64(0x1FFFFF),)
+    v = v.astype(np.uint64) & np.uint64(0x1249249249249249)
+    for shift, mask in zip(shifts, masks):
+        v = (v ^ (v >> np.uint64(shift))) & mask
+    return v
+
+
+def morton_keys(x, y, z):
+    """
+    Morton (Z-order) keys of a set of particles.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+
+    Returns
+    -------
+    keys : np.ndarray
+        63 bits Morton key of each particle. Shape: (n,1).
+    origin : np.ndarray
+        Lower corner of the cube that encloses all particles. Shape: (3,).
+    l_box : float
+        Length of the side of the cube that encloses all particles.
+
+    """
+    pos = np.column_stack((x, y, z)).astype(np.float64)
+    origin = pos.min(axis=0)
+    l_box = float(np.max(pos.max(axis=0) - origin))
+
+    # a tiny enlargement keeps the particles in the upper border inside
+    l_box = l_box * (1.0 + 1e-10) if l_box > 0 else 1.0
+
+    cells = np.floor((pos - origin) / l_box * 2**MORTON_BITS)
+    cells = np.clip(cells, 0, 2**MORTON_BITS - 1).astype(np.uint64)
+
+    keys = (
+        _spread_bits(cells[:, 0]) << np.uint64(2)
+        | _spread_bits(cells[:, 1]) << np.uint64(1)
+        | _spread_bits(cells[:, 2])
+    )
+    return keys, origin, l_box
+
+
+# =============================================================================
+# OCTREE
+# =============================================================================
+
+
+@attr.s(frozen=True, slots=True, repr=False)
+class Octree:
+    """
+    Flat, Morton ordered octree.
+
+    The particles are sorted by their Morton key, so every node owns a
+    contiguous slice ``[start, start + count)`` of the sorted particles and
+    the children of every node are contiguous in the node arrays.
+
+    Parameters
+    ----------
+    order : np.ndarray
+        Permutation that sorts the original particles by Morton key.
+    x, y, z, m : np.ndarray
+        Positions and masses of the sorted particles.
+    start, count : np.ndarray
+        First sorted particle and number of particles of each node.
+    mass : np.ndarray
+        Total mass of each node.
+    cx, cy, cz : np.ndarray
+        Centre of mass of each node.
+    side : np.ndarray
+        Length of the side of the cubic cell of each node.
+    ox, oy, oz : np.ndarray
+        Lower corner of the cubic cell of each node.
+    level : np.ndarray
+        Depth of each node (the root is at level 0). The nodes are sorted
+        by level.
+    rmax : np.ndarray
+        Distance from the centre of mass to the farthest particle of the
+        node.
+    child_start, n_children : np.ndarray
+        Index of the first child and number of children of each node.
+        Leaves have ``n_children == 0``.
+
+    """
+
+    order = attr.ib()
+    x = attr.ib()
+    y = attr.ib()
+    z = attr.ib()
+    m = attr.ib()
+    start = attr.ib()
+    count = attr.ib()
+    mass = attr.ib()
+    cx = attr.ib()
+    cy = attr.ib()
+    cz = attr.ib()
+    side = attr.ib()
+    ox = attr.ib()
+    oy = attr.ib()
+    oz = attr.ib()
+    level = attr.ib()
+    rmax = attr.ib()
+    child_start = attr.ib()
+    n_children = attr.ib()
+
+    def __repr__(self):
+        """repr(x) <=> x.__repr__()."""
+        return (
+            f"<Octree particles={len(self.m)}, nodes={len(self.mass)}, "
+            f"leaves={np.sum(self.n_children == 0)}>"
+        )
+
+    @property
+    def is_leaf(self):
+        """Boolean mask of the nodes without children."""
+        return self.n_children == 0
+
+    @property
+    def inverse_order(self):
+        """Position of every original particle inside the sorted arrays."""
+        inverse = np.empty_like(self.order)
+        inverse[self.order] = np.arange(len(self.order))
+        return inverse
+
+
+def _nodes_properties(x, y, z, m, pidx, bounds):
+    """Mass, centre of mass and radius of consecutive groups of particles."""
+    counts = np.diff(np.append(bounds, len(pidx)))
+
+    mp = m[pidx]
+    mass = np.add.reduceat(mp, bounds)
+
+    # massless nodes are centred in the geometric mean of their particles
+    weights = np.where(np.repeat(mass > 0, counts), mp, 1.0)
+    norm = np.add.reduceat(weights, bounds)
+
+    cx = np.add.reduceat(weights * x[pidx], bounds) / norm
+    cy = np.add.reduceat(weights * y[pidx], bounds) / norm
+    cz = np.add.reduceat(weights * z[pidx], bounds) / norm
+
+    r2 = (
+        (x[pidx] - np.repeat(cx, counts)) ** 2
+        + (y[pidx] - np.repeat(cy, counts)) ** 2
+        + (z[pidx] - np.repeat(cz, counts)) ** 2
+    )
+    rmax = np.sqrt(np.maximum.reduceat(r2, bounds))
+
+    return mass, cx, cy, cz, rmax
+
+
+def make_octree(x, y, z, m, leaf_size=16):
+    """
+    Octree maker.
+
+    Sort the particles along a Morton curve and split, level by level, every
+    cell with more than ``leaf_size`` particles into its (up to eight)
+    non-empty children.
+
+    Parameters
+    ----------
+    x, y, z : np.ndarray
+        Positions of particles. Shape: (n,1).
+    m : np.ndarray
+        Masses of particles. Shape: (n,1).
+    leaf_size : int, default=16
+        Maximum number of particles of a leaf. Cells at the maximum depth
+        of the Morton keys are leaves regardless of their size.
+
+    Returns
+    -------
+    tree : ``Octree``
+        The octree populated with all the particles.
+
+    """
+    if leaf_size < 1:
+        raise ValueError("leaf_size must be >= 1")
+
+    keys, origin, l_box = morton_keys(x, y, z)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    xs = np.asarray(x, dtype=np.float64)[order]
+    ys = np.asarray(y, dtype=np.float64)[order]
+    zs = np.asarray(z, dtype=np.float64)[order]
+    ms = np.asarray(m, dtype=np.float64)[order]
+
+    # the root node
+    root_idx = np.arange(len(ms))
+    root_bounds = np.array([0])
+    levels = [
+        (np.array([0]), np.array([len(ms)]), l_box)
+        + _nodes_properties(xs, ys, zs, ms, root_idx, root_bounds)
+    ]
+    n_children = []
+
+    level = 0
+    while True:
+        start, count = levels[-1][:2]
+        split = count > leaf_size
+        if level == MORTON_BITS or not np.any(split):
+            n_children.append(np.zeros(len(start), dtype=np.int64))
+            break
+
+        # all the particles of the nodes to split, in Morton order
+        pidx = _ragged_arange(start[split], count[split])
+        shift = np.uint64(3 * (MORTON_BITS - level - 1))
+        child_keys = keys[pidx] >> shift
+        bounds = np.flatnonzero(
+            np.concatenate(([True], child_keys[1:] != child_keys[:-1]))
+        )
+
+        # every child belongs to the parent that owns its first particle
+        parent = np.repeat(np.flatnonzero(split), count[split])[bounds]
+        n_children.append(np.bincount(parent, minlength=len(start)))
+
+        child_start = pidx[bounds]
+        child_count = np.diff(np.append(bounds, len(pidx)))
+        level += 1
+        levels.append(
+            (child_start, child_count, l_box / 2**level)
+            + _nodes_properties(xs, ys, zs, ms, pidx, bounds)
+        )
+
+    # flatten all the levels in a single set of arrays
+    sizes = [len(lvl[0]) for lvl in levels]
+    offsets = np.cumsum([0] + sizes)
+    flat_children = np.concatenate(n_children)
+
+    child_start = np.zeros(offsets[-1], dtype=np.int64)
+    for lvl, nch in enumerate(n_children[:-1]):
+        first = offsets[lvl + 1] + np.cumsum(nch) - nch
+        child_start[slice(offsets[lvl], offsets[lvl + 1])] = first
+
+    def _cat(pos):
+        return np.concatenate([lvl[pos] for lvl in levels])
+
+    side = np.concatenate(
+        [np.full(size, lvl[2]) for size, lvl in zip(sizes, levels)]
+    )
+    depth = np.repeat(np.arange(len(levels)), sizes)
+
+    # the Morton prefix of the first particle of a node indexes its cell
+    start = _cat(0)
+    shift = (3 * (MORTON_BITS - depth)).astype(np.uint64)
+    prefix = keys[start] >> shift
+    corner = origin + side[:, np.newaxis] * np.column_stack(
+        [_compact_bits(prefix >> np.uint64(axis)) for axis in (2, 1, 0)]
+    )
+
+    return Octree(
+        order=order,
+        x=xs,
+        y=ys,
+        z=zs,
+        m=ms,
+        start=start,
+        count=_cat(1),
+        mass=_cat(3),
+        cx=_cat(4),
+        cy=_cat(5),
+        cz=_cat(6),
+        side=side,
+        ox=corner[:, 0],
+        oy=corner[:, 1],
+        oz=corner[:, 2],
+        level=depth,
+        rmax=_cat(7),
+        child_start=child_start,
+        n_children=flat_children,
+    )
+
+
+# =============================================================================
+# SOFTENING
+# =============================================================================
+
+
+def nodes_softening(tree, softening):
+    """
+    Squared softening of the particles and the nodes of an octree.
+
+    The squared softening of a node is the mass weighted mean of the squared
+    softening of its particles, so it plays the role of the softening of the
+    monopole of the node.
+
+    Parameters
+    ----------
+    tree : ``Octree``
+        Octree populated with the particles.
+    softening : float or np.ndarray
+        Softening of every particle, in the original order. Shape: (n,1).
+
+    Returns
+    -------
+    psoft2 : np.ndarray
+        Squared softening of the particles in the order of the tree.
+        Shape: (n,1).
+    nsoft2 : np.ndarray
+        Squared softening of every node.
+
+    """
+    psoft2 = np.broadcast_to(
+        np.square(np.asarray(softening, dtype=np.float64)), tree.m.shape
+    )[tree.order]
+
+    cumsum = np.concatenate(([0.0], np.cumsum(tree.m * psoft2)))
+    msoft2 = cumsum[tree.start + tree.count] - cumsum[tree.start]
+
+    # massless nodes have no monopole at all
+    nsoft2 = np.divide(
+        msoft2, tree.mass, out=np.zeros_like(msoft2), where=tree.mass > 0
+    )
+
+    return psoft2, nsoft2
+
+
+# =============================================================================
+# BARNES-HUT
+# =============================================================================
+
+
+def _contains(tree, nodes, tx, ty, tz):
+    """Check which targets are inside the cell of their node."""
+    side = tree.side[nodes]
+    inside = np.ones(len(nodes), dtype=bool)
+    for t, o in ((tx, tree.ox), (ty, tree.oy), (tz, tree.oz)):
+        low = o[nodes]
+        inside &= (t >= low) & (t <= low + side)
+    return inside
+
+
+def potential_barnes_hut(
+    tree,
+    tx,
+    ty,
+    tz,
+    softening,
+    theta=0.5,
+    self_idx=None,
+    batch_size=1024,
+    source_softening=None,
+):
+    """
+    Compute the potential of a set of targets by walking the octree.
+
+    Every (target, node) interaction is resolved at once for a whole batch
+    of targets: nodes that satisfy the opening criterion
+    ``side < theta * distance`` and whose cell does not contain the target
+    contribute with their monopole, opened leaves are summed directly and
+    the remaining nodes are replaced by their children.
+
+    Parameters
+    ----------
+    tree : ``Octree``
+        Octree populated with the source particles.
+    tx, ty, tz : np.ndarray
+        Positions of the targets. Shape: (k,1).
+    softening : float or np.ndarray
+        Softening of the targets. Shape: (1,) or (k,1).
+    theta : float, default=0.5
+        Opening angle. ``theta=0`` opens every node (direct summation). The
+        nodes that contain the target are always opened.
+    self_idx : np.ndarray or None, default=None
+        Position of every target inside the sorted sources, used to skip
+        the self interaction. As in the direct backends, the pairs at zero
+        softened distance are skipped too, but coincident particles with
+        softening interact.
+    batch_size : int, default=1024
+        Number of targets walked at the same time. It bounds the size of
+        the interaction lists.
+    source_softening : float, np.ndarray or None, default=None
+        Softening of the sources, in their original order. If given, every
+        pair uses ``(eps_target**2 + eps_source**2) / 2`` as squared
+        softening (the sources of a node contribute with the mass weighted
+        mean of their squared softening). If None, the softening of the
+        target is used for every pair.
+
+    Returns
+    -------
+    pot : np.ndarray
+        Sum of ``m / sqrt(d**2 + eps**2)`` over the sources for every
+        target (without the gravitational constant). Shape: (k,1).
+
+    """
+    if theta < 0:
+        raise ValueError("theta must be >= 0")
+
+    tx = np.asarray(tx, dtype=np.float64)
+    ty = np.asarray(ty, dtype=np.float64)
+    tz = np.asarray(tz, dtype=np.float64)
+
+    tsoft2 = np.broadcast_to(
+        np.square(np.asarray(softening, dtype=np.float64)), tx.shape
+    )
+    psoft2 = nsoft2 = None
+    if source_softening is not None:
+        psoft2, nsoft2 = nodes_softening(tree, source_softening)
+
+    theta2 = float(theta) ** 2
+    side2 = tree.side**2
+    is_leaf = tree.is_leaf
+
+    pot = np.zeros(len(tx), dtype=np.float64)
+
+    for first in range(0, len(tx), batch_size):
+        targets = np.arange(first, min(first + batch_size, len(tx)))
+        nodes = np.zeros(len(targets), dtype=np.int64)
+
+        while len(targets):
+            d2 = (
+                (tx[targets] - tree.cx[nodes]) ** 2
+                + (ty[targets] - tree.cy[nodes]) ** 2
+                + (tz[targets] - tree.cz[nodes]) ** 2
+            )
+
+            # accepted nodes: monopole contribution (a node that contains
+            # the target is never accepted, whatever the opening angle)
+            far = (side2[nodes] < theta2 * d2) & ~_contains(
+                tree, nodes, tx[targets], ty[targets], tz[targets]
+            )
+            if self_idx is not None:
+                pos = self_idx[targets]
+                far &= (pos < tree.start[nodes]) | (
+                    pos >= tree.start[nodes] + tree.count[nodes]
+                )
+            ftargets, fnodes = targets[far], nodes[far]
+            soft2 = tsoft2[ftargets]
+            if nsoft2 is not None:
+                soft2 = (soft2 + nsoft2[fnodes]) / 2
+            pot += np.bincount(
+                ftargets,
+                weights=tree.mass[fnodes] / np.sqrt(d2[far] + soft2),
+                minlength=len(pot),
+            )
+
+            # opened leaves: direct summation against their particles
+            near = ~far
+            leaf = near & is_leaf[nodes]
+            lnodes = nodes[leaf]
+            ltargets = np.repeat(targets[leaf], tree.count[lnodes])
+            parts = _ragged_arange(tree.start[lnodes], tree.count[lnodes])
+
+            r2 = (
+                (tx[ltargets] - tree.x[parts]) ** 2
+                + (ty[ltargets] - tree.y[parts]) ** 2
+                + (tz[ltargets] - tree.z[parts]) ** 2
+            )
+            soft2 = tsoft2[ltargets]
+            if psoft2 is not None:
+                soft2 = (soft2 + psoft2[parts]) / 2
+            r2 += soft2
+
+            # skip the self interaction and the pairs at zero softened
+            # distance, as the direct backends do
+            valid = r2 > 0
+            if self_idx is not None:
+                valid &= self_idx[ltargets] != parts
+
+            pot += np.bincount(
+                ltargets[valid],
+                weights=tree.m[parts[valid]] / np.sqrt(r2[valid]),
+                minlength=len(pot),
+            )
+
+            # opened inner nodes: go down one level
+            inner = near & ~leaf
+            onodes = nodes[inner]
+            targets = np.repeat(targets[inner], tree.n_children[onodes])
+            nodes = _ragged_arange(
+                tree.child_start[onodes], tree.n_children[onodes]
+            )
+
+    return pot
@@ -73,9 +73,10 @@ def _get_rot_matrix(m, x, y, z, Jx, Jy, Jz, r_cut):
 
     mjx, mjy, mjz = m * Jx, m * Jy, m * Jz
 
-    rjx = np.sum(mjx[mask])
-    rjy = np.sum(mjy[mask])
-    rjz = np.sum(mjz[mask])
+    # the sums are in float64 even in float32 galaxies
+    rjx = np.sum(mjx[mask], dtype=np.float64)
+    rjy = np.sum(mjy[mask], dtype=np.float64)
+    rjz = np.sum(mjz[mask], dtype=np.float64)
 
     rjp = np.sqrt(rjx**2 + rjy**2)
     rj = np.sqrt(rjx**2 + rjy**2 + rjz**2)
@@ -164,67 +165,43 @@ def star_align(galaxy, *, r_cut=None):
     if r_cut is not None and r_cut <= 0.0:
         raise ValueError("r_cut must be larger than 0.")
 
-    # declare all the different groups of columns
-    pos_columns = ["x", "y", "z"]
-    vel_columns = ["vx", "vy", "vz"]
-
-    # Now we extract only the needed column to rotate the galaxy
-    # Note: for stars we need more columns to calculate the rotation matrix
-    stars_df = galaxy.stars.to_dataframe(
-        attributes=["m", "Jx", "Jy", "Jz"] + pos_columns + vel_columns
-    )
-    dm_df = galaxy.dark_matter.to_dataframe(
-        attributes=pos_columns + vel_columns
-    )
-    gas_df = galaxy.gas.to_dataframe(attributes=pos_columns + vel_columns)
-
     # now we can calculate the rotation matrix
+    # Note: for stars we need more columns to calculate the rotation matrix
+    stars = galaxy.stars.arr_
     A = _get_rot_matrix(
-        m=stars_df["m"].values,
-        x=stars_df["x"].values,
-        y=stars_df["y"].values,
-        z=stars_df["z"].values,
-        Jx=stars_df["Jx"].values,
-        Jy=stars_df["Jy"].values,
-        Jz=stars_df["Jz"].values,
+        m=stars.m,
+        x=stars.x,
+        y=stars.y,
+        z=stars.z,
+        Jx=stars.Jx_,
+        Jy=stars.Jy_,
+        Jz=stars.Jz_,
         r_cut=r_cut,
     )
 
-    # we rotate  independently positions and velocities in stars dm and gas
-    pos_rot_s = np.dot(A, stars_df[pos_columns].T.values)
-    vel_rot_s = np.dot(A, stars_df[vel_columns].T.values)
-
-    pos_rot_dm = np.dot(A, dm_df[pos_columns].T.values)
-    vel_rot_dm = np.dot(A, dm_df[vel_columns].T.values)
-
-    pos_rot_g = np.dot(A, gas_df[pos_columns].T.values)
-    vel_rot_g = np.dot(A, gas_df[vel_columns].T.values)
-
-    # recreate the galaxy
-    new = galaxy.disassemble()
-
-    new.update(
-        x_s=pos_rot_s.T[:, 0],
-        y_s=pos_rot_s.T[:, 1],
-        z_s=pos_rot_s.T[:, 2],
-        vx_s=vel_rot_s.T[:, 0],
-        vy_s=vel_rot_s.T[:, 1],
-        vz_s=vel_rot_s.T[:, 2],
-        x_dm=pos_rot_dm.T[:, 0],
-        y_dm=pos_rot_dm.T[:, 1],
-        z_dm=pos_rot_dm.T[:, 2],
-        vx_dm=vel_rot_dm.T[:, 0],
-        vy_dm=vel_rot_dm.T[:, 1],
-        vz_dm=vel_rot_dm.T[:, 2],
-        x_g=pos_rot_g.T[:, 0],
-        y_g=pos_rot_g.T[:, 1],
-        z_g=pos_rot_g.T[:, 2],
-        vx_g=vel_rot_g.T[:, 0],
-        vy_g=vel_rot_g.T[:, 1],
-        vz_g=vel_rot_g.T[:, 2],
+    # we rotate the positions and velocities of all the particles at once,
+    # only these columns are new arrays in the new galaxy (in its dtype)
+    columns = galaxy.columns_
+    A = A.astype(galaxy.dtype_, copy=False)
+    pos_rot = np.dot(A, np.stack((columns["x"], columns["y"], columns["z"])))
+    vel_rot = np.dot(
+        A, np.stack((columns["vx"], columns["vy"], columns["vz"]))
     )
 
-    return data.mkgalaxy(**new)
+    new = galaxy.disassemble(copy=False)
+    for suffix, pslice in zip(("s", "dm", "g"), galaxy.slices_.values()):
+        new.update(
+            {
+                f"x_{suffix}": pos_rot[0, pslice],
+                f"y_{suffix}": pos_rot[1, pslice],
+                f"z_{suffix}": pos_rot[2, pslice],
+                f"vx_{suffix}": vel_rot[0, pslice],
+                f"vy_{suffix}": vel_rot[1, pslice],
+                f"vz_{suffix}": vel_rot[2, pslice],
+            }
+        )
+
+    return data.mkgalaxy(**new, copy=False)
 
 
 def is_star_aligned(galaxy, *, r_cut=None, rtol=1e-05, atol=1e-08):
@@ -254,15 +231,16 @@ def is_star_aligned(galaxy, *, r_cut=None, rtol=1e-05, atol=1e-08):
 
     """
     # Now we extract only the needed column to rotate the galaxy
-    df = galaxy.stars.to_dataframe(
-        attributes=["m", "x", "y", "z", "Jx", "Jy", "Jz"]
+    stars = galaxy.to_arrays(
+        ["m", "x", "y", "z", "Jx", "Jy", "Jz"], ptypes=("stars",)
     )
 
-    mask = _make_mask(df.x.values, df.y.values, df.z.values, r_cut)
+    mask = _make_mask(stars["x"], stars["y"], stars["z"], r_cut)
 
-    Jxtot = np.sum(df.Jx.values[mask] * df.m.values[mask])
-    Jytot = np.sum(df.Jy.values[mask] * df.m.values[mask])
-    Jztot = np.sum(df.Jz.values[mask] * df.m.values[mask])
+    m = stars["m"][mask]
+    Jxtot = np.sum(stars["Jx"][mask] * m, dtype=np.float64)
+    Jytot = np.sum(stars["Jy"][mask] * m, dtype=np.float64)
+    Jztot = np.sum(stars["Jz"][mask] * m, dtype=np.float64)
     # B: Para checkear que esté alineada, 1st check que esté
     # centrada and then check que Jz sea positivo y mayor
     # a los demás...
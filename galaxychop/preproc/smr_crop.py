@@ -16,6 +16,7 @@
 
 import numpy as np
 
+from . import potential_energy
 from ._base import GalaxyTransformerABC
 from ..core import data
 from ..utils import doc_inherit
@@ -25,29 +26,38 @@ from ..utils import doc_inherit
 # =============================================================================
 
 
-def _get_half_smr_crop(sdf, cut_radius_factor):
-    sdf = sdf[["x", "y", "z", "m"]].copy()
+def _get_half_smr_crop(arrays, cut_radius_factor):
+    radius = np.sqrt(arrays["x"] ** 2 + arrays["y"] ** 2 + arrays["z"] ** 2)
+    order = np.argsort(radius)
 
-    sdf["radius"] = np.sqrt(sdf.x**2 + sdf.y**2 + sdf.z**2)
-    sdf.drop(["x", "y", "z"], axis="columns", inplace=True)
+    # accumulated in float64 even in float32 galaxies
+    m_cumsum = np.cumsum(arrays["m"][order], dtype=np.float64)
 
-    sdf.sort_values("radius", inplace=True)
+    half_m_cumsum = m_cumsum[-1] / 2
+    half_m_cumsum_diff = np.abs(m_cumsum - half_m_cumsum)
 
-    sdf["m_cumsum"] = sdf.m.cumsum()
-    sdf.drop(["m"], axis="columns", inplace=True)
+    cut_radius = radius[order[half_m_cumsum_diff.argmin()]] * cut_radius_factor
 
-    half_m_cumsum = sdf.iloc[-1].m_cumsum / 2
-    sdf["half_m_cumsum_diff"] = np.abs(sdf.m_cumsum - half_m_cumsum)
+    cut_mask = radius > cut_radius
 
-    cut_radius = (
-        sdf.iloc[sdf.half_m_cumsum_diff.argmin()].radius * cut_radius_factor
-    )
-
-    cut_idxs = sdf[sdf.radius > cut_radius].index.to_numpy()
+    return cut_mask, cut_radius
 
-    del sdf
 
-    return cut_idxs, cut_radius
+def _stars_subset(stars, mask):
+    arr = stars.arr_
+    columns = {
+        cname: getattr(arr, cname)[mask]
+        for cname in data.PARTICLE_SET_COLUMNS
+        if getattr(arr, cname) is not None
+    }
+    return data.ParticleSet(
+        ptype=data.ParticleSetType.STARS,
+        potential=columns.pop("potential", None),
+        softening=stars.softening.value,
+        # the selections are new arrays
+        copy=False,
+        **columns,
+    )
 
 
 # =============================================================================
@@ -66,12 +76,17 @@ class Cutter(GalaxyTransformerABC):
 
     """
 
-    def __init__(self, num_radii=3):
+    def __init__(self, num_radii=3, *, update_potential=False):
         self.num_radii = num_radii
+        self.update_potential = update_potential
 
     @doc_inherit(GalaxyTransformerABC.transform)
     def transform(self, galaxy):
-        return half_star_mass_radius_crop(galaxy, num_radii=self.num_radii)
+        return half_star_mass_radius_crop(
+            galaxy,
+            num_radii=self.num_radii,
+            update_potential=self.update_potential,
+        )
 
     @doc_inherit(GalaxyTransformerABC.checker)
     def checker(self, galaxy, **kwargs):
@@ -83,7 +98,9 @@ class Cutter(GalaxyTransformerABC):
 # =============================================================================
 
 
-def half_star_mass_radius_crop(galaxy, *, num_radii=3):
+def half_star_mass_radius_crop(
+    galaxy, *, num_radii=3, update_potential=False
+):
     """
     Crop select stars within a specified number of the radii enclosing \
     half fractions of the stellar mass.
@@ -95,6 +112,12 @@ def half_star_mass_radius_crop(galaxy, *, num_radii=3):
         mass-enclosing radii.
     num_radii : int, optional
         The number of radii to consider. Default is 3.
+    update_potential : bool or dict, optional
+        If True, the potential energy of the remaining particles is corrected
+        by subtracting the contribution of the removed stars with
+        ``potential_energy.update_potential()``. A dict is used as its keyword
+        arguments (e.g. ``{"backend": "numpy"}``). Default is False, that
+        keeps the potential of the original galaxy.
 
     Returns
     -------
@@ -106,33 +129,27 @@ def half_star_mass_radius_crop(galaxy, *, num_radii=3):
     if num_radii is not None and num_radii <= 0.0:
         raise ValueError("num_radii must not be lower than 0.")
 
-    # We convert the stars into a dataframe
-    stars_df = galaxy.stars.to_dataframe()
+    stars = galaxy.to_arrays(["m", "x", "y", "z"], ptypes=("stars",))
 
-    # We check which rows to delete and what cutoff radius it gives us
-    to_trim_idxs, _ = _get_half_smr_crop(stars_df, cut_radius_factor=num_radii)
-    trim_stars_df = stars_df.drop(to_trim_idxs, axis="rows")
+    # We check which stars to delete and what cutoff radius it gives us
+    to_trim, _ = _get_half_smr_crop(stars, cut_radius_factor=num_radii)
 
-    # We create a new particle set with the new stars.
-    trim_stars = data.ParticleSet(
-        ptype=data.ParticleSetType.STARS,
-        m=trim_stars_df["m"].to_numpy(),
-        x=trim_stars_df["x"].to_numpy(),
-        y=trim_stars_df["y"].to_numpy(),
-        z=trim_stars_df["z"].to_numpy(),
-        vx=trim_stars_df["vx"].to_numpy(),
-        vy=trim_stars_df["vy"].to_numpy(),
-        vz=trim_stars_df["vz"].to_numpy(),
-        potential=trim_stars_df["potential"].to_numpy(),
-        softening=galaxy.stars.softening.value,
-    )
-
-    del trim_stars_df
+    # the kept stars and the other particles are copied into a single block
+    new = galaxy.disassemble(copy=False)
+    for cname in data.PARTICLE_SET_COLUMNS:
+        key = f"{cname}_s"
+        if new[key] is not None:
+            new[key] = new[key][~to_trim]
+    trim_galaxy = data.mkgalaxy(**new, dtype=galaxy.dtype_)
 
-    dm = galaxy.dark_matter.copy()
-    gas = galaxy.gas.copy()
-
-    trim_galaxy = data.Galaxy(stars=trim_stars, dark_matter=dm, gas=gas)
+    if update_potential:
+        update_kws = (
+            update_potential if isinstance(update_potential, dict) else {}
+        )
+        removed = _stars_subset(galaxy.stars, to_trim)
+        trim_galaxy = potential_energy.update_potential(
+            trim_galaxy, removed=removed, **update_kws
+        )
 
     return trim_galaxy
 
@@ -162,15 +179,16 @@ def is_star_cutted(galaxy, *, num_radii=3, rtol=1e-05, atol=1e-08):
         False otherwise.
 
     """
-    # Now we extract only the needed column to rotate the galaxy
-    stars_df = galaxy.stars.to_dataframe(attributes=["m", "x", "y", "z"])
+    # Now we extract only the needed column to crop the galaxy
+    stars = galaxy.to_arrays(["m", "x", "y", "z"], ptypes=("stars",))
 
-    to_trim_idxs, cut_radius = _get_half_smr_crop(stars_df, num_radii)
-    trim_stars_df = stars_df.drop(to_trim_idxs, axis="rows")
+    to_trim, cut_radius = _get_half_smr_crop(stars, num_radii)
 
     # Distances of all stellar particles that "survives"
     distances = np.sqrt(
-        trim_stars_df.x**2 + trim_stars_df.y**2 + trim_stars_df.z**2
+        stars["x"][~to_trim] ** 2
+        + stars["y"][~to_trim] ** 2
+        + stars["z"][~to_trim] ** 2
     )
 
     # maximum distance index of all particles
@@ -206,19 +224,15 @@ def get_radius_half_mass(galaxy, particle="stars"):
 
     """
     if particle in ["", "all", None, False]:
-        # We convert the particles into a dataframe
-        df = galaxy.to_dataframe()
+        # all the particles
+        ptypes = None
     else:
         particle_type = data.ParticleSetType.mktype(particle)
-        particle_type = data.ParticleSetType.humanize(particle_type)
-        if particle_type == "stars":
-            df = galaxy.stars.to_dataframe()
-        elif particle_type == "dark_matter":
-            df = galaxy.dark_matter.to_dataframe()
-        elif particle_type == "gas":
-            df = galaxy.gas.to_dataframe()
+        ptypes = (data.ParticleSetType.humanize(particle_type),)
+
+    arrays = galaxy.to_arrays(["m", "x", "y", "z"], ptypes=ptypes)
 
     # cut_radius_factor = 1 to get the "half mass radius"
-    _, r_half = _get_half_smr_crop(df, cut_radius_factor=1)
+    _, r_half = _get_half_smr_crop(arrays, cut_radius_factor=1)
 
     return r_half
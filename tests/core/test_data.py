@@ -10,6 +10,7 @@
 # IMPORTS
 # =============================================================================
 
+from concurrent import futures
 from io import BytesIO
 
 import astropy.units as u
@@ -322,6 +323,85 @@ def test_ParticleSet_angular_momentum(data_particleset):
     )
 
 
+@pytest.mark.parametrize("has_potential", [True, False])
+def test_ParticleSet_derived_lazy(data_particleset, has_potential):
+    m, x, y, z, vx, vy, vz, soft, pot = data_particleset(
+        seed=42, has_potential=has_potential
+    )
+
+    pset = core.ParticleSet(
+        core.ParticleSetType.STARS,
+        m=m,
+        x=x,
+        y=y,
+        z=z,
+        vx=vx,
+        vy=vy,
+        vz=vz,
+        softening=soft,
+        potential=pot,
+    )
+
+    # nothing is computed until it is accessed
+    assert pset.materialized() == ()
+
+    Jz = pset.Jz_
+    assert pset.materialized() == ("Jz_",)
+    assert pset.Jz_ is Jz
+    assert not Jz.flags.writeable
+    np.testing.assert_array_equal(pset.arr_.Jz_, x * vy - y * vx)
+
+    total_energy = pset.total_energy_
+    if has_potential:
+        # the total energy uses the kinetic energy
+        assert pset.materialized() == (
+            "kinetic_energy_",
+            "total_energy_",
+            "Jz_",
+        )
+        np.testing.assert_array_equal(
+            total_energy.to_value(), 0.5 * (vx**2 + vy**2 + vz**2) + pot
+        )
+        assert total_energy.unit == (u.km / u.s) ** 2
+    else:
+        assert pset.materialized() == ("total_energy_", "Jz_")
+        assert total_energy is None
+        assert pset.arr_.total_energy_ is None
+
+
+def test_ParticleSet_derived_thread_safe(data_particleset):
+    m, x, y, z, vx, vy, vz, soft, pot = data_particleset(seed=42)
+
+    pset = core.ParticleSet(
+        core.ParticleSetType.STARS,
+        m=m,
+        x=x,
+        y=y,
+        z=z,
+        vx=vx,
+        vy=vy,
+        vz=vz,
+        softening=soft,
+        potential=pot,
+    )
+
+    names = list(core.DERIVED_QUANTITIES) * 16
+    with futures.ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(lambda name: getattr(pset, name), names))
+
+    # all the threads get the same cached array
+    for name, value in zip(names, values):
+        assert value is getattr(pset, name)
+    assert pset.materialized() == tuple(core.DERIVED_QUANTITIES)
+
+
+def test_mkgalaxy_derived_lazy(galaxy):
+    gal = galaxy(seed=42)
+
+    for pset in (gal.stars, gal.dark_matter, gal.gas):
+        assert pset.materialized() == ()
+
+
 def test_ParticleSet_to_dict(data_particleset):
     m, x, y, z, vx, vy, vz, soft, pot = data_particleset(seed=42)
 
@@ -435,6 +515,118 @@ def test_ParticleSet_copy(data_particleset):
     assert pset_copy.Jz_ is not pset.Jz_
 
 
+def test_ParticleSet_copy_without_potential(data_particleset):
+    m, x, y, z, vx, vy, vz, soft, pot = data_particleset(
+        seed=42, has_potential=False
+    )
+
+    pset = core.ParticleSet(
+        core.ParticleSetType.STARS,
+        m=m,
+        x=x,
+        y=y,
+        z=z,
+        vx=vx,
+        vy=vy,
+        vz=vz,
+        softening=soft,
+        potential=pot,
+    )
+
+    pset_copy = pset.copy()
+
+    assert pset_copy.potential is None
+    np.testing.assert_equal(pset_copy.m, pset.m)
+    assert not np.shares_memory(pset_copy.m, pset.m)
+
+
+@pytest.mark.parametrize("has_potential", [True, False])
+def test_ParticleSet_columns_buffer(data_particleset, has_potential):
+    m, x, y, z, vx, vy, vz, soft, pot = data_particleset(
+        seed=42, has_potential=has_potential
+    )
+
+    pset = core.ParticleSet(
+        core.ParticleSetType.STARS,
+        m=m,
+        x=x,
+        y=y,
+        z=z,
+        vx=vx,
+        vy=vy,
+        vz=vz,
+        softening=soft,
+        potential=pot,
+    )
+
+    columns = [pset.m, pset.x, pset.y, pset.z, pset.vx, pset.vy, pset.vz]
+    if has_potential:
+        columns.append(pset.potential)
+
+    buffer = pset._buffer
+    assert buffer.shape == (len(columns), len(pset))
+    assert buffer.flags.c_contiguous
+    assert not buffer.flags.writeable
+    for column, original in zip(columns, (m, x, y, z, vx, vy, vz, pot)):
+        assert np.shares_memory(column, buffer)
+        assert not np.shares_memory(column, original)
+        assert not column.flags.writeable
+
+
+def test_ParticleSet_no_copy(data_particleset):
+    m, x, y, z, vx, vy, vz, soft, pot = data_particleset(seed=42)
+
+    pset = core.ParticleSet(
+        core.ParticleSetType.STARS,
+        m=m,
+        x=x,
+        y=y,
+        z=z,
+        vx=vx,
+        vy=vy,
+        vz=vz,
+        softening=soft,
+        potential=pot,
+        copy=False,
+    )
+
+    assert pset._buffer is None
+    assert np.shares_memory(pset.m, m)
+    assert np.shares_memory(pset.vz, vz)
+    assert np.shares_memory(pset.potential, pot)
+    np.testing.assert_equal(pset.arr_.x, x)
+
+
+def test_ParticleSet_to_dict_copy(data_particleset):
+    m, x, y, z, vx, vy, vz, soft, pot = data_particleset(seed=42)
+
+    pset = core.ParticleSet(
+        core.ParticleSetType.STARS,
+        m=m,
+        x=x,
+        y=y,
+        z=z,
+        vx=vx,
+        vy=vy,
+        vz=vz,
+        softening=soft,
+        potential=pot,
+    )
+
+    pset_dict = pset.to_dict()
+    assert pset_dict["m"].flags.writeable
+    assert not np.shares_memory(pset_dict["m"], pset.m)
+
+    # writing the dict does not modify the particle set
+    pset_dict["m"][:] = 0
+    np.testing.assert_equal(pset.arr_.m, m)
+
+    pset_views = pset.to_dict(copy=False)
+    assert not pset_views["m"].flags.writeable
+    assert np.shares_memory(pset_views["m"], pset.m)
+    assert np.shares_memory(pset_views["potential"], pset.potential)
+
+
 # =============================================================================
 # TEST GALAXY MANUAL
 # =============================================================================
@@ -657,6 +849,43 @@ def test_mkgakaxy_missing_potential(data_galaxy, remove_potential):
         core.mkgalaxy(**params)
 
 
+@pytest.mark.parametrize("copy", [True, False])
+def test_mkgalaxy_dtype(galaxy, copy):
+    gal = galaxy(seed=42)
+
+    gal32 = core.mkgalaxy(**gal.disassemble(), copy=copy, dtype="float32")
+
+    assert gal.dtype_ == np.float64
+    assert gal32.dtype_ == np.float32
+    for cname, column in gal32.columns_.items():
+        assert column.dtype == np.float32
+        np.testing.assert_allclose(column, gal.columns_[cname], rtol=1e-6)
+
+    for pset in (gal32.stars, gal32.dark_matter, gal32.gas):
+        assert pset.m.dtype == pset.potential.dtype == np.float32
+        assert pset.total_energy_.dtype == pset.Jz_.dtype == np.float32
+
+    assert gal32.copy().dtype_ == np.float32
+
+
+def test_mkgalaxy_dtype_inferred(galaxy):
+    gal = galaxy(seed=42)
+    kws = {
+        k: (v.astype(np.float32) if isinstance(v, np.ndarray) else v)
+        for k, v in gal.disassemble().items()
+    }
+
+    assert core.mkgalaxy(**kws).dtype_ == np.float32
+    assert core.mkgalaxy(**kws, dtype=np.float64).dtype_ == np.float64
+
+
+@pytest.mark.parametrize("dtype", [int, "int32", bool, "U1"])
+def test_mkgalaxy_invalid_dtype(galaxy, dtype):
+    gal = galaxy(seed=42)
+    with pytest.raises(ValueError):
+        core.mkgalaxy(**gal.disassemble(), dtype=dtype)
+
+
 # =============================================================================
 # PLOTTER
 # =============================================================================
@@ -784,6 +1013,187 @@ def test_galaxy_disassemble(data_galaxy):
     assert np.all(gkwargs["potential_dm"] == potential_dm)
 
 
+def test_galaxy_disassemble_no_copy(galaxy):
+    gal = galaxy(seed=42)
+
+    gkwargs = gal.disassemble(copy=False)
+    assert not gkwargs["m_s"].flags.writeable
+    assert np.shares_memory(gkwargs["m_s"], gal.stars.m)
+    assert np.shares_memory(gkwargs["x_dm"], gal.dark_matter.x)
+    assert np.shares_memory(gkwargs["vz_g"], gal.gas.vz)
+
+    new = core.mkgalaxy(**gkwargs, copy=False)
+    assert np.shares_memory(new.stars.m, gal.stars.m)
+    assert np.shares_memory(new.dark_matter.x, gal.dark_matter.x)
+    assert np.shares_memory(new.gas.vz, gal.gas.vz)
+    assert_pset_equals(new.stars, gal.stars)
+
+    # the default still copies the arrays
+    gkwargs = gal.disassemble()
+    assert gkwargs["m_s"].flags.writeable
+    assert not np.shares_memory(gkwargs["m_s"], gal.stars.m)
+
+
+# =============================================================================
+# COLUMNS
+# =============================================================================
+
+
+@pytest.mark.parametrize("has_potential", [True, False])
+def test_Galaxy_columns(galaxy, has_potential):
+    gal = galaxy(
+        seed=42,
+        stars_potential=has_potential,
+        dm_potential=has_potential,
+        gas_potential=has_potential,
+    )
+    psets = [gal.stars, gal.dark_matter, gal.gas]
+
+    assert gal.slices_ == {
+        "stars": slice(0, len(gal.stars)),
+        "dark_matter": slice(len(gal.stars), len(gal) - len(gal.gas)),
+        "gas": slice(len(gal) - len(gal.gas), len(gal)),
+    }
+
+    for cname in core.PARTICLE_SET_COLUMNS:
+        column = gal.columns_[cname]
+        if cname == "potential" and not has_potential:
+            assert column is None
+            continue
+
+        assert not column.flags.writeable
+        np.testing.assert_array_equal(
+            column,
+            np.concatenate([getattr(pset.arr_, cname) for pset in psets]),
+        )
+
+        # the particle sets are slices of the columns of the galaxy
+        for pset, pslice in zip(psets, gal.slices_.values()):
+            assert np.shares_memory(column[pslice], getattr(pset, cname))
+
+    with pytest.raises(TypeError):
+        gal.columns_["x"] = np.zeros(len(gal))
+
+
+def test_Galaxy_columns_concatenated(data_particleset):
+    def mkpset(ptype, seed):
+        m, x, y, z, vx, vy, vz, soft, pot = data_particleset(seed=seed)
+        return core.ParticleSet(
+            ptype,
+            m=m,
+            x=x,
+            y=y,
+            z=z,
+            vx=vx,
+            vy=vy,
+            vz=vz,
+            softening=soft,
+            potential=pot,
+        )
+
+    stars = mkpset(core.ParticleSetType.STARS, 1)
+    dark_matter = mkpset(core.ParticleSetType.DARK_MATTER, 2)
+    gas = mkpset(core.ParticleSetType.GAS, 3)
+
+    gal = core.Galaxy(stars=stars, dark_matter=dark_matter, gas=gas)
+
+    # the particle sets have their own buffers, so the columns are copies
+    assert gal.stars is stars
+    assert not np.shares_memory(gal.columns_["x"], stars.x)
+    np.testing.assert_array_equal(
+        gal.columns_["x"],
+        np.concatenate([stars.arr_.x, dark_matter.arr_.x, gas.arr_.x]),
+    )
+
+
+def test_Galaxy_columns_shared_by_copy(galaxy):
+    gal = galaxy(seed=42)
+    gal_copy = gal.copy()
+
+    assert not np.shares_memory(gal_copy.columns_["m"], gal.columns_["m"])
+    assert np.shares_memory(gal_copy.columns_["m"], gal_copy.stars.m)
+    assert np.shares_memory(gal_copy.columns_["m"], gal_copy.gas.m)
+
+
+@pytest.mark.parametrize(
+    "ptypes",
+    [
+        None,
+        ["stars"],
+        ["stars", "dark_matter"],
+        ["dark_matter", "gas"],
+        ["stars", "gas"],
+        ["gas"],
+    ],
+)
+def test_Galaxy_to_dataframe(galaxy, ptypes):
+    gal = galaxy(seed=42)
+    psets = [gal.stars, gal.dark_matter, gal.gas]
+
+    df = gal.to_dataframe(ptypes=ptypes)
+    expected = pd.concat(
+        [
+            pset.to_dataframe()
+            for pset in psets
+            if ptypes is None or pset.ptype.humanize() in ptypes
+        ],
+        ignore_index=True,
+    )
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert not np.shares_memory(df.x.to_numpy(), gal.columns_["x"])
+
+
+@pytest.mark.parametrize(
+    "ptypes",
+    [
+        None,
+        ["stars"],
+        ["stars", "dark_matter"],
+        ["stars", "gas"],
+        [],
+    ],
+)
+def test_Galaxy_to_arrays(galaxy, ptypes):
+    gal = galaxy(seed=42)
+
+    arrays = gal.to_arrays(ptypes=ptypes)
+    df = gal.to_dataframe(ptypes=ptypes)
+
+    assert list(arrays) == list(df.columns)
+    for aname, column in arrays.items():
+        assert not column.flags.writeable
+        np.testing.assert_array_equal(column, df[aname].to_numpy())
+
+
+def test_Galaxy_to_arrays_views(galaxy):
+    gal = galaxy(seed=42)
+
+    arrays = gal.to_arrays(["x", "Jz"], ["stars", "dark_matter"])
+    assert np.shares_memory(arrays["x"], gal.columns_["x"])
+    assert np.shares_memory(arrays["x"], gal.dark_matter.x)
+    assert not np.shares_memory(arrays["Jz"], gal.stars.Jz_)
+
+    # the stars and the gas are not consecutive
+    arrays = gal.to_arrays(["x"], ["stars", "gas"])
+    assert not np.shares_memory(arrays["x"], gal.columns_["x"])
+
+
+def test_Galaxy_to_arrays_out(galaxy):
+    gal = galaxy(seed=42)
+    attributes = ["m", "x", "ptypev", "kinetic_energy"]
+
+    out = np.empty((len(gal.stars) + len(gal.gas), len(attributes)))
+    result = gal.to_arrays(attributes, ["stars", "gas"], out=out)
+
+    assert result is out
+    expected = gal.to_dataframe(ptypes=["stars", "gas"], attributes=attributes)
+    np.testing.assert_array_equal(out, expected.to_numpy())
+
+    with pytest.raises(ValueError):
+        gal.to_arrays(attributes, out=out)
+
+
 # =============================================================================
 # TO HDF5
 # =============================================================================
@@ -855,6 +1265,17 @@ def test_Galaxy_to_copy(galaxy):
     assert_pset_equals(gal_copy.gas, gal.gas)
 
 
+def test_Galaxy_to_copy_without_potential(galaxy):
+    gal = galaxy(
+        stars_potential=False, dm_potential=False, gas_potential=False
+    )
+    gal_copy = gal.copy()
+
+    assert not gal_copy.has_potential_
+    assert gal_copy.disassemble()["potential_s"] is None
+    assert np.array_equal(gal_copy.stars.m, gal.stars.m)
+
+
 # =============================================================================
 # KINECTIC ENERGY
 # =============================================================================
@@ -0,0 +1,112 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test utilities  galaxychop.preproc.potential_energy.cache"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import os
+
+from galaxychop.preproc.potential_energy import cache
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_content_hash():
+    arr = np.arange(10, dtype=float)
+
+    key = cache.content_hash(arr, backend="numpy")
+
+    assert key == cache.content_hash(arr.copy(), backend="numpy")
+    assert key != cache.content_hash(arr, backend="fortran")
+    assert key != cache.content_hash(arr.astype(np.float32), backend="numpy")
+    assert key != cache.content_hash(arr[::-1], backend="numpy")
+    assert key != cache.content_hash(arr.reshape(2, 5), backend="numpy")
+
+
+def test_potential_cache_get_put(tmp_path):
+    pcache = cache.PotentialCache(tmp_path / "cache")
+    values = np.random.default_rng(seed=42).random((2, 10))
+
+    assert pcache.get("key") is None
+    assert "key" not in pcache
+
+    pcache.put("key", values)
+
+    assert "key" in pcache
+    assert len(pcache) == 1
+    assert pcache.size > values.nbytes
+    assert repr(pcache).startswith("<PotentialCache ")
+    npt.assert_array_equal(pcache.get("key"), values)
+
+    pcache.clear()
+    assert len(pcache) == 0
+
+
+def test_potential_cache_invalid_max_size(tmp_path):
+    with pytest.raises(ValueError):
+        cache.PotentialCache(tmp_path, max_size=0)
+
+
+def test_potential_cache_lru_eviction(tmp_path):
+    values = np.zeros(1000)
+    entry_size = 1000 * 8 + 128
+    pcache = cache.PotentialCache(tmp_path, max_size=int(2.5 * entry_size))
+
+    pcache.put("a", values)
+    pcache.put("b", values)
+
+    # make "a" the most recently used entry
+    os.utime(pcache.path / "b.npy", ns=(0, 0))
+    assert pcache.get("a") is not None
+
+    pcache.put("c", values)
+
+    assert "a" in pcache
+    assert "b" not in pcache
+    assert "c" in pcache
+    assert pcache.size <= pcache.max_size
+
+
+def test_potential_cache_concurrent_removal(tmp_path, monkeypatch):
+    pcache = cache.PotentialCache(tmp_path)
+    pcache.put("key", np.arange(10.0))
+
+    # another process removes the file between the load and the utime
+    def removed(fpath):
+        os.remove(fpath)
+        raise FileNotFoundError(fpath)
+
+    monkeypatch.setattr(cache.os, "utime", removed)
+    assert pcache.get("key") is None
+
+    # and between the glob and the stat
+    files = pcache._files
+    monkeypatch.setattr(
+        cache.PotentialCache,
+        "_files",
+        lambda self: files() + [self._file("gone")],
+    )
+    pcache.put("other", np.arange(10.0))
+    assert pcache.size == (tmp_path / "other.npy").stat().st_size
+    assert pcache.evict() == 0
@@ -0,0 +1,146 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test galaxychop.preproc.potential_energy.distributed_calculation"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+
+import multiprocessing
+from concurrent import futures
+
+from galaxychop.preproc import potential_energy
+from galaxychop.preproc.potential_energy import distributed_calculation
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _particles(seed, size=500):
+    random = np.random.default_rng(seed=seed)
+    x, y, z = random.normal(size=(3, size))
+    m = random.random(size)
+    return x, y, z, m
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_share_particles():
+    x = np.arange(10.0)
+    softening = np.broadcast_to(np.float64(0.1), 10)
+
+    shm, (name, shape, dtype) = distributed_calculation.share_particles(
+        [x, x + 1, softening]
+    )
+    try:
+        shared = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        assert name == shm.name
+        npt.assert_array_equal(shared, [x, x + 1, np.full(10, 0.1)])
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_distributed_mp_context_keeps_global_state():
+    method = multiprocessing.get_start_method(allow_none=True)
+
+    context = distributed_calculation._mp_context()
+
+    assert context.get_start_method() in ("forkserver", "spawn")
+    assert multiprocessing.get_start_method(allow_none=True) == method
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_potential_distributed(shared):
+    x, y, z, m = _particles(seed=42)
+    softening = np.asarray(0.05)
+    targets = np.arange(0, 500, 3)
+
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64", targets=targets
+    )
+
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        pot = distributed_calculation.potential_distributed(
+            [x, y, z, m],
+            potential_energy.numpy_potential,
+            precision="float64",
+            softening=softening,
+            targets=targets,
+            executor=executor,
+            block_size=50,
+            shared=shared,
+        )
+
+    npt.assert_allclose(pot, expected, rtol=1e-12)
+
+
+def test_potential_distributed_softening_column():
+    x, y, z, m = _particles(seed=42)
+    softening = np.random.default_rng(seed=42).choice([0.01, 0.05], 500)
+
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64"
+    )
+
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        pot = distributed_calculation.potential_distributed(
+            [x, y, z, m, softening],
+            potential_energy.numpy_potential,
+            precision="float64",
+            executor=executor,
+            block_size=128,
+        )
+
+    npt.assert_allclose(pot, expected, rtol=1e-12)
+
+
+def test_potential_distributed_no_targets():
+    x, y, z, m = _particles(seed=42, size=10)
+
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        pot = distributed_calculation.potential_distributed(
+            [x, y, z, m],
+            potential_energy.numpy_potential,
+            precision="float64",
+            softening=np.asarray(0.05),
+            targets=np.empty(0, dtype=int),
+            executor=executor,
+        )
+
+    assert pot.shape == (0,)
+    assert pot.dtype == np.float64
+
+
+def test_potential_distributed_invalid_block_size():
+    x, y, z, m = _particles(seed=42, size=10)
+    with pytest.raises(ValueError):
+        distributed_calculation.potential_distributed(
+            [x, y, z, m],
+            potential_energy.numpy_potential,
+            precision="float64",
+            block_size=0,
+        )
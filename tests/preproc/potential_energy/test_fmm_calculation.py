@@ -0,0 +1,180 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test utilities  galaxychop.preproc.potential_energy.fmm_calculation"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+
+from galaxychop.preproc import potential_energy
+from galaxychop.preproc.potential_energy import (
+    fmm_calculation,
+    treecode_calculation,
+)
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _particles(seed, size=1000):
+    random = np.random.default_rng(seed=seed)
+    x, y, z = random.normal(size=(3, size))
+    m = random.random(size)
+    return x, y, z, m
+
+
+def _fmm_error(particles, reference, order):
+    pot, postproc = potential_energy.fmm_potential(
+        *particles, np.asarray(0.1), order=order, theta=0.5, leaf_size=8
+    )
+    epot = np.asarray(postproc(pot))
+    return np.max(np.abs(epot - reference) / np.abs(reference))
+
+
+@pytest.fixture(scope="module")
+def fortran_reference():
+    if potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    particles = _particles(seed=42)
+    pot, postproc = potential_energy.fortran_potential(
+        *particles, np.asarray(0.1), precision="float64"
+    )
+    return particles, np.asarray(postproc(pot))
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+@pytest.mark.parametrize("order", [0, 1, 4, 8])
+def test_multi_indices(order):
+    idx = fmm_calculation.multi_indices(order)
+
+    size = (order + 1) * (order + 2) * (order + 3) // 6
+    assert idx.shape == (size, 3)
+    assert len({tuple(k) for k in idx}) == size
+    assert np.all(np.diff(idx.sum(axis=1)) >= 0)
+    assert idx.sum(axis=1).max() == order
+
+
+def test_expansion_tables():
+    tables = fmm_calculation.expansion_tables(3)
+
+    assert len(tables) == 20
+    assert tables is fmm_calculation.expansion_tables(3)
+    assert repr(tables) == "<ExpansionTables order=3, size=20>"
+
+    with pytest.raises(ValueError):
+        fmm_calculation.expansion_tables(-1)
+
+
+def test_monomials():
+    tables = fmm_calculation.expansion_tables(2)
+    dx, dy, dz = np.array([2.0]), np.array([3.0]), np.array([5.0])
+
+    pw = fmm_calculation.monomials(dx, dy, dz, tables)
+
+    expected = [2.0**a * 3.0**b * 5.0**c for a, b, c in tables.idx]
+    npt.assert_allclose(pw[0], expected)
+
+
+def test_taylor_coefficients():
+    tables = fmm_calculation.expansion_tables(5)
+    soft = 0.2
+    X = np.array([0.7, -1.2]), np.array([-0.3, 0.1]), np.array([0.4, 2.0])
+    coefs = fmm_calculation.taylor_coefficients(*X, soft, tables)
+
+    # the expansion of G(X - y) around y = 0 reproduces the kernel
+    y = np.array([0.05, -0.02, 0.03])
+    pw = fmm_calculation.monomials(*y[:, None], tables)[0]
+    approx = coefs @ pw
+    exact = 1 / np.sqrt(
+        (X[0] - y[0]) ** 2 + (X[1] - y[1]) ** 2 + (X[2] - y[2]) ** 2 + soft**2
+    )
+
+    npt.assert_allclose(
+        coefs[:, 0], 1 / np.sqrt(X[0] ** 2 + X[1] ** 2 + X[2] ** 2 + soft**2)
+    )
+    npt.assert_allclose(approx, exact, rtol=1e-6)
+
+
+def test_interaction_lists_cover_all_pairs():
+    x, y, z, m = _particles(seed=42, size=300)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=8)
+
+    (m2l_t, m2l_s), (p2p_t, p2p_s) = fmm_calculation.interaction_lists(
+        tree, theta=0.5
+    )
+
+    # every ordered pair of particles is covered exactly once
+    covered = np.zeros((300, 300), dtype=int)
+    for tnodes, snodes in ((m2l_t, m2l_s), (p2p_t, p2p_s)):
+        for tnode, snode in zip(tnodes, snodes):
+            tslice = slice(
+                tree.start[tnode], tree.start[tnode] + tree.count[tnode]
+            )
+            sslice = slice(
+                tree.start[snode], tree.start[snode] + tree.count[snode]
+            )
+            covered[tslice, sslice] += 1
+
+    npt.assert_array_equal(covered, 1)
+    assert np.all(tree.is_leaf[p2p_t]) and np.all(tree.is_leaf[p2p_s])
+
+
+def test_interaction_lists_invalid_theta():
+    x, y, z, m = _particles(seed=42, size=100)
+    tree = treecode_calculation.make_octree(x, y, z, m)
+    with pytest.raises(ValueError):
+        fmm_calculation.interaction_lists(tree, theta=0)
+
+
+@pytest.mark.parametrize("order", range(2, 9))
+def test_fmm_potential_convergence(fortran_reference, order):
+    particles, reference = fortran_reference
+
+    error = _fmm_error(particles, reference, order)
+
+    # every extra order of the expansion reduces the error
+    assert error < _fmm_error(particles, reference, order - 1)
+    assert error < 10.0 ** -(order / 2 + 1)
+
+
+def test_potential_fmm_softening_groups():
+    x, y, z, m = _particles(seed=42, size=500)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=8)
+
+    softening = np.resize(
+        np.linspace(0.1, 1.0, fmm_calculation.MAX_SOFTENING_GROUPS + 1), 500
+    )
+    with pytest.raises(ValueError):
+        fmm_calculation.potential_fmm(tree, softening)
+
+    # one softening value per group is the same as a shared softening
+    npt.assert_allclose(
+        fmm_calculation.potential_fmm(tree, np.full(500, 0.2)),
+        fmm_calculation.potential_fmm(tree, 0.2),
+        rtol=1e-12,
+    )
@@ -24,6 +24,8 @@ import grispy as gsp
 
 import numpy as np
 
+import pytest
+
 
 # =============================================================================
 # TESTS
@@ -87,3 +89,35 @@ def test_potential_grispy_one_particle(read_hdf5_galaxy):
 
     assert isinstance(epot, float)
     assert epot < 0
+
+
+def test_potential_grispy_batch():
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 300))
+    m = random.random(300)
+
+    l_box, grid = grispy_calculation.make_grid(x, y, z)
+    centres = np.column_stack((x, y, z))
+
+    epot = grispy_calculation.potential_grispy_batch(
+        centres[:50], m, 0.5, 0.1 * l_box, l_box, grid
+    )
+
+    expected = [
+        grispy_calculation.potential_grispy(
+            centre[None, :], m, 0.5, 0.1 * l_box, l_box, grid
+        )
+        for centre in centres[:50]
+    ]
+
+    assert epot.shape == (50,)
+    np.testing.assert_allclose(epot, expected, rtol=1e-12)
+
+
+def test_potential_grispy_batch_negative_softening():
+    x, y, z = np.eye(3)
+    l_box, grid = grispy_calculation.make_grid(x, y, z)
+    with pytest.raises(ValueError):
+        grispy_calculation.potential_grispy_batch(
+            np.eye(3), np.ones(3), -1.0, 0.1, l_box, grid
+        )
@@ -0,0 +1,105 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test utilities  galaxychop.preproc.potential_energy.numba_calculation"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+
+import sys
+
+from galaxychop.preproc import potential_energy
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+@pytest.mark.parametrize(
+    "precision, block_size, n_jobs, rtol",
+    [
+        ("float64", None, None, 1e-12),
+        ("float64", 7, 1, 1e-12),
+        ("mixed", 100, -1, 1e-6),
+        ("float32", None, None, 1e-4),
+    ],
+)
+def test_numba_potential(precision, block_size, n_jobs, rtol):
+    pytest.importorskip("numba")
+
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000))
+    m = random.random(1000)
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, np.asarray(0.1), precision="float64"
+    )
+
+    dtype = potential_energy.PRECISIONS[precision]
+    x, y, z, m = (arr.astype(dtype) for arr in (x, y, z, m))
+    pot, postproc = potential_energy.numba_potential(
+        x,
+        y,
+        z,
+        m,
+        np.asarray(0.1, dtype=dtype),
+        precision=precision,
+        block_size=block_size,
+        n_jobs=n_jobs,
+    )
+
+    assert postproc is np.asarray
+    assert pot.dtype == potential_energy._accumulator_dtype(precision)
+    npt.assert_allclose(pot, expected, rtol=rtol)
+
+
+def test_numba_potential_without_softening():
+    pytest.importorskip("numba")
+
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 500))
+    m = random.random(500)
+
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, np.asarray(0.0), precision="float64"
+    )
+    pot, _ = potential_energy.numba_potential(
+        x, y, z, m, np.asarray(0.0), precision="float64"
+    )
+
+    assert np.all(np.isfinite(pot))
+    npt.assert_allclose(pot, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("kws", [{"n_jobs": 0}, {"block_size": 0}])
+def test_numba_potential_invalid(kws):
+    pytest.importorskip("numba")
+
+    x = y = z = m = np.ones(3)
+    with pytest.raises(ValueError):
+        potential_energy.numba_potential(x, y, z, m, 0.1, **kws)
+
+
+def test_numba_potential_without_numba(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numba", None)
+
+    x = y = z = m = np.ones(3)
+    with pytest.raises(ImportError, match="pip install numba"):
+        potential_energy.numba_potential(x, y, z, m, 0.1)
@@ -0,0 +1,181 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test utilities  galaxychop.preproc.potential_energy.pm_calculation"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+
+from galaxychop.preproc.potential_energy import pm_calculation
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _particles(seed, size=500):
+    random = np.random.default_rng(seed=seed)
+    x, y, z = random.normal(size=(3, size))
+    m = random.random(size)
+    return x, y, z, m
+
+
+def _direct(x, y, z, m, softening):
+    dist = np.sqrt(
+        np.square(x - x.reshape(-1, 1))
+        + np.square(y - y.reshape(-1, 1))
+        + np.square(z - z.reshape(-1, 1))
+        + np.square(softening)
+    )
+    np.fill_diagonal(dist, np.inf)
+    return (m / dist).sum(axis=1)
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_make_mesh():
+    x, y, z, _ = _particles(seed=42)
+
+    mesh = pm_calculation.make_mesh(x, y, z, n_cells=16)
+
+    extent = np.ptp(np.column_stack((x, y, z)), axis=0)
+    npt.assert_allclose(mesh.cell, extent.max() / 16)
+    assert max(mesh.shape) == 16 + 3
+    assert mesh.size == np.prod(mesh.shape)
+    assert repr(mesh).startswith("<Mesh shape=")
+
+
+def test_make_mesh_invalid_n_cells():
+    with pytest.raises(ValueError):
+        pm_calculation.make_mesh(np.zeros(3), np.zeros(3), np.zeros(3), 0)
+
+
+@pytest.mark.parametrize("scheme", ["cic", "tsc"])
+def test_deposit_conserves_mass(scheme):
+    x, y, z, m = _particles(seed=42)
+    mesh = pm_calculation.make_mesh(x, y, z, n_cells=16)
+
+    mass = pm_calculation.deposit(mesh, x, y, z, m, scheme=scheme)
+
+    assert mass.shape == mesh.shape
+    npt.assert_allclose(mass.sum(), m.sum())
+
+    # the centre of mass is preserved too
+    cx = mesh.origin[0] + mesh.cell * np.arange(mesh.shape[0])
+    npt.assert_allclose(
+        np.sum(mass.sum(axis=(1, 2)) * cx), np.sum(m * x), rtol=1e-10
+    )
+
+
+@pytest.mark.parametrize("scheme", ["cic", "tsc"])
+def test_interpolate_linear_field(scheme):
+    x, y, z, _ = _particles(seed=42)
+    mesh = pm_calculation.make_mesh(x, y, z, n_cells=16)
+
+    nx, ny, nz = mesh.shape
+    cx, cy, cz = (
+        origin + mesh.cell * np.arange(n)
+        for origin, n in zip(mesh.origin, mesh.shape)
+    )
+    values = (
+        2 * cx[:, None, None] - cy[None, :, None] + 0.5 * cz[None, None, :]
+    )
+
+    field = pm_calculation.interpolate(mesh, values, x, y, z, scheme=scheme)
+
+    npt.assert_allclose(field, 2 * x - y + 0.5 * z, atol=1e-10)
+
+
+def test_invalid_scheme():
+    x, y, z, m = _particles(seed=42)
+    mesh = pm_calculation.make_mesh(x, y, z, n_cells=16)
+    with pytest.raises(ValueError):
+        pm_calculation.deposit(mesh, x, y, z, m, scheme="ngp")
+    with pytest.raises(ValueError):
+        pm_calculation.potential_pm(mesh, x, y, z, m, 0.1, scheme="ngp")
+
+
+def test_long_range_kernel():
+    r = np.array([0.0, 1e-3, 1.0, 10.0])
+
+    kernel = pm_calculation.long_range_kernel(r, split=0.5)
+
+    npt.assert_allclose(kernel[0], 2 / (np.sqrt(np.pi) * 0.5))
+    npt.assert_allclose(kernel[1], kernel[0], rtol=1e-5)
+    npt.assert_allclose(kernel[3], 1 / 10.0)
+
+
+@pytest.mark.parametrize("scheme", ["cic", "tsc"])
+def test_potential_pm_single_particle(scheme):
+    x, y, z, m = (np.array([0.3]), np.array([-0.1]), np.array([2.0]), [1.0])
+    m = np.asarray(m)
+    mesh = pm_calculation.make_mesh(x, y, z, n_cells=8)
+
+    pot = pm_calculation.potential_pm(mesh, x, y, z, m, 0.1, scheme=scheme)
+
+    # the self interaction through the mesh is removed
+    npt.assert_allclose(pot, 0.0, atol=1e-10)
+
+
+@pytest.mark.parametrize(
+    "scheme, n_cells, rtol", [("cic", 32, 1e-2), ("tsc", 32, 5e-3)]
+)
+def test_potential_pm_p3m(scheme, n_cells, rtol):
+    x, y, z, m = _particles(seed=42)
+    mesh = pm_calculation.make_mesh(x, y, z, n_cells=n_cells)
+
+    pot = pm_calculation.potential_pm(
+        mesh, x, y, z, m, 0.05, scheme=scheme, p3m=True
+    )
+
+    npt.assert_allclose(pot, _direct(x, y, z, m, 0.05), rtol=rtol)
+
+
+def test_potential_pm_converges_with_n_cells():
+    x, y, z, m = _particles(seed=42)
+    expected = _direct(x, y, z, m, 0.0)
+
+    errors = []
+    for n_cells in (8, 16, 32):
+        mesh = pm_calculation.make_mesh(x, y, z, n_cells=n_cells)
+        pot = pm_calculation.potential_pm(mesh, x, y, z, m, 0.0)
+        errors.append(np.median(np.abs(pot / expected - 1)))
+
+    assert errors[0] > errors[1] > errors[2]
+
+
+def test_short_range_potential_batches(monkeypatch):
+    x, y, z, m = _particles(seed=42)
+    args = (x, y, z, 0.05, x, y, z, m, 0.05, 0.2, 1.0)
+
+    expected = pm_calculation.short_range_potential(
+        *args, self_idx=np.arange(len(m))
+    )
+
+    monkeypatch.setattr(pm_calculation, "_BATCH_PAIRS", 100)
+    pot = pm_calculation.short_range_potential(
+        *args, self_idx=np.arange(len(m))
+    )
+
+    npt.assert_allclose(pot, expected, rtol=1e-12)
@@ -17,7 +17,10 @@
 # IMPORTS
 # =============================================================================
 
+import threading
+import tracemalloc
 import warnings
+from concurrent import futures
 
 from galaxychop.core import data
 from galaxychop.preproc import potential_energy
@@ -29,7 +32,6 @@ import pandas as pd
 
 import pytest
 
-
 # =============================================================================
 # POTENTIAL ENERGY
 # =============================================================================
@@ -78,6 +80,48 @@ def test_Galaxy_potential_energy(galaxy):
     assert np.all(pgal.gas.potential == pgal.potential_energy_[2])
 
 
+def test_Galaxy_potential_energy_shares_columns(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    pgal = potential_energy.potential(gal, backend="numpy")
+
+    assert np.shares_memory(pgal.stars.x, gal.stars.x)
+    assert np.shares_memory(pgal.dark_matter.m, gal.dark_matter.m)
+    assert np.shares_memory(pgal.gas.vz, gal.gas.vz)
+    assert not pgal.stars.potential.flags.writeable
+    assert np.shares_memory(pgal.columns_["potential"], pgal.stars.potential)
+    assert np.shares_memory(pgal.columns_["potential"], pgal.gas.potential)
+
+
+@pytest.mark.parametrize("precision", ["float32", "float64"])
+def test_Galaxy_potential_energy_keeps_dtype(galaxy, precision):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    gal32 = data.mkgalaxy(**gal.disassemble(), dtype=np.float32)
+
+    pgal = potential_energy.potential(
+        gal32, backend="numpy", precision=precision
+    )
+    assert pgal.dtype_ == np.float32
+    assert pgal.stars.potential.dtype == np.float32
+    assert np.shares_memory(pgal.stars.x, gal32.stars.x)
+
+    _, removed = _split_galaxy(pgal, seed=42, fraction=0.1)
+    updated = potential_energy.update_potential(
+        pgal, removed=removed, backend="numpy"
+    )
+    assert updated.dtype_ == np.float32
+
+
 @pytest.mark.skipif(
     potential_energy.DEFAULT_POTENTIAL_BACKEND == "numpy",
     reason="apparently the potential fortran extension are not compiled",
@@ -207,3 +251,1667 @@ def test_potentializer_transformer(galaxy):
     func_df = func_pgal.to_dataframe()
 
     pd.testing.assert_frame_equal(class_df, func_df, check_dtype=False)
+
+
+def test_Galaxy_potential_energy_treecode_backend(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    pgal_np = potential_energy.potential(gal, backend="numpy")
+    pgal_tc = potential_energy.potential(gal, backend="treecode", theta=0.0)
+
+    assert isinstance(pgal_tc, data.Galaxy)
+    npt.assert_allclose(
+        pgal_tc.stars.potential.value, pgal_np.stars.potential.value, rtol=1e-5
+    )
+    npt.assert_allclose(
+        pgal_tc.dark_matter.potential.value,
+        pgal_np.dark_matter.potential.value,
+        rtol=1e-5,
+    )
+    npt.assert_allclose(
+        pgal_tc.gas.potential.value, pgal_np.gas.potential.value, rtol=1e-5
+    )
+
+
+@pytest.mark.parametrize("theta, rtol", [(0.3, 1e-3), (0.6, 1e-2)])
+def test_treecode_potential_theta(theta, rtol):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000)).astype(np.float32)
+    m = random.random(1000).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    pot_np, _ = potential_energy.numpy_potential(x, y, z, m, softening)
+    pot_tc, postproc = potential_energy.treecode_potential(
+        x, y, z, m, softening, theta=theta
+    )
+
+    assert postproc is np.asarray
+    npt.assert_allclose(pot_tc, pot_np, rtol=rtol)
+
+
+def test_treecode_potential_coincident_particles():
+    x = np.array([0.0, 0.0, 1.0])
+    y = z = np.zeros(3)
+    m = np.ones(3)
+
+    pot_np, _ = potential_energy.numpy_potential(
+        x, y, z, m, 0.1, precision="float64"
+    )
+    pot_tc, _ = potential_energy.treecode_potential(x, y, z, m, 0.1)
+
+    npt.assert_allclose(pot_tc, pot_np, rtol=1e-12)
+
+
+def test_potentializer_backend_kws(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    potentializer = potential_energy.Potentializer("treecode", theta=0.4)
+    assert potentializer.backend_kws == {"theta": 0.4}
+
+    class_df = potentializer.transform(gal).to_dataframe()
+    func_df = potential_energy.potential(
+        gal, backend="treecode", theta=0.4
+    ).to_dataframe()
+
+    pd.testing.assert_frame_equal(class_df, func_df)
+
+
+def test_Galaxy_potential_energy_fmm_backend(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    pgal_np = potential_energy.potential(gal, backend="numpy")
+    pgal_fmm = potential_energy.potential(gal, backend="fmm", order=8)
+
+    assert isinstance(pgal_fmm, data.Galaxy)
+    npt.assert_allclose(
+        pgal_fmm.stars.potential.value,
+        pgal_np.stars.potential.value,
+        rtol=1e-4,
+    )
+    npt.assert_allclose(
+        pgal_fmm.dark_matter.potential.value,
+        pgal_np.dark_matter.potential.value,
+        rtol=1e-4,
+    )
+    npt.assert_allclose(
+        pgal_fmm.gas.potential.value, pgal_np.gas.potential.value, rtol=1e-4
+    )
+
+
+@pytest.mark.skipif(
+    potential_energy.DEFAULT_POTENTIAL_BACKEND == "numpy",
+    reason="apparently the potential fortran extension are not compiled",
+)
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "order, rtol",
+    [
+        (2, 1e-2),
+        (3, 3e-3),
+        (4, 1e-3),
+        (5, 3e-4),
+        (6, 1e-4),
+        (7, 5e-5),
+        (8, 2e-5),
+    ],
+)
+def test_fmm_potential_convergence(order, rtol):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 3000)).astype(np.float32)
+    m = random.random(3000).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    pot_f, _ = potential_energy.fortran_potential(x, y, z, m, softening)
+    pot_fmm, postproc = potential_energy.fmm_potential(
+        x, y, z, m, softening, order=order, theta=0.5
+    )
+
+    assert postproc is np.asarray
+    npt.assert_allclose(pot_fmm, pot_f, rtol=rtol)
+
+
+@pytest.mark.parametrize(
+    "size, block_size",
+    [(50, 1), (1000, 7), (1000, 128), (1000, 1000), (1000, 5000)],
+)
+def test_numpy_potential_block_size(size, block_size):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, size)).astype(np.float32)
+    m = random.random(size).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    dist = np.sqrt(
+        np.square(x - x.reshape(-1, 1), dtype=np.float64)
+        + np.square(y - y.reshape(-1, 1), dtype=np.float64)
+        + np.square(z - z.reshape(-1, 1), dtype=np.float64)
+        + np.square(softening, dtype=np.float64)
+    )
+    np.fill_diagonal(dist, np.inf)
+    expected = (m / dist).sum(axis=1) * potential_energy.const.G
+
+    pot, postproc = potential_energy.numpy_potential(
+        x, y, z, m, softening, block_size=block_size
+    )
+
+    assert postproc is np.asarray
+    assert pot.dtype == np.float64
+    npt.assert_allclose(pot, expected, rtol=1e-6)
+
+
+def test_numpy_potential_max_memory():
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 3000)).astype(np.float32)
+    m = random.random(3000).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    pot_block, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, block_size=3000
+    )
+
+    tracemalloc.start()
+    pot_mem, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, max_memory=2**20
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak < 2 * 2**20
+    npt.assert_allclose(pot_mem, pot_block, rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "kws",
+    [{"block_size": 0}, {"max_memory": 1}, {"block_size": 2, "max_memory": 8}],
+)
+def test_numpy_potential_invalid_block(kws):
+    x = y = z = m = np.ones(3, dtype=np.float32)
+    with pytest.raises(ValueError):
+        potential_energy.numpy_potential(x, y, z, m, 0.1, **kws)
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 4096])
+def test_grispy_potential_batch_size(batch_size):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 200)).astype(np.float32)
+    m = random.random(200).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    pot_all, _ = potential_energy.grispy_potential(x, y, z, m, softening)
+    pot, postproc = potential_energy.grispy_potential(
+        x, y, z, m, softening, batch_size=batch_size
+    )
+
+    assert postproc is np.asarray
+    assert np.all(pot > 0)
+    npt.assert_allclose(pot, pot_all, rtol=1e-12)
+
+
+def test_grispy_potential_invalid_batch_size():
+    x = y = z = m = np.ones(3, dtype=np.float32)
+    with pytest.raises(ValueError):
+        potential_energy.grispy_potential(x, y, z, m, 0.1, batch_size=0)
+
+
+@pytest.mark.parametrize(
+    "n_jobs, block_size", [(1, None), (3, None), (4, 70), (None, 1000)]
+)
+def test_parallel_numpy_potential(n_jobs, block_size):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000)).astype(np.float32)
+    m = random.random(1000).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    pot_np, _ = potential_energy.numpy_potential(x, y, z, m, softening)
+    pot_par, postproc = potential_energy.parallel_numpy_potential(
+        x, y, z, m, softening, n_jobs=n_jobs, block_size=block_size
+    )
+
+    assert postproc is np.asarray
+    npt.assert_allclose(pot_par, pot_np, rtol=1e-6)
+
+
+def test_parallel_numpy_potential_invalid_n_jobs():
+    x = y = z = m = np.ones(3, dtype=np.float32)
+    with pytest.raises(ValueError):
+        potential_energy.parallel_numpy_potential(x, y, z, m, 0.1, n_jobs=0)
+
+
+def test_potentializer_n_jobs(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    potentializer = potential_energy.Potentializer(
+        "parallel-numpy", n_jobs=2
+    )
+    assert potentializer.n_jobs == 2
+    assert potentializer.backend_kws == {}
+
+    class_df = potentializer.transform(gal).to_dataframe()
+    func_df = potential_energy.potential(
+        gal, backend="parallel-numpy", n_jobs=2
+    ).to_dataframe()
+    numpy_df = potential_energy.potential(gal, backend="numpy").to_dataframe()
+
+    pd.testing.assert_frame_equal(class_df, func_df)
+    pd.testing.assert_frame_equal(class_df, numpy_df)
+
+
+def test_potentializer_n_jobs_default_backend():
+    with pytest.raises(ValueError, match="does not accept 'n_jobs'"):
+        potential_energy.Potentializer(n_jobs=2)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "treecode", "fmm"])
+def test_potentializer_n_jobs_not_accepted(backend):
+    with pytest.raises(ValueError, match="does not accept 'n_jobs'"):
+        potential_energy.Potentializer(backend, n_jobs=2)
+
+
+@pytest.mark.parametrize(
+    "backend", potential_energy.PARALLEL_BACKENDS + ("auto",)
+)
+def test_potentializer_n_jobs_parallel_backends(galaxy, backend):
+    if backend == "numba":
+        pytest.importorskip("numba")
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    # one worker, the numba threading layer may have a single thread
+    potentializer = potential_energy.Potentializer(backend, n_jobs=1)
+
+    assert potentializer.transform(gal).has_potential_
+
+
+@pytest.mark.skipif(
+    potential_energy.DEFAULT_POTENTIAL_BACKEND == "numpy",
+    reason="apparently the potential fortran extension are not compiled",
+)
+def test_fortran_potential_symmetric():
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 2000)).astype(np.float32)
+    m = random.random(2000).astype(np.float32)
+    softening = np.asarray(0.1, dtype=np.float32)
+
+    pot_f, _ = potential_energy.fortran_potential(x, y, z, m, softening)
+    pot_sym, postproc = potential_energy.fortran_potential(
+        x, y, z, m, softening, symmetric=True
+    )
+
+    assert postproc is np.asarray
+    npt.assert_allclose(pot_sym, pot_f, rtol=1e-5)
+
+
+@pytest.mark.skipif(
+    potential_energy.DEFAULT_POTENTIAL_BACKEND == "numpy",
+    reason="apparently the potential fortran extension are not compiled",
+)
+def test_Galaxy_potential_energy_fortran_symmetric(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    pgal_f = potential_energy.potential(gal, backend="fortran")
+    pgal_sym = potential_energy.potential(
+        gal, backend="fortran", symmetric=True
+    )
+
+    npt.assert_allclose(
+        pgal_sym.stars.potential.value, pgal_f.stars.potential.value, rtol=1e-5
+    )
+    npt.assert_allclose(
+        pgal_sym.dark_matter.potential.value,
+        pgal_f.dark_matter.potential.value,
+        rtol=1e-5,
+    )
+    npt.assert_allclose(
+        pgal_sym.gas.potential.value, pgal_f.gas.potential.value, rtol=1e-5
+    )
+
+
+@pytest.mark.parametrize("backend", ["numpy", "fortran"])
+def test_potential_precision(backend):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+
+    backend_function = potential_energy.POTENTIAL_BACKENDS[backend]
+
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 5000))
+    m = random.random(5000)
+    softening = np.asarray(0.1)
+
+    reference, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64"
+    )
+    pot_64, _ = backend_function(x, y, z, m, softening, precision="float64")
+
+    x, y, z, m = (arr.astype(np.float32) for arr in (x, y, z, m))
+    softening = softening.astype(np.float32)
+
+    pot_mixed, _ = backend_function(x, y, z, m, softening, precision="mixed")
+    pot_32, _ = backend_function(x, y, z, m, softening, precision="float32")
+
+    assert pot_64.dtype == np.float64
+    assert pot_mixed.dtype == np.float64
+    assert pot_32.dtype == np.float32
+
+    npt.assert_allclose(pot_64, reference, rtol=1e-12)
+
+    error_mixed = np.abs(pot_mixed - reference) / reference
+    error_32 = np.abs(pot_32 - reference) / reference
+    assert error_mixed.max() < 1e-6
+    assert error_mixed.mean() < error_32.mean()
+
+
+def test_potential_invalid_precision(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    with pytest.raises(ValueError):
+        potential_energy.potential(gal, backend="numpy", precision="float16")
+
+
+@pytest.mark.skipif(
+    potential_energy.DEFAULT_POTENTIAL_BACKEND == "numpy",
+    reason="apparently the potential fortran extension are not compiled",
+)
+def test_fortran_potential_symmetric_float64():
+    x = y = z = m = np.ones(3)
+    with pytest.raises(ValueError):
+        potential_energy.fortran_potential(
+            x, y, z, m, 0.1, precision="float64", symmetric=True
+        )
+
+
+def test_potentializer_precision(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    potentializer = potential_energy.Potentializer(
+        "numpy", precision="float64"
+    )
+    assert potentializer.precision == "float64"
+
+    class_df = potentializer.transform(gal).to_dataframe()
+    func_df = potential_energy.potential(
+        gal, backend="numpy", precision="float64"
+    ).to_dataframe()
+
+    pd.testing.assert_frame_equal(class_df, func_df)
+
+
+@pytest.mark.parametrize(
+    "backend, backend_kws, rtol",
+    [
+        ("numpy", {}, 1e-12),
+        ("parallel-numpy", {"n_jobs": 2}, 1e-12),
+        ("numba", {}, 1e-12),
+        ("fortran", {}, 1e-12),
+        ("fortran", {"symmetric": True}, 1e-5),
+        ("grispy", {}, 1e-2),
+        ("treecode", {"theta": 0.0}, 1e-12),
+        ("fmm", {"order": 8, "theta": 0.5}, 1e-4),
+    ],
+)
+def test_potential_per_particle_softening(backend, backend_kws, rtol):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    if backend == "numba":
+        pytest.importorskip("numba")
+
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000))
+    m = random.random(1000)
+    softening = random.choice([0.05, 0.3, 1.0], size=1000)
+
+    soft2 = (softening**2 + softening.reshape(-1, 1) ** 2) / 2
+    dist = np.sqrt(
+        np.square(x - x.reshape(-1, 1))
+        + np.square(y - y.reshape(-1, 1))
+        + np.square(z - z.reshape(-1, 1))
+        + soft2
+    )
+    np.fill_diagonal(dist, np.inf)
+    expected = (m / dist).sum(axis=1) * potential_energy.const.G
+
+    precision = "mixed" if backend_kws.get("symmetric") else "float64"
+    if precision == "mixed":
+        x, y, z, m, softening = (
+            arr.astype(np.float32) for arr in (x, y, z, m, softening)
+        )
+
+    backend_function = potential_energy.POTENTIAL_BACKENDS[backend]
+    pot, _ = backend_function(
+        x, y, z, m, softening, precision=precision, **backend_kws
+    )
+
+    npt.assert_allclose(pot, expected, rtol=rtol)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "treecode", "fmm"])
+def test_potential_uniform_softening_array(backend):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 500))
+    m = random.random(500)
+
+    backend_function = potential_energy.POTENTIAL_BACKENDS[backend]
+    pot_scalar, _ = backend_function(x, y, z, m, np.asarray(0.3))
+    pot_array, _ = backend_function(x, y, z, m, np.full(500, 0.3))
+
+    npt.assert_allclose(pot_array, pot_scalar, rtol=1e-10)
+
+
+def test_Galaxy_potential_energy_per_type_softening(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    df = gal.to_dataframe(attributes=["x", "y", "z", "m", "softening"])
+    assert df.softening.nunique() > 1
+
+    pgal = potential_energy.potential(
+        gal, backend="numpy", precision="float64"
+    )
+
+    x, y, z, m = (df[col].to_numpy() for col in "xyzm")
+    softening = df.softening.to_numpy()
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64"
+    )
+
+    potential = np.concatenate(
+        [
+            pgal.stars.potential.value,
+            pgal.dark_matter.potential.value,
+            pgal.gas.potential.value,
+        ]
+    )
+    npt.assert_allclose(potential, -expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "backend, backend_kws, rtol",
+    [
+        ("numpy", {}, 1e-12),
+        ("numpy", {"block_size": 64}, 1e-12),
+        ("parallel-numpy", {"n_jobs": 2}, 1e-12),
+        ("numba", {}, 1e-12),
+        ("fortran", {}, 1e-12),
+        ("grispy", {}, 1e-2),
+        ("treecode", {"theta": 0.0}, 1e-12),
+        ("fmm", {"order": 8, "theta": 0.5}, 1e-4),
+    ],
+)
+def test_potential_sources(backend, backend_kws, rtol):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    if backend == "numba":
+        pytest.importorskip("numba")
+
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000))
+    m = random.random(1000)
+    softening = random.choice([0.05, 0.3, 1.0], size=1000)
+    sources = np.sort(random.choice(1000, 300, replace=False))
+
+    soft2 = (softening[sources] ** 2 + softening.reshape(-1, 1) ** 2) / 2
+    dist = np.sqrt(
+        np.square(x[sources] - x.reshape(-1, 1))
+        + np.square(y[sources] - y.reshape(-1, 1))
+        + np.square(z[sources] - z.reshape(-1, 1))
+        + soft2
+    )
+    dist[sources, np.arange(len(sources))] = np.inf
+    expected = (m[sources] / dist).sum(axis=1) * potential_energy.const.G
+
+    backend_function = potential_energy.POTENTIAL_BACKENDS[backend]
+    pot, _ = backend_function(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        precision="float64",
+        sources=sources,
+        **backend_kws,
+    )
+
+    npt.assert_allclose(pot, expected, rtol=rtol)
+
+
+@pytest.mark.skipif(
+    potential_energy.potential_f is None,
+    reason="apparently the potential fortran extension are not compiled",
+)
+def test_fortran_potential_symmetric_sources():
+    x, y, z, m = np.ones((4, 10), dtype=np.float32)
+    with pytest.raises(ValueError):
+        potential_energy.fortran_potential(
+            x, y, z, m, 0.1, sources=np.arange(5), symmetric=True
+        )
+
+
+def test_potential_source_fraction(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    full = potential_energy.potential(
+        gal, backend="numpy", precision="float64"
+    )
+    sub, error = potential_energy.potential(
+        gal,
+        backend="numpy",
+        precision="float64",
+        source_fraction=0.5,
+        seed=42,
+        return_error=True,
+    )
+
+    expected = full.to_dataframe(attributes=["potential"]).potential
+    result = sub.to_dataframe(attributes=["potential"]).potential
+    assert error.unit == potential_energy.u.km**2 / potential_energy.u.s**2
+    assert error.shape == result.shape
+    assert np.all(error.value > 0)
+
+    # most of the particles are within a few times the error estimate
+    deviation = np.abs(result - expected) / error.value
+    assert np.median(deviation) < 3
+    npt.assert_allclose(result, expected, rtol=0.2)
+
+    # the subsample is reproducible
+    again = potential_energy.potential(
+        gal,
+        backend="numpy",
+        precision="float64",
+        source_fraction=0.5,
+        seed=42,
+    )
+    pd.testing.assert_frame_equal(again.to_dataframe(), sub.to_dataframe())
+
+
+def test_potential_source_fraction_no_error(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    _, error = potential_energy.potential(
+        gal, backend="numpy", return_error=True
+    )
+    assert np.all(error.value == 0)
+
+
+@pytest.mark.parametrize("source_fraction", [0, -0.5, 1.5])
+def test_potential_invalid_source_fraction(galaxy, source_fraction):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    with pytest.raises(ValueError):
+        potential_energy.potential(
+            gal, backend="numpy", source_fraction=source_fraction
+        )
+
+
+def test_potentializer_source_fraction(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    potentializer = potential_energy.Potentializer(
+        backend="numpy", source_fraction=0.5, seed=7
+    )
+    class_df = potentializer.transform(gal).to_dataframe()
+    func_df = potential_energy.potential(
+        gal, backend="numpy", source_fraction=0.5, seed=7
+    ).to_dataframe()
+
+    pd.testing.assert_frame_equal(class_df, func_df)
+
+
+def test_Galaxy_potential_energy_pm_backend(galaxy):
+    # the short range correction needs softening below the cutoff radius
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+        stars_softening_max=0.01,
+        dm_softening_max=0.01,
+        gas_softening_max=0.01,
+    )
+
+    pgal_np = potential_energy.potential(gal, backend="numpy")
+    pgal_pm = potential_energy.potential(gal, backend="pm", p3m=True)
+
+    assert isinstance(pgal_pm, data.Galaxy)
+    npt.assert_allclose(
+        pgal_pm.stars.potential.value,
+        pgal_np.stars.potential.value,
+        rtol=1e-2,
+    )
+    npt.assert_allclose(
+        pgal_pm.dark_matter.potential.value,
+        pgal_np.dark_matter.potential.value,
+        rtol=1e-2,
+    )
+    npt.assert_allclose(
+        pgal_pm.gas.potential.value, pgal_np.gas.potential.value, rtol=1e-2
+    )
+
+
+@pytest.mark.parametrize("precision", ["float32", "float64"])
+def test_pm_potential_sources(precision):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000))
+    m = random.random(1000)
+    softening = random.choice([0.01, 0.05], size=1000)
+    sources = np.sort(random.choice(1000, 300, replace=False))
+
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64", sources=sources
+    )
+    pot, postproc = potential_energy.pm_potential(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        precision=precision,
+        sources=sources,
+        p3m=True,
+    )
+
+    assert postproc is np.asarray
+    npt.assert_allclose(pot, expected, rtol=5e-3)
+
+
+@pytest.mark.parametrize(
+    "backend, backend_kws, rtol",
+    [
+        ("numpy", {}, 1e-12),
+        ("numpy", {"block_size": 64}, 1e-12),
+        ("parallel-numpy", {"n_jobs": 2}, 1e-12),
+        ("numba", {}, 1e-12),
+        ("fortran", {}, 1e-12),
+        ("grispy", {}, 1e-2),
+        ("treecode", {"theta": 0.0}, 1e-12),
+        ("fmm", {"order": 8, "theta": 0.5}, 1e-4),
+        ("pm", {"p3m": True}, 5e-3),
+        ("distributed", {"n_jobs": 2, "block_size": 64}, 1e-12),
+    ],
+)
+@pytest.mark.parametrize("with_sources", [False, True])
+def test_potential_targets(backend, backend_kws, rtol, with_sources):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    if backend == "numba":
+        pytest.importorskip("numba")
+
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 1000))
+    m = random.random(1000)
+    softening = random.choice([0.01, 0.05], size=1000)
+    sources = np.sort(random.choice(1000, 600, replace=False))
+    targets = random.choice(1000, 200, replace=False)
+    if not with_sources:
+        sources = None
+
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64", sources=sources
+    )
+
+    backend_function = potential_energy.POTENTIAL_BACKENDS[backend]
+    pot, _ = backend_function(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        precision="float64",
+        sources=sources,
+        targets=targets,
+        **backend_kws,
+    )
+
+    assert pot.shape == (200,)
+    npt.assert_allclose(pot, expected[targets], rtol=rtol)
+
+
+@pytest.mark.parametrize(
+    "backend, backend_kws",
+    [
+        ("numpy", {}),
+        ("numba", {}),
+        ("fortran", {}),
+        ("treecode", {"theta": 0.0}),
+    ],
+)
+def test_potential_at(backend, backend_kws):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    if backend == "numba":
+        pytest.importorskip("numba")
+
+    random = np.random.default_rng(seed=42)
+    sources_xyz = random.normal(size=(500, 3))
+    sources_m = random.random(500)
+    targets_xyz = np.column_stack(
+        (np.linspace(0.1, 3, 30), np.zeros(30), np.zeros(30))
+    )
+
+    pot = potential_energy.potential_at(
+        targets_xyz,
+        sources_xyz,
+        sources_m,
+        0.1,
+        backend=backend,
+        precision="float64",
+        **backend_kws,
+    )
+
+    dist = np.sqrt(
+        np.sum(np.square(targets_xyz[:, None] - sources_xyz), axis=-1)
+        + 0.1**2
+    )
+    expected = -(sources_m / dist).sum(axis=1) * potential_energy.const.G
+
+    assert pot.unit == potential_energy.u.km**2 / potential_energy.u.s**2
+    npt.assert_allclose(pot.value, expected, rtol=1e-10)
+
+
+def test_potential_at_stars(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    pgal = potential_energy.potential(
+        gal, backend="numpy", precision="float64"
+    )
+
+    df = gal.to_dataframe(attributes=["x", "y", "z", "m", "softening"])
+    xyz = df[["x", "y", "z"]].to_numpy()
+    stars = np.arange(len(gal.stars))
+
+    pot = potential_energy.potential_at(
+        xyz[stars],
+        xyz,
+        df.m.to_numpy(),
+        df.softening.to_numpy(),
+        backend="numpy",
+        precision="float64",
+        self_idx=stars,
+    )
+
+    npt.assert_allclose(pot.value, pgal.stars.potential.value, rtol=1e-12)
+
+
+def test_potential_at_targets_softening():
+    random = np.random.default_rng(seed=42)
+    sources_xyz = random.normal(size=(100, 3))
+    softening = random.choice([0.1, 0.2], size=100)
+
+    with pytest.raises(ValueError):
+        potential_energy.potential_at(
+            np.zeros((1, 3)), sources_xyz, 1.0, softening, backend="numpy"
+        )
+    with pytest.raises(ValueError):
+        potential_energy.potential_at(
+            np.zeros((2, 3)),
+            sources_xyz,
+            1.0,
+            0.1,
+            backend="numpy",
+            self_idx=[0],
+        )
+
+    pot = potential_energy.potential_at(
+        np.zeros((1, 3)),
+        sources_xyz,
+        1.0,
+        softening,
+        backend="numpy",
+        precision="float64",
+        targets_softening=0.0,
+    )
+    dist = np.sqrt(np.sum(sources_xyz**2, axis=1) + softening**2 / 2)
+    npt.assert_allclose(
+        pot.value, -np.sum(1 / dist) * potential_energy.const.G, rtol=1e-12
+    )
+
+
+def _split_galaxy(gal, seed, fraction):
+    """Split a galaxy in two, with a random fraction of every type."""
+    random = np.random.default_rng(seed=seed)
+    kws = gal.disassemble()
+
+    kept, rest = dict(kws), dict(kws)
+    for suffix in ("s", "dm", "g"):
+        mask = random.random(len(kws[f"m_{suffix}"])) < fraction
+        for aname in ("m", "x", "y", "z", "vx", "vy", "vz", "potential"):
+            key = f"{aname}_{suffix}"
+            kept[key], rest[key] = kws[key][~mask], kws[key][mask]
+
+    return data.mkgalaxy(**kept), data.mkgalaxy(**rest)
+
+
+def test_update_potential_removed(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    pgal = potential_energy.potential(
+        gal, backend="numpy", precision="float64"
+    )
+
+    # the kept particles still have the potential of the whole galaxy
+    kept, removed = _split_galaxy(pgal, seed=42, fraction=0.1)
+
+    updated = potential_energy.update_potential(
+        kept, removed=removed, backend="numpy", precision="float64"
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        expected = potential_energy.potential(
+            kept, backend="numpy", precision="float64"
+        )
+
+    assert len(updated) == len(kept)
+    for ptype in ("stars", "dark_matter", "gas"):
+        npt.assert_allclose(
+            getattr(updated, ptype).potential.value,
+            getattr(expected, ptype).potential.value,
+            rtol=1e-10,
+        )
+
+
+def test_update_potential_added(galaxy):
+    gal = galaxy(seed=42)
+    base, added = _split_galaxy(gal, seed=42, fraction=0.1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        pbase = potential_energy.potential(
+            base, backend="numpy", precision="float64"
+        )
+
+    updated = potential_energy.update_potential(
+        pbase, added=added.stars, backend="numpy", precision="float64"
+    )
+
+    assert len(updated.stars) == len(base.stars) + len(added.stars)
+    assert len(updated.dark_matter) == len(base.dark_matter)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        expected = potential_energy.potential(
+            updated, backend="numpy", precision="float64"
+        )
+
+    npt.assert_allclose(
+        updated.stars.potential.value,
+        expected.stars.potential.value,
+        rtol=1e-10,
+    )
+    npt.assert_allclose(
+        updated.gas.potential.value,
+        expected.gas.potential.value,
+        rtol=1e-10,
+    )
+
+
+def test_update_potential_without_potential(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    with pytest.raises(data.NoGravitationalPotentialError):
+        potential_energy.update_potential(gal, removed=gal.stars)
+
+
+def test_update_potential_added_softening(galaxy):
+    gal = galaxy(seed=42)
+    base, added = _split_galaxy(gal, seed=42, fraction=0.1)
+
+    kws = added.disassemble()
+    kws["softening_s"] = base.stars.softening.value + 1
+    added = data.mkgalaxy(**kws)
+
+    with pytest.raises(ValueError):
+        potential_energy.update_potential(
+            base, added=added, backend="numpy"
+        )
+
+
+def test_potential_cache(galaxy, tmp_path, monkeypatch):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    pcache = potential_energy.PotentialCache(tmp_path)
+
+    pgal = potential_energy.potential(gal, backend="numpy", cache=pcache)
+    assert len(pcache) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the cached potential was computed again")
+
+    monkeypatch.setitem(potential_energy.POTENTIAL_BACKENDS, "numpy", fail)
+
+    cgal = potential_energy.potential(gal, backend="numpy", cache=tmp_path)
+    npt.assert_array_equal(
+        cgal.stars.potential.value, pgal.stars.potential.value
+    )
+    npt.assert_array_equal(
+        cgal.dark_matter.potential.value, pgal.dark_matter.potential.value
+    )
+
+    # a different precision is a different calculation
+    with pytest.raises(AssertionError):
+        potential_energy.potential(
+            gal, backend="numpy", precision="float64", cache=pcache
+        )
+
+
+def test_potential_cache_resolved_backend(galaxy, tmp_path, monkeypatch):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    pcache = potential_energy.PotentialCache(tmp_path)
+    backend, _ = potential_energy.select_backend(len(gal))
+
+    potential_energy.potential(gal, backend="auto", cache=pcache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the cached potential was computed again")
+
+    monkeypatch.setitem(potential_energy.POTENTIAL_BACKENDS, backend, fail)
+
+    # "auto" is stored as the backend it selected
+    potential_energy.potential(gal, backend=backend, cache=pcache)
+    assert len(pcache) == 1
+
+
+def test_potential_cache_execution_kws(galaxy, tmp_path):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    pcache = potential_energy.PotentialCache(tmp_path)
+
+    # a new executor (with a new repr) is the same calculation
+    for _ in range(2):
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            potential_energy.potential(
+                gal,
+                backend="distributed",
+                executor=executor,
+                block_size=500,
+                cache=pcache,
+            )
+
+    assert len(pcache) == 1
+
+
+def test_potential_cache_source_fraction(galaxy, tmp_path):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    pcache = potential_energy.PotentialCache(tmp_path)
+
+    potential_energy.potential(
+        gal, backend="numpy", source_fraction=0.5, cache=pcache
+    )
+    assert len(pcache) == 0
+
+    pgal, error = potential_energy.potential(
+        gal,
+        backend="numpy",
+        source_fraction=0.5,
+        seed=42,
+        return_error=True,
+        cache=pcache,
+    )
+    cgal, cerror = potential_energy.potential(
+        gal,
+        backend="numpy",
+        source_fraction=0.5,
+        seed=42,
+        return_error=True,
+        cache=pcache,
+    )
+
+    assert len(pcache) == 1
+    npt.assert_array_equal(cerror, error)
+    npt.assert_array_equal(
+        cgal.stars.potential.value, pgal.stars.potential.value
+    )
+
+
+def test_Potentializer_cache(galaxy, tmp_path):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    potentializer = potential_energy.Potentializer(
+        backend="numpy", cache=tmp_path
+    )
+
+    assert isinstance(potentializer.cache, potential_energy.PotentialCache)
+
+    pgal = potentializer.transform(gal)
+    cgal = potentializer.transform(gal)
+
+    assert len(potentializer.cache) == 1
+    npt.assert_array_equal(
+        cgal.stars.potential.value, pgal.stars.potential.value
+    )
+
+
+@pytest.mark.parametrize(
+    "size, memory, n_cpus, fortran, numba, backend",
+    [
+        (1000, 2**33, 1, True, True, "numpy"),
+        (1000, 2**33, 4, True, True, "parallel-numpy"),
+        (50_000, 2**33, 1, True, True, "fortran"),
+        (50_000, 2**33, 1, False, True, "numba"),
+        (50_000, 2**33, 1, False, False, "treecode"),
+        (10**6, 2**33, 1, True, True, "treecode"),
+        (10**6, 2**20, 1, True, True, "fortran"),
+        (10**6, 2**20, 4, False, False, "parallel-numpy"),
+    ],
+)
+def test_select_backend(
+    monkeypatch, size, memory, n_cpus, fortran, numba, backend
+):
+    monkeypatch.setattr(
+        potential_energy, "potential_f", object() if fortran else None
+    )
+    monkeypatch.setattr(potential_energy, "_has_numba", lambda: numba)
+
+    selected, backend_kws = potential_energy.select_backend(
+        size, memory=memory, n_cpus=n_cpus
+    )
+
+    assert selected == backend
+    if selected in ("parallel-numpy", "numba"):
+        assert backend_kws["n_jobs"] == n_cpus
+    if selected in ("numpy", "parallel-numpy"):
+        assert backend_kws["max_memory"] <= memory // 4
+
+
+def test_available_resources():
+    memory = potential_energy.available_memory()
+    assert memory is None or memory > 0
+    assert potential_energy.available_cpus() >= 1
+
+
+def test_potential_auto_backend(galaxy, caplog):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    with caplog.at_level("INFO", logger=potential_energy.__name__):
+        pgal = potential_energy.potential(gal, backend="auto")
+
+    assert "Selected potential backend" in caplog.text
+
+    expected = potential_energy.potential(gal, backend="numpy")
+    pd.testing.assert_frame_equal(pgal.to_dataframe(), expected.to_dataframe())
+
+
+def test_potentializer_auto_backend(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    potentializer = potential_energy.Potentializer("auto", n_jobs=1)
+    pgal = potentializer.transform(gal)
+
+    expected = potential_energy.potential(gal, backend="numpy")
+    pd.testing.assert_frame_equal(pgal.to_dataframe(), expected.to_dataframe())
+
+
+def test_potential_at_auto_backend():
+    random = np.random.default_rng(seed=42)
+    sources_xyz = random.normal(size=(500, 3))
+    targets_xyz = random.normal(size=(30, 3))
+
+    pot = potential_energy.potential_at(
+        targets_xyz, sources_xyz, 1.0, 0.1, backend="auto"
+    )
+    expected = potential_energy.potential_at(
+        targets_xyz, sources_xyz, 1.0, 0.1, backend="numpy"
+    )
+
+    npt.assert_allclose(pot, expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "fortran"])
+def test_potential_chunked_progress(galaxy, backend):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    reports = []
+
+    pgal = potential_energy.potential(
+        gal, backend=backend, chunk_size=100, progress=reports.append
+    )
+    expected = potential_energy.potential(gal, backend=backend)
+
+    assert len(reports) == -(-len(gal) // 100)
+    assert [r.done for r in reports] == sorted(r.done for r in reports)
+    assert reports[-1].done == reports[-1].total == len(gal)
+    assert reports[-1].fraction == 1.0
+    assert reports[-1].eta == 0.0
+    pd.testing.assert_frame_equal(pgal.to_dataframe(), expected.to_dataframe())
+
+
+@pytest.mark.parametrize("backend", ["treecode", "fmm", "pm"])
+def test_potential_chunked_single_pass(galaxy, backend):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    reports = []
+
+    pgal = potential_energy.potential(
+        gal, backend=backend, chunk_size=100, progress=reports.append
+    )
+    expected = potential_energy.potential(gal, backend=backend)
+
+    # the tree and mesh backends are built once, not once per chunk
+    assert len(reports) == 1
+    assert reports[0].done == reports[0].total == len(gal)
+    pd.testing.assert_frame_equal(pgal.to_dataframe(), expected.to_dataframe())
+
+    # the cancellation token is checked before the single chunk
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(potential_energy.PotentialCancelledError):
+        potential_energy.potential(gal, backend=backend, cancel=cancel)
+
+
+def test_potential_chunked_symmetric(galaxy):
+    if potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    reports = []
+
+    pgal = potential_energy.potential(
+        gal,
+        backend="fortran",
+        symmetric=True,
+        chunk_size=100,
+        progress=reports.append,
+    )
+    expected = potential_energy.potential(
+        gal, backend="fortran", symmetric=True
+    )
+
+    # the symmetric kernel needs all the pairs, so it is not split
+    assert len(reports) == 1
+    pd.testing.assert_frame_equal(pgal.to_dataframe(), expected.to_dataframe())
+
+
+def test_potential_chunked_source_fraction(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    reports = []
+
+    pgal = potential_energy.potential(
+        gal,
+        backend="numpy",
+        source_fraction=0.5,
+        seed=42,
+        chunk_size=250,
+        progress=reports.append,
+    )
+    expected = potential_energy.potential(
+        gal, backend="numpy", source_fraction=0.5, seed=42
+    )
+
+    assert reports[-1].done == reports[-1].total == 2 * len(gal)
+    pd.testing.assert_frame_equal(pgal.to_dataframe(), expected.to_dataframe())
+
+
+def test_potential_cancel(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    cancel = threading.Event()
+    reports = []
+
+    def progress(report):
+        reports.append(report)
+        cancel.set()
+
+    with pytest.raises(potential_energy.PotentialCancelledError):
+        potential_energy.potential(
+            gal,
+            backend="numpy",
+            chunk_size=100,
+            progress=progress,
+            cancel=cancel,
+        )
+    assert len(reports) == 1
+
+    # an already cancelled token does not compute anything
+    with pytest.raises(potential_energy.PotentialCancelledError):
+        potential_energy.potential(gal, backend="numpy", cancel=cancel)
+
+
+def test_potential_invalid_chunk_size(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    with pytest.raises(ValueError):
+        potential_energy.potential(gal, backend="numpy", chunk_size=0)
+
+
+def test_potentializer_progress(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    reports = []
+
+    potentializer = potential_energy.Potentializer(
+        "numpy", chunk_size=500, progress=reports.append
+    )
+    potentializer.transform(gal)
+
+    assert potentializer.chunk_size == 500
+    assert reports[-1].done == len(gal)
+
+
+def test_PotentialProgress():
+    report = potential_energy.PotentialProgress(done=25, total=100, elapsed=2)
+
+    assert report.fraction == 0.25
+    assert report.eta == 6.0
+    assert repr(report) == (
+        "<PotentialProgress 25/100, elapsed=2.0s, eta=6.0s>"
+    )
+    assert potential_energy.PotentialProgress(0, 100, 1.0).eta == np.inf
+    assert potential_energy.PotentialProgress(0, 0, 0.0).fraction == 1.0
+
+
+def _memmap_particles(tmp_path, size, seed=42):
+    random = np.random.default_rng(seed=seed)
+    arrays = {
+        "x": random.normal(size=size),
+        "y": random.normal(size=size),
+        "z": random.normal(size=size),
+        "m": random.random(size),
+        "softening": random.choice([0.05, 0.1], size=size),
+    }
+    for name, arr in arrays.items():
+        np.save(tmp_path / f"{name}.npy", arr)
+    return {
+        name: np.load(tmp_path / f"{name}.npy", mmap_mode="r")
+        for name in arrays
+    }
+
+
+@pytest.mark.parametrize(
+    "backend", ["numpy", "parallel-numpy", "numba", "fortran"]
+)
+def test_potential_out_of_core(tmp_path, backend):
+    if backend == "fortran" and potential_energy.potential_f is None:
+        pytest.skip(
+            "apparently the potential fortran extension are not compiled"
+        )
+    if backend == "numba":
+        pytest.importorskip("numba")
+
+    parts = _memmap_particles(tmp_path, 1000)
+    x, y, z, m, softening = parts.values()
+
+    pot = potential_energy.potential_out_of_core(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        out=tmp_path / "potential.npy",
+        backend=backend,
+        precision="float64",
+        block_size=300,
+    )
+
+    expected, _ = potential_energy.numpy_potential(
+        *(np.asarray(arr) for arr in parts.values()), precision="float64"
+    )
+
+    assert isinstance(pot, np.memmap)
+    npt.assert_allclose(pot, -expected, rtol=1e-12)
+    npt.assert_allclose(
+        np.load(tmp_path / "potential.npy"), -expected, rtol=1e-12
+    )
+
+
+def test_potential_out_of_core_shared_softening(tmp_path):
+    parts = _memmap_particles(tmp_path, 500)
+    x, y, z, m = (parts[col] for col in "xyzm")
+    out = np.empty(500)
+
+    pot = potential_energy.potential_out_of_core(
+        x, y, z, m, 0.1, out=out, backend="numpy", block_size=128
+    )
+    expected = potential_energy.potential_at(
+        np.column_stack((x, y, z)),
+        np.column_stack((x, y, z)),
+        m,
+        0.1,
+        backend="numpy",
+        self_idx=np.arange(500),
+    )
+
+    assert pot is out
+    npt.assert_allclose(pot, expected.value, rtol=1e-6)
+
+
+def test_potential_out_of_core_bounded_memory(tmp_path):
+    parts = _memmap_particles(tmp_path, 20_000)
+
+    tracemalloc.start()
+    potential_energy.potential_out_of_core(
+        *parts.values(),
+        out=tmp_path / "potential.npy",
+        backend="numpy",
+        block_size=500,
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # the inputs alone use 800 kB, and a full tile of the distances 3.2 GB
+    assert peak < 2**22
+
+
+def test_potential_out_of_core_progress_and_cancel(tmp_path):
+    parts = _memmap_particles(tmp_path, 1000)
+    cancel = threading.Event()
+    reports = []
+
+    def progress(report):
+        reports.append(report)
+        if report.done >= 600:
+            cancel.set()
+
+    out = np.full(1000, np.nan)
+    with pytest.raises(potential_energy.PotentialCancelledError):
+        potential_energy.potential_out_of_core(
+            *parts.values(),
+            out=out,
+            backend="numpy",
+            block_size=300,
+            progress=progress,
+            cancel=cancel,
+        )
+
+    assert [r.done for r in reports] == [300, 600]
+    assert np.all(np.isfinite(out[:600]))
+    assert np.all(np.isnan(out[600:]))
+
+
+@pytest.mark.parametrize(
+    "kws",
+    [
+        {"backend": "treecode"},
+        {"precision": "float16"},
+        {"block_size": 0},
+        {"out": np.empty(3)},
+    ],
+)
+def test_potential_out_of_core_invalid(kws):
+    x = y = z = m = np.ones(10)
+    with pytest.raises(ValueError):
+        potential_energy.potential_out_of_core(x, y, z, m, 0.1, **kws)
+
+
+# =============================================================================
+# DISTRIBUTED
+# =============================================================================
+
+
+def test_potential_distributed_backend(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    pgal = potential_energy.potential(
+        gal, backend="distributed", n_jobs=2, block_size=100
+    )
+    expected = potential_energy.potential(gal, backend="numpy")
+
+    npt.assert_allclose(
+        pgal.to_dataframe()["potential"],
+        expected.to_dataframe()["potential"],
+        rtol=1e-6,
+    )
+
+
+@pytest.mark.parametrize("shared_memory", [True, False])
+@pytest.mark.parametrize("softening", [0.05, "per-particle"])
+def test_distributed_potential_executor(shared_memory, softening):
+    random = np.random.default_rng(seed=42)
+    x, y, z = random.normal(size=(3, 500))
+    m = random.random(500)
+    if softening == "per-particle":
+        softening = random.choice([0.01, 0.05], size=500)
+
+    expected, _ = potential_energy.numpy_potential(
+        x, y, z, m, softening, precision="float64"
+    )
+
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        pot, postproc = potential_energy.distributed_potential(
+            x,
+            y,
+            z,
+            m,
+            softening,
+            precision="float64",
+            backend="numpy",
+            executor=executor,
+            block_size=128,
+            shared_memory=shared_memory,
+        )
+
+    assert postproc is np.asarray
+    npt.assert_allclose(pot, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "kws",
+    [
+        {"backend": "distributed"},
+        {"backend": "auto"},
+        {"block_size": 0},
+    ],
+)
+def test_distributed_potential_invalid(kws):
+    x = y = z = m = np.ones(10)
+    with pytest.raises(ValueError):
+        potential_energy.distributed_potential(x, y, z, m, 0.1, **kws)
+
+
+# =============================================================================
+# SPHERICAL
+# =============================================================================
+
+
+def test_potentializer_spherical(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    pgal = potential_energy.Potentializer(
+        "spherical", precision="float64"
+    ).transform(gal)
+
+    df = gal.to_dataframe(attributes=["x", "y", "z", "m", "softening"])
+    expected, _ = potential_energy.spherical_potential(
+        df.x.to_numpy(),
+        df.y.to_numpy(),
+        df.z.to_numpy(),
+        df.m.to_numpy(),
+        df.softening.to_numpy(),
+        precision="float64",
+    )
+
+    assert pgal.has_potential_
+    npt.assert_allclose(
+        pgal.to_dataframe()["potential"], -expected, rtol=1e-12
+    )
+
+
+def test_spherical_deviation(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    result = potential_energy.spherical_deviation(gal, n_targets=50, seed=42)
+
+    df = gal.to_dataframe(attributes=["x", "y", "z", "m", "softening"])
+    particles = [
+        df[aname].to_numpy() for aname in ("x", "y", "z", "m", "softening")
+    ]
+    spherical, _ = potential_energy.spherical_potential(
+        *particles, precision="float64"
+    )
+    direct, _ = potential_energy.numpy_potential(
+        *particles, precision="float64", targets=result.targets
+    )
+
+    assert len(result.targets) == len(np.unique(result.targets)) == 50
+    npt.assert_allclose(
+        result.deviation, np.abs(spherical[result.targets] / direct - 1)
+    )
+    assert result.median <= result.max
+    assert result.rms <= result.max
+    assert repr(result).startswith("<SphericalDeviation targets=50,")
+
+
+def test_spherical_deviation_invalid(galaxy):
+    gal = galaxy(seed=42)
+    with pytest.raises(ValueError):
+        potential_energy.spherical_deviation(gal, n_targets=0)
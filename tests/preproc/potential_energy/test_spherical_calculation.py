@@ -0,0 +1,139 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test utilities  galaxychop.preproc.potential_energy.spherical_calculation"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+
+from galaxychop.preproc.potential_energy import spherical_calculation
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _particles(seed, size=300):
+    random = np.random.default_rng(seed=seed)
+    x, y, z = random.normal(size=(3, size))
+    m = random.random(size)
+    softening = random.choice([0.01, 0.1], size=size)
+    return x, y, z, m, softening
+
+
+def _shells(x, y, z, m, softening, sources, targets, center=(0, 0, 0)):
+    """O(N²) potential of the spherical shells of the sources."""
+    radius = np.sqrt(
+        np.square(x - center[0])
+        + np.square(y - center[1])
+        + np.square(z - center[2])
+    )
+    soft_radius = np.sqrt(np.square(radius) + np.square(softening))
+    epot = []
+    for i in targets:
+        # the shells inside a target act as a point mass at the center
+        inside = radius[sources] < radius[i]
+        terms = np.where(
+            inside, m[sources] / soft_radius[i], (m / soft_radius)[sources]
+        )
+        epot.append(np.sum(terms[sources != i]))
+    return np.array(epot)
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+@pytest.mark.parametrize("with_sources", [False, True])
+@pytest.mark.parametrize("with_targets", [False, True])
+def test_potential_spherical(with_sources, with_targets):
+    x, y, z, m, softening = _particles(seed=42)
+    random = np.random.default_rng(seed=42)
+    ids = np.arange(len(m))
+    sources = np.sort(random.choice(ids, 100, replace=False))
+    targets = random.choice(ids, 50, replace=False)
+
+    epot = spherical_calculation.potential_spherical(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        sources=sources if with_sources else None,
+        targets=targets if with_targets else None,
+    )
+
+    expected = _shells(
+        x,
+        y,
+        z,
+        m,
+        softening,
+        sources if with_sources else ids,
+        targets if with_targets else ids,
+    )
+    npt.assert_allclose(epot, expected, rtol=1e-12)
+
+
+def test_potential_spherical_center():
+    x, y, z, m, softening = _particles(seed=42)
+    center = np.array([1.0, -2.0, 0.5])
+
+    epot = spherical_calculation.potential_spherical(
+        x + center[0],
+        y + center[1],
+        z + center[2],
+        m,
+        softening,
+        center=center,
+    )
+
+    expected = spherical_calculation.potential_spherical(
+        x, y, z, m, softening
+    )
+    npt.assert_allclose(epot, expected, rtol=1e-10)
+
+
+def test_potential_spherical_particle_at_center():
+    x = np.array([0.0, 0.0, 1.0, 0.0])
+    y = np.array([0.0, 0.0, 0.0, 2.0])
+    z = np.zeros(4)
+    m = np.ones(4)
+
+    epot = spherical_calculation.potential_spherical(x, y, z, m, 0.0)
+
+    # the unsoftened particles at the center don't interact with each other
+    npt.assert_allclose(epot, [1.5, 1.5, 2.5, 1.5])
+
+
+def test_potential_spherical_dtype():
+    x, y, z, m, softening = _particles(seed=42)
+
+    epot = spherical_calculation.potential_spherical(
+        x, y, z, m, softening, dtype=np.float32
+    )
+    expected = spherical_calculation.potential_spherical(
+        x, y, z, m, softening
+    )
+
+    assert epot.dtype == np.float32
+    npt.assert_allclose(epot, expected, rtol=1e-5)
@@ -0,0 +1,252 @@
+# This file is part of
+# the galaxy-chop project (https://github.com/vcristiani/galaxy-chop)
+# Copyright (c) Cristiani, et al. 2021, 2022, 2023
+# License: MIT
+# Full Text: https://github.com/vcristiani/galaxy-chop/blob/master/LICENSE.txt
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+
+"""Test utilities  galaxychop.preproc.potential_energy.treecode_calculation"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+
+from galaxychop.preproc.potential_energy import treecode_calculation
+
+import numpy as np
+import numpy.testing as npt
+
+import pytest
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+
+def _particles(seed, size=500):
+    random = np.random.default_rng(seed=seed)
+    x, y, z = random.normal(size=(3, size))
+    m = random.random(size)
+    return x, y, z, m
+
+
+def _direct(x, y, z, m, softening):
+    dist = np.sqrt(
+        np.square(x - x.reshape(-1, 1))
+        + np.square(y - y.reshape(-1, 1))
+        + np.square(z - z.reshape(-1, 1))
+        + np.square(softening)
+    )
+    np.fill_diagonal(dist, np.inf)
+    return (m / dist).sum(axis=1)
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+
+def test_morton_keys_order():
+    x = np.array([0.0, 1.0, 0.0, 1.0])
+    y = np.array([0.0, 0.0, 1.0, 1.0])
+    z = np.zeros(4)
+
+    keys, origin, l_box = treecode_calculation.morton_keys(x, y, z)
+
+    npt.assert_array_equal(origin, [0.0, 0.0, 0.0])
+    assert l_box >= 1.0
+    assert keys.dtype == np.uint64
+    assert keys[0] < keys[2] < keys[1] < keys[3]
+
+
+def test_make_octree():
+    x, y, z, m = _particles(seed=42)
+
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=8)
+
+    # the root contains everything
+    assert tree.count[0] == len(m)
+    npt.assert_allclose(tree.mass[0], m.sum())
+    npt.assert_allclose(tree.cx[0], np.sum(m * x) / m.sum())
+
+    # every leaf respects the leaf size and all the particles are in a leaf
+    assert np.all(tree.count[tree.is_leaf] <= 8)
+    assert tree.count[tree.is_leaf].sum() == len(m)
+
+    # the children split the parent
+    inner = np.flatnonzero(~tree.is_leaf)
+    for node in inner:
+        first = tree.child_start[node]
+        children = slice(first, first + tree.n_children[node])
+        assert tree.count[children].sum() == tree.count[node]
+        npt.assert_allclose(tree.mass[children].sum(), tree.mass[node])
+
+    # every particle is inside the cell of all the nodes that own it
+    nodes = np.repeat(np.arange(len(tree.count)), tree.count)
+    parts = treecode_calculation._ragged_arange(tree.start, tree.count)
+    for pos, low in ((tree.x, tree.ox), (tree.y, tree.oy), (tree.z, tree.oz)):
+        assert np.all(pos[parts] >= low[nodes])
+        assert np.all(pos[parts] <= low[nodes] + tree.side[nodes])
+
+    npt.assert_array_equal(tree.x, x[tree.order])
+    npt.assert_array_equal(tree.order[tree.inverse_order], np.arange(500))
+    assert repr(tree).startswith("<Octree particles=500")
+
+
+def test_make_octree_invalid_leaf_size():
+    x, y, z, m = _particles(seed=42)
+    with pytest.raises(ValueError):
+        treecode_calculation.make_octree(x, y, z, m, leaf_size=0)
+
+
+def test_potential_barnes_hut_theta_zero_is_direct():
+    x, y, z, m = _particles(seed=42)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=4)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree, x, y, z, 0.1, theta=0.0, self_idx=tree.inverse_order
+    )
+
+    npt.assert_allclose(epot, _direct(x, y, z, m, 0.1), rtol=1e-12)
+
+
+@pytest.mark.parametrize("theta, rtol", [(0.3, 1e-3), (0.7, 1e-2)])
+def test_potential_barnes_hut_accuracy(theta, rtol):
+    x, y, z, m = _particles(seed=42, size=2000)
+    tree = treecode_calculation.make_octree(x, y, z, m)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree,
+        x,
+        y,
+        z,
+        0.1,
+        theta=theta,
+        self_idx=tree.inverse_order,
+        batch_size=100,
+    )
+
+    npt.assert_allclose(epot, _direct(x, y, z, m, 0.1), rtol=rtol)
+
+
+def test_potential_barnes_hut_opens_the_node_of_the_target():
+    # a light particle far from a compact clump shares the root with it; with
+    # a wide opening angle the monopole of the root would include itself
+    random = np.random.default_rng(seed=42)
+    x, y, z = np.column_stack(
+        ([0.0, 0.0, 0.0], 1 + 0.01 * random.normal(size=(3, 100)))
+    )
+    m = np.ones(101)
+    tree = treecode_calculation.make_octree(x, y, z, m)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree, x, y, z, 0.1, theta=0.9, self_idx=tree.inverse_order
+    )
+    expected = _direct(x, y, z, m, 0.1)
+
+    npt.assert_allclose(epot[0], expected[0], rtol=1e-5)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree, x[:1], y[:1], z[:1], 0.1, theta=0.9
+    )
+
+    # an external target also feels the softened particle below it
+    npt.assert_allclose(epot, expected[:1] + m[0] / 0.1, rtol=1e-5)
+
+
+def test_potential_barnes_hut_coincident_particles():
+    x, y, z, m = _particles(seed=42, size=100)
+    x, y, z = np.tile(x, 2), np.tile(y, 2), np.tile(z, 2)
+    m = np.tile(m, 2)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=4)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree, x, y, z, 0.0, theta=0.0, self_idx=tree.inverse_order
+    )
+
+    # the pairs at zero distance are skipped, as the direct backends do
+    half = _direct(x[:100], y[:100], z[:100], m[:100], 0.0)
+
+    npt.assert_allclose(epot, 2 * np.tile(half, 2), rtol=1e-12)
+
+
+def test_potential_barnes_hut_softened_duplicates():
+    x, y, z, m = _particles(seed=42, size=100)
+    x, y, z = np.tile(x, 2), np.tile(y, 2), np.tile(z, 2)
+    m = np.tile(m, 2)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=4)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree, x, y, z, 0.1, theta=0.0, self_idx=tree.inverse_order
+    )
+
+    # only the self interaction is skipped, the duplicates are softened
+    npt.assert_allclose(epot, _direct(x, y, z, m, 0.1), rtol=1e-12)
+
+
+def test_potential_barnes_hut_external_targets():
+    x, y, z, m = _particles(seed=42)
+    tree = treecode_calculation.make_octree(x, y, z, m)
+
+    # without self_idx, a target over a particle interacts with it
+    epot = treecode_calculation.potential_barnes_hut(
+        tree, x[:10], y[:10], z[:10], 0.1, theta=0.0
+    )
+    expected = _direct(x, y, z, m, 0.1)[:10] + m[:10] / 0.1
+
+    npt.assert_allclose(epot, expected, rtol=1e-12)
+
+
+def test_potential_barnes_hut_invalid_theta():
+    x, y, z, m = _particles(seed=42)
+    tree = treecode_calculation.make_octree(x, y, z, m)
+    with pytest.raises(ValueError):
+        treecode_calculation.potential_barnes_hut(tree, x, y, z, 0.1, -1)
+
+
+def test_nodes_softening():
+    x, y, z, m = _particles(seed=42)
+    softening = np.random.default_rng(seed=42).choice([0.1, 0.5], 500)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=8)
+
+    psoft2, nsoft2 = treecode_calculation.nodes_softening(tree, softening)
+
+    npt.assert_allclose(psoft2, softening[tree.order] ** 2)
+    npt.assert_allclose(nsoft2[0], np.sum(m * softening**2) / m.sum())
+    assert np.all((nsoft2 >= 0.1**2 - 1e-12) & (nsoft2 <= 0.5**2 + 1e-12))
+
+
+def test_potential_barnes_hut_source_softening():
+    x, y, z, m = _particles(seed=42)
+    softening = np.random.default_rng(seed=42).choice([0.1, 0.5], 500)
+    tree = treecode_calculation.make_octree(x, y, z, m, leaf_size=4)
+
+    epot = treecode_calculation.potential_barnes_hut(
+        tree,
+        x,
+        y,
+        z,
+        softening,
+        theta=0.0,
+        self_idx=tree.inverse_order,
+        source_softening=softening,
+    )
+
+    soft2 = (softening**2 + softening.reshape(-1, 1) ** 2) / 2
+    dist = np.sqrt(
+        np.square(x - x.reshape(-1, 1))
+        + np.square(y - y.reshape(-1, 1))
+        + np.square(z - z.reshape(-1, 1))
+        + soft2
+    )
+    np.fill_diagonal(dist, np.inf)
+
+    npt.assert_allclose(epot, (m / dist).sum(axis=1), rtol=1e-12)
@@ -18,8 +18,11 @@
 # =============================================================================
 
 
+from galaxychop import core
 from galaxychop.preproc import pcenter
 
+import numpy as np
+
 import pandas as pd
 
 import pytest
@@ -117,6 +120,47 @@ def test_center(galaxy):
         assert not (ocol == ccol).all()
 
 
+def test_center_shares_unchanged_columns(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=True,
+        dm_potential=True,
+        gas_potential=True,
+    )
+
+    cgal = pcenter.center(gal)
+
+    for pset, cpset in zip(
+        (gal.stars, gal.dark_matter, gal.gas),
+        (cgal.stars, cgal.dark_matter, cgal.gas),
+    ):
+        assert np.shares_memory(cpset.m, pset.m)
+        assert np.shares_memory(cpset.potential, pset.potential)
+        assert not np.shares_memory(cpset.x, pset.x)
+        assert not cpset.x.flags.writeable
+
+    # the new columns are joined without copying them
+    assert np.shares_memory(cgal.columns_["x"], cgal.stars.x)
+    assert np.shares_memory(cgal.columns_["x"], cgal.gas.x)
+    assert np.shares_memory(cgal.columns_["m"], gal.columns_["m"])
+
+
+@pytest.mark.parametrize("with_potential", [True, False])
+def test_center_float32(galaxy, with_potential):
+    gal = galaxy(seed=42)
+    gal32 = core.mkgalaxy(**gal.disassemble(), dtype=np.float32)
+
+    cgal = pcenter.center(gal, with_potential=with_potential)
+    cgal32 = pcenter.center(gal32, with_potential=with_potential)
+
+    assert cgal32.dtype_ == np.float32
+    for cname, column in cgal32.columns_.items():
+        assert column.dtype == np.float32
+        np.testing.assert_allclose(
+            column, cgal.columns_[cname], rtol=1e-5, atol=1e-3
+        )
+
+
 def test_is_centered_without_potential_energy(galaxy):
     gal = galaxy(
         seed=42,
@@ -16,8 +16,11 @@
 
 import warnings
 
+from galaxychop import core
 from galaxychop.preproc import salign
 
+import numpy as np
+
 import pandas as pd
 
 import pytest
@@ -114,6 +117,26 @@ def test_star_align(galaxy):
         assert not (ocol == acol).all(), colname
 
 
+@pytest.mark.filterwarnings("ignore:star_align")
+def test_star_align_shares_unchanged_columns(galaxy):
+    gal = galaxy(seed=42)
+
+    agal = salign.star_align(gal)
+
+    for pset, apset in zip(
+        (gal.stars, gal.dark_matter, gal.gas),
+        (agal.stars, agal.dark_matter, agal.gas),
+    ):
+        assert np.shares_memory(apset.m, pset.m)
+        assert not np.shares_memory(apset.vz, pset.vz)
+        assert not apset.vz.flags.writeable
+
+    # the new columns are joined without copying them
+    assert np.shares_memory(agal.columns_["vz"], agal.stars.vz)
+    assert np.shares_memory(agal.columns_["vz"], agal.gas.vz)
+    assert np.shares_memory(agal.columns_["m"], gal.columns_["m"])
+
+
 def test_star_align_invalid_rcut(galaxy):
     gal = galaxy(seed=42)
 
@@ -173,6 +196,22 @@ def test_aligner_notdefault_r_cut(read_hdf5_galaxy):
     pd.testing.assert_frame_equal(class_df, func_df, check_dtype=False)
 
 
+@pytest.mark.filterwarnings("ignore:star_align")
+def test_star_align_float32(galaxy):
+    gal = galaxy(seed=42)
+    gal32 = core.mkgalaxy(**gal.disassemble(), dtype=np.float32)
+
+    agal = salign.star_align(gal)
+    agal32 = salign.star_align(gal32)
+
+    assert agal32.dtype_ == np.float32
+    for cname, column in agal32.columns_.items():
+        assert column.dtype == np.float32
+        np.testing.assert_allclose(
+            column, agal.columns_[cname], rtol=1e-4, atol=1e-2
+        )
+
+
 @pytest.mark.filterwarnings("ignore:star_align")
 def test_aligner_checker(galaxy):
     gal = galaxy(seed=42)
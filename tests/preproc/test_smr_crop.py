@@ -14,7 +14,10 @@
 # IMPORTS
 # =============================================================================
 
-from galaxychop.preproc import smr_crop
+import warnings
+
+from galaxychop import core
+from galaxychop.preproc import potential_energy, smr_crop
 
 import numpy as np
 
@@ -72,6 +75,22 @@ def test_cutter_transformer(galaxy):
     pd.testing.assert_frame_equal(class_df, func_df, check_dtype=False)
 
 
+def test_half_star_mass_radius_crop_without_potential(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+
+    cgal = smr_crop.half_star_mass_radius_crop(gal, num_radii=1)
+
+    assert not cgal.has_potential_
+    assert len(cgal.stars) < len(gal.stars)
+    np.testing.assert_array_equal(cgal.gas.arr_.x, gal.gas.arr_.x)
+    assert np.shares_memory(cgal.columns_["x"], cgal.gas.x)
+
+
 def test_cutter_default_num_radii(read_hdf5_galaxy):
     gal = read_hdf5_galaxy("gal394242.h5")
     cutter = smr_crop.Cutter()
@@ -116,3 +135,58 @@ def test_get_radius_half_mass_badinput(read_hdf5_galaxy):
 
     with pytest.raises(ValueError):
         smr_crop.get_radius_half_mass(gal, "zaraza")
+
+
+def test_half_star_mass_radius_crop_update_potential(galaxy):
+    gal = galaxy(
+        seed=42,
+        stars_potential=False,
+        dm_potential=False,
+        gas_potential=False,
+    )
+    gal = potential_energy.potential(gal, backend="numpy")
+
+    cut_gal = smr_crop.half_star_mass_radius_crop(
+        gal, num_radii=1, update_potential={"backend": "numpy"}
+    )
+
+    stale = smr_crop.half_star_mass_radius_crop(gal, num_radii=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        expected = potential_energy.potential(stale, backend="numpy")
+
+    assert len(cut_gal.stars) < len(gal.stars)
+    for ptype in ("stars", "dark_matter", "gas"):
+        np.testing.assert_allclose(
+            getattr(cut_gal, ptype).potential.value,
+            getattr(expected, ptype).potential.value,
+            rtol=1e-5,
+        )
+
+
+def test_cutter_update_potential(galaxy):
+    gal = galaxy(seed=42)
+    cutter = smr_crop.Cutter(num_radii=1, update_potential=True)
+    assert cutter.update_potential is True
+
+    cut_gal = cutter.transform(gal)
+    expected = smr_crop.half_star_mass_radius_crop(
+        gal, num_radii=1, update_potential=True
+    )
+    np.testing.assert_array_equal(
+        cut_gal.stars.potential.value, expected.stars.potential.value
+    )
+
+
+def test_half_star_mass_radius_crop_float32(galaxy):
+    gal = galaxy(seed=42)
+    gal32 = core.mkgalaxy(**gal.disassemble(), dtype=np.float32)
+
+    cut_gal = smr_crop.half_star_mass_radius_crop(gal, num_radii=1)
+    cut_gal32 = smr_crop.half_star_mass_radius_crop(gal32, num_radii=1)
+
+    assert cut_gal32.dtype_ == np.float32
+    assert len(cut_gal32.stars) == len(cut_gal.stars)
+    np.testing.assert_allclose(
+        cut_gal32.stars.arr_.m, cut_gal.stars.arr_.m, rtol=1e-6
+    )
@@ -14,8 +14,12 @@ from io import BytesIO
 
 from galaxychop import core, io
 
+import numpy as np
+
 import pandas as pd
 
+import pytest
+
 
 # =============================================================================
 # IO TESTS
@@ -167,3 +171,37 @@ def test_to_hdf5(galaxy):
     expected_df = gal.to_dataframe(attributes=stored_attributes)
 
     pd.testing.assert_frame_equal(result_df, expected_df)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_read_npy_dtype(data_path, dtype):
+    columns = ["m", "x", "y", "z", "vx", "vy", "vz", "id"]
+
+    gala = io.read_npy(
+        path_or_stream_star=data_path("star_ID_394242.npy"),
+        path_or_stream_dark=data_path("dark_ID_394242.npy"),
+        path_or_stream_gas=data_path("gas_ID_394242.npy"),
+        columns=columns,
+        path_or_stream_pot_s=data_path("potential_star_ID_394242.npy"),
+        path_or_stream_pot_dm=data_path("potential_dark_ID_394242.npy"),
+        path_or_stream_pot_g=data_path("potential_gas_ID_394242.npy"),
+        dtype=dtype,
+    )
+
+    assert gala.dtype_ == dtype
+    assert gala.has_potential_
+    assert all(column.dtype == dtype for column in gala.columns_.values())
+
+
+def test_to_hdf5_read_dtype(galaxy):
+    gal = galaxy(seed=42)
+
+    buff = BytesIO()
+    io.to_hdf5(buff, gal)
+    buff.seek(0)
+    result = io.read_hdf5(buff, dtype="float32")
+
+    assert result.dtype_ == np.float32
+    np.testing.assert_allclose(
+        result.columns_["x"], gal.columns_["x"], rtol=1e-6
+    )